@@ -94,6 +94,21 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
+    # Objects that autogenerate must not compare: APScheduler's job store table, the SQLite
+    # FTS5 table with its shadow tables (src/search.py DDL), and the GIN search indexes,
+    # which only exist on PostgreSQL and which autogenerate cannot compare faithfully
+    unmanaged_indexes = {'ix_quotes_search_vector', 'ix_quotes_author_trgm', 'ix_quotes_text_trgm'}
+
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table':
+            return name != 'apscheduler_jobs' and not (name == 'quotes_fts' or name.startswith('quotes_fts_'))
+        if type_ == 'index':
+            return name not in unmanaged_indexes
+        return True
+
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
+
     connectable = get_engine()
 
     with connectable.connect() as connection:
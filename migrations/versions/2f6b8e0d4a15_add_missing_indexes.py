@@ -0,0 +1,34 @@
+"""Add indexes for foreign keys and quote-of-the-day lookups
+
+Revision ID: 2f6b8e0d4a15
+Revises: e4a1f7c3b962
+Create Date: 2026-10-18 20:14:36.871203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6b8e0d4a15'
+down_revision = 'e4a1f7c3b962'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_quotes_submitted_by', 'quotes', ['submitted_by']),
+    ('ix_quotes_date_fetched_featured', 'quotes', ['date_fetched', 'is_featured_qod']),
+    ('ix_quotes_is_community_qod', 'quotes', ['is_community_qod']),
+    ('ix_votes_quote_id', 'votes', ['quote_id']),
+    ('ix_reports_quote_id', 'reports', ['quote_id']),
+    ('ix_quote_categories_category_id_quote_id', 'quote_categories', ['category_id', 'quote_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,101 @@
+"""Consolidate legacy categories and track one-shot data jobs
+
+Revision ID: 3c9a7e21d4b8
+Revises: 0f071d9a996b
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a7e21d4b8'
+down_revision = '0f071d9a996b'
+branch_labels = None
+depends_on = None
+
+# The consolidation as it stood at this revision (src/consolidation.py may change later)
+CONSOLIDATION_VERSION = 'consolidate_categories_v1'
+
+CATEGORY_MAPPING = {
+    'inspire': 'Inspiration',
+    'management': 'Management',
+    'sports': 'Sports',
+    'life': 'Life',
+    'funny': 'Humor',
+    'students': 'Education',
+    'hardwork': 'Hard Work',
+    'self-improvement': 'Self Improvement',
+    'self-worth': 'Self Worth',
+    'self-imposed-limits': 'Self Imposed Limits',
+}
+
+categories = sa.table('categories', sa.column('id', sa.Integer), sa.column('name', sa.String))
+quote_categories = sa.table('quote_categories', sa.column('quote_id', sa.Integer), sa.column('category_id', sa.Integer))
+user_preferences = sa.table('user_preferences', sa.column('user_id', sa.Integer), sa.column('category_id', sa.Integer))
+data_migrations = sa.table('data_migrations', sa.column('name', sa.String), sa.column('applied_at', sa.DateTime))
+
+
+def _move_links(connection, table, key_column, old_id, new_id):
+    already_linked = sa.select(table.c[key_column]).where(table.c.category_id == new_id)
+    connection.execute(
+        sa.insert(table).from_select(
+            [key_column, 'category_id'],
+            sa.select(table.c[key_column], sa.literal(new_id)).where(
+                table.c.category_id == old_id,
+                table.c[key_column].not_in(already_linked)
+            )
+        )
+    )
+    connection.execute(sa.delete(table).where(table.c.category_id == old_id))
+
+
+def _consolidate_categories(connection):
+    rows = connection.execute(sa.select(categories.c.id, categories.c.name)).all()
+    category_ids = {row.name.lower(): row.id for row in rows}
+    category_names = {row.id: row.name for row in rows}
+
+    for old_name, new_name in CATEGORY_MAPPING.items():
+        old_key = old_name.lower()
+        new_key = new_name.lower()
+        if old_key not in category_ids:
+            continue
+
+        if old_key == new_key:
+            # Only the capitalisation differs; never merge a category into itself
+            category_id = category_ids[old_key]
+            if category_names[category_id] != new_name:
+                connection.execute(sa.update(categories).where(categories.c.id == category_id).values(name=new_name))
+            continue
+
+        old_id = category_ids.pop(old_key)
+        if new_key not in category_ids:
+            connection.execute(sa.update(categories).where(categories.c.id == old_id).values(name=new_name))
+            category_ids[new_key] = old_id
+        else:
+            # Merge quotes and user preferences from the old category into the new one
+            new_id = category_ids[new_key]
+            _move_links(connection, quote_categories, 'quote_id', old_id, new_id)
+            _move_links(connection, user_preferences, 'user_id', old_id, new_id)
+            connection.execute(sa.delete(categories).where(categories.c.id == old_id))
+
+
+def upgrade():
+    op.create_table('data_migrations',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('applied_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # Data migration: rename/merge categories once and record that it ran
+    connection = op.get_bind()
+    _consolidate_categories(connection)
+    connection.execute(sa.insert(data_migrations).values(name=CONSOLIDATION_VERSION,
+                                                         applied_at=datetime.datetime.utcnow()))
+
+
+def downgrade():
+    # Category renames and merges are not reversible; only drop the bookkeeping table.
+    op.drop_table('data_migrations')
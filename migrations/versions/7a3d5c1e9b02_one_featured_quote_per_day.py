@@ -0,0 +1,40 @@
+"""Allow at most one featured quote of the day per date
+
+Revision ID: 7a3d5c1e9b02
+Revises: 2f6b8e0d4a15
+Create Date: 2026-10-18 21:02:47.330918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3d5c1e9b02'
+down_revision = '2f6b8e0d4a15'
+branch_labels = None
+depends_on = None
+
+quotes = sa.table(
+    'quotes',
+    sa.column('id', sa.Integer),
+    sa.column('date_fetched', sa.Date),
+    sa.column('is_featured_qod', sa.Boolean),
+)
+
+
+def upgrade():
+    # Concurrent fetches could feature several quotes on one day; keep the first of each day
+    first_per_day = sa.select(sa.func.min(quotes.c.id)).where(quotes.c.is_featured_qod.is_(True)) \
+        .group_by(quotes.c.date_fetched)
+    op.execute(
+        quotes.update()
+        .where(quotes.c.is_featured_qod.is_(True), quotes.c.id.not_in(first_per_day))
+        .values(is_featured_qod=False)
+    )
+    op.create_index('uq_quotes_featured_qod_per_day', 'quotes', ['date_fetched'], unique=True,
+                    postgresql_where=sa.text('is_featured_qod'), sqlite_where=sa.text('is_featured_qod'))
+
+
+def downgrade():
+    op.drop_index('uq_quotes_featured_qod_per_day', table_name='quotes')
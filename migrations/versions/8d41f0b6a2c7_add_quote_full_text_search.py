@@ -0,0 +1,111 @@
+"""Add full-text search index for quotes
+
+Revision ID: 8d41f0b6a2c7
+Revises: 3c9a7e21d4b8
+Create Date: 2026-10-18 11:04:19.552871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f0b6a2c7'
+down_revision = '3c9a7e21d4b8'
+branch_labels = None
+depends_on = None
+
+# The search index DDL as it stood at this revision (src/search.py may change later).
+
+# PostgreSQL: tsvector column on quotes maintained by a trigger, with a GIN index
+POSTGRES_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION quotes_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.text, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT username FROM users WHERE id = NEW.submitted_by), '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS quotes_search_vector_trigger ON quotes",
+    """
+    CREATE TRIGGER quotes_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF text, author, submitted_by ON quotes
+    FOR EACH ROW EXECUTE FUNCTION quotes_search_vector_update()
+    """,
+    # Backfill existing rows by firing the trigger
+    "UPDATE quotes SET text = text",
+]
+
+POSTGRES_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS quotes_search_vector_trigger ON quotes",
+    "DROP FUNCTION IF EXISTS quotes_search_vector_update()",
+]
+
+# SQLite (development): FTS5 table kept in sync with quotes by triggers
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE quotes_fts USING fts5(text, author, username, tokenize='porter unicode61')",
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_insert AFTER INSERT ON quotes BEGIN
+        INSERT INTO quotes_fts (rowid, text, author, username)
+        VALUES (new.id, new.text, coalesce(new.author, ''),
+                coalesce((SELECT username FROM users WHERE id = new.submitted_by), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_delete AFTER DELETE ON quotes BEGIN
+        DELETE FROM quotes_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_update AFTER UPDATE OF text, author, submitted_by ON quotes BEGIN
+        DELETE FROM quotes_fts WHERE rowid = old.id;
+        INSERT INTO quotes_fts (rowid, text, author, username)
+        VALUES (new.id, new.text, coalesce(new.author, ''),
+                coalesce((SELECT username FROM users WHERE id = new.submitted_by), ''));
+    END
+    """,
+    """
+    INSERT INTO quotes_fts (rowid, text, author, username)
+    SELECT quotes.id, quotes.text, coalesce(quotes.author, ''), coalesce(users.username, '')
+    FROM quotes LEFT OUTER JOIN users ON users.id = quotes.submitted_by
+    """,
+]
+
+SQLITE_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS quotes_fts_insert",
+    "DROP TRIGGER IF EXISTS quotes_fts_delete",
+    "DROP TRIGGER IF EXISTS quotes_fts_update",
+    "DROP TABLE IF EXISTS quotes_fts",
+]
+
+
+def _run(statements):
+    for statement in statements:
+        op.execute(sa.text(statement))
+
+
+def upgrade():
+    op.add_column('quotes', sa.Column('search_vector', sa.Text().with_variant(postgresql.TSVECTOR(), 'postgresql'), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_quotes_search_vector', 'quotes', ['search_vector'], unique=False, postgresql_using='gin')
+
+    # PostgreSQL: trigger-maintained tsvector; SQLite: FTS5 table and triggers
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        _run(POSTGRES_DDL)
+    elif dialect == 'sqlite':
+        _run(SQLITE_DROP_DDL + SQLITE_DDL)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    _run({'postgresql': POSTGRES_DROP_DDL, 'sqlite': SQLITE_DROP_DDL}.get(dialect, []))
+    if dialect == 'postgresql':
+        op.drop_index('ix_quotes_search_vector', table_name='quotes')
+    op.drop_column('quotes', 'search_vector')
@@ -0,0 +1,54 @@
+"""Add the daily_quotes table and vote timestamps
+
+Revision ID: 9c2e4b7d1f36
+Revises: 7a3d5c1e9b02
+Create Date: 2026-10-18 22:14:05.512734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2e4b7d1f36'
+down_revision = '7a3d5c1e9b02'
+branch_labels = None
+depends_on = None
+
+quotes = sa.table(
+    'quotes',
+    sa.column('id', sa.Integer),
+    sa.column('date_fetched', sa.Date),
+    sa.column('is_featured_qod', sa.Boolean),
+)
+
+
+def upgrade():
+    daily_quotes = op.create_table(
+        'daily_quotes',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('quote_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['quote_id'], ['quotes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'kind'),
+    )
+    # Existing votes have no timestamp; they count towards all-time scores only
+    with op.batch_alter_table('votes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_votes_created_at', ['created_at'], unique=False)
+
+    # Keep the featured quotes already shown on past days
+    op.execute(daily_quotes.insert().from_select(
+        ['day', 'kind', 'quote_id', 'created_at'],
+        sa.select(quotes.c.date_fetched, sa.literal('featured'), quotes.c.id, sa.func.current_timestamp())
+        .where(quotes.c.is_featured_qod.is_(True), quotes.c.date_fetched.isnot(None)),
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('votes', schema=None) as batch_op:
+        batch_op.drop_index('ix_votes_created_at')
+        batch_op.drop_column('created_at')
+    op.drop_table('daily_quotes')
@@ -0,0 +1,31 @@
+"""Add pg_trgm indexes for fuzzy author and quote lookups
+
+Revision ID: b5e2c9d7f310
+Revises: 8d41f0b6a2c7
+Create Date: 2026-10-18 12:37:02.114390
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2c9d7f310'
+down_revision = '8d41f0b6a2c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL only; SQLite uses the in-memory trigram index in src/trigram.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_quotes_author_trgm ON quotes USING gin (author gin_trgm_ops)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_quotes_text_trgm ON quotes USING gin (text gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_quotes_text_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_quotes_author_trgm")
@@ -0,0 +1,71 @@
+"""Add per-category leaderboards
+
+Revision ID: c6f1a8e3d527
+Revises: 9c2e4b7d1f36
+Create Date: 2026-10-18 23:05:41.208114
+
+"""
+import math
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a8e3d527'
+down_revision = '9c2e4b7d1f36'
+branch_labels = None
+depends_on = None
+
+# The leaderboard seeding as it stood at this revision (src/leaderboard.py may change later)
+WILSON_Z = 1.96
+
+_quotes = sa.table('quotes', sa.column('id', sa.Integer), sa.column('upvotes', sa.Integer),
+                   sa.column('downvotes', sa.Integer))
+_quote_categories = sa.table('quote_categories', sa.column('quote_id', sa.Integer), sa.column('category_id', sa.Integer))
+_leaderboard = sa.table('category_leaderboard', sa.column('category_id', sa.Integer), sa.column('quote_id', sa.Integer),
+                        sa.column('score', sa.Float))
+
+
+def _wilson_score(upvotes, downvotes, z=WILSON_Z):
+    upvotes, downvotes = upvotes or 0, downvotes or 0
+    total = upvotes + downvotes
+    if not total:
+        return 0.0
+    share = upvotes / total
+    centre = share + z * z / (2 * total)
+    spread = z * math.sqrt((share * (1 - share) + z * z / (4 * total)) / total)
+    return round((centre - spread) / (1 + z * z / total), 6)
+
+
+def _seed_leaderboards(connection, chunk_size=5000):
+    query = sa.select(_quote_categories.c.category_id, _quotes.c.id, _quotes.c.upvotes, _quotes.c.downvotes) \
+        .join(_quotes, _quotes.c.id == _quote_categories.c.quote_id) \
+        .where(sa.func.coalesce(_quotes.c.upvotes, 0) + sa.func.coalesce(_quotes.c.downvotes, 0) > 0)
+    rows = [{'category_id': category_id, 'quote_id': quote_id, 'score': _wilson_score(upvotes, downvotes)}
+            for category_id, quote_id, upvotes, downvotes in connection.execute(query)]
+    for start in range(0, len(rows), chunk_size):
+        connection.execute(sa.insert(_leaderboard), rows[start:start + chunk_size])
+
+
+def upgrade():
+    op.create_table(
+        'category_leaderboard',
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('quote_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['quote_id'], ['quotes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('category_id', 'quote_id'),
+    )
+    op.create_index('ix_category_leaderboard_category_id_score', 'category_leaderboard',
+                    ['category_id', 'score', 'quote_id'], unique=False)
+    op.create_index('ix_category_leaderboard_quote_id', 'category_leaderboard', ['quote_id'], unique=False)
+
+    # Seed the leaderboards from the existing vote counters
+    _seed_leaderboards(op.get_bind())
+
+
+def downgrade():
+    op.drop_index('ix_category_leaderboard_quote_id', table_name='category_leaderboard')
+    op.drop_index('ix_category_leaderboard_category_id_score', table_name='category_leaderboard')
+    op.drop_table('category_leaderboard')
@@ -0,0 +1,70 @@
+"""Add hourly vote buckets and the trending quotes list
+
+Revision ID: d3b7e2a9c481
+Revises: c6f1a8e3d527
+Create Date: 2026-10-18 23:48:12.663015
+
+"""
+import datetime
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b7e2a9c481'
+down_revision = 'c6f1a8e3d527'
+branch_labels = None
+depends_on = None
+
+# The bucket seeding as it stood at this revision (src/trending.py may change later)
+_votes = sa.table('votes', sa.column('quote_id', sa.Integer), sa.column('vote_type', sa.String),
+                  sa.column('created_at', sa.DateTime))
+_buckets = sa.table('vote_buckets', sa.column('quote_id', sa.Integer), sa.column('hour', sa.DateTime),
+                    sa.column('upvotes', sa.Integer), sa.column('downvotes', sa.Integer))
+
+
+def _seed_vote_buckets(connection, since):
+    # Votes count in the hour they were cast (or last switched sides)
+    counts = defaultdict(lambda: [0, 0])
+    query = sa.select(_votes.c.quote_id, _votes.c.vote_type, _votes.c.created_at).where(_votes.c.created_at >= since)
+    for quote_id, vote_type, created_at in connection.execute(query):
+        hour = created_at.replace(minute=0, second=0, microsecond=0)
+        counts[(quote_id, hour)][0 if vote_type == 'upvote' else 1] += 1
+    rows = [{'quote_id': quote_id, 'hour': hour, 'upvotes': up, 'downvotes': down}
+            for (quote_id, hour), (up, down) in counts.items()]
+    if rows:
+        connection.execute(sa.insert(_buckets), rows)
+
+
+def upgrade():
+    op.create_table(
+        'vote_buckets',
+        sa.Column('quote_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('upvotes', sa.Integer(), nullable=False),
+        sa.Column('downvotes', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['quote_id'], ['quotes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('quote_id', 'hour'),
+    )
+    op.create_index('ix_vote_buckets_hour', 'vote_buckets', ['hour'], unique=False)
+    op.create_table(
+        'trending_quotes',
+        sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('quote_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('upvotes', sa.Integer(), nullable=False),
+        sa.Column('downvotes', sa.Integer(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['quote_id'], ['quotes.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('rank'),
+    )
+
+    # Seed the last week of buckets from the timestamped votes; the list fills on first refresh
+    _seed_vote_buckets(op.get_bind(), datetime.datetime.utcnow() - datetime.timedelta(days=7))
+
+
+def downgrade():
+    op.drop_table('trending_quotes')
+    op.drop_index('ix_vote_buckets_hour', table_name='vote_buckets')
+    op.drop_table('vote_buckets')
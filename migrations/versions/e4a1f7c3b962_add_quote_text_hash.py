@@ -0,0 +1,75 @@
+"""Add a normalized content hash for quote deduplication
+
+Revision ID: e4a1f7c3b962
+Revises: b5e2c9d7f310
+Create Date: 2026-10-18 19:48:11.204517
+
+"""
+import hashlib
+import re
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1f7c3b962'
+down_revision = 'b5e2c9d7f310'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# The normalization as it stood at this revision (src/models.py may change later);
+# stored hashes must keep matching what the app computed when this ran
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def quote_text_hash(text):
+    text = unicodedata.normalize('NFKC', text or '')
+    normalized = _WHITESPACE_RE.sub(' ', text).strip().casefold()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+quotes = sa.table(
+    'quotes',
+    sa.column('id', sa.Integer),
+    sa.column('text', sa.String),
+    sa.column('text_hash', sa.String),
+)
+
+
+# Function to hash existing quotes in id order; only the first copy of a duplicate
+# gets the hash, later copies keep NULL so the unique index can be created
+def backfill_text_hashes(connection):
+    seen = set()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(quotes.c.id, quotes.c.text).where(quotes.c.id > last_id)
+            .order_by(quotes.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for quote_id, text in rows:
+            text_hash = quote_text_hash(text)
+            if text_hash not in seen:
+                seen.add(text_hash)
+                updates.append({'b_id': quote_id, 'b_hash': text_hash})
+        if updates:
+            connection.execute(
+                quotes.update().where(quotes.c.id == sa.bindparam('b_id')).values(text_hash=sa.bindparam('b_hash')),
+                updates
+            )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.add_column('quotes', sa.Column('text_hash', sa.String(length=64), nullable=True))
+    backfill_text_hashes(op.get_bind())
+    op.create_index('ix_quotes_text_hash', 'quotes', ['text_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_quotes_text_hash', table_name='quotes')
+    op.drop_column('quotes', 'text_hash')
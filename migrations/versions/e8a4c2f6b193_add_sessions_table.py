@@ -0,0 +1,32 @@
+"""Add the sessions table for SQL-backed sessions
+
+Revision ID: e8a4c2f6b193
+Revises: d3b7e2a9c481
+Create Date: 2026-10-19 00:31:27.904552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4c2f6b193'
+down_revision = 'd3b7e2a9c481'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sessions',
+        sa.Column('session_id', sa.String(length=255), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('expiry', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('session_id'),
+    )
+    op.create_index('ix_sessions_expiry', 'sessions', ['expiry'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sessions_expiry', table_name='sessions')
+    op.drop_table('sessions')
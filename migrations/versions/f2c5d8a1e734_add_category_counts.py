@@ -0,0 +1,189 @@
+"""Add trigger-maintained category counts for the quotes listing
+
+Revision ID: f2c5d8a1e734
+Revises: e8a4c2f6b193
+Create Date: 2026-10-19 10:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c5d8a1e734'
+down_revision = 'e8a4c2f6b193'
+branch_labels = None
+depends_on = None
+
+# The triggers and initial counts as they stood at this revision (src/category_counts.py may change later)
+
+# category_counts row holding the number of quotes without any category
+UNCATEGORIZED_ID = 0
+
+_counts = sa.table('category_counts', sa.column('category_id', sa.Integer), sa.column('quote_count', sa.Integer))
+_quotes = sa.table('quotes', sa.column('id', sa.Integer))
+_quote_categories = sa.table('quote_categories', sa.column('quote_id', sa.Integer), sa.column('category_id', sa.Integer))
+
+# PostgreSQL: statement-level triggers, so a bulk insert adjusts each count once per statement
+POSTGRES_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION category_counts_links_inserted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO category_counts (category_id, quote_count)
+        SELECT category_id, count(*) FROM new_links GROUP BY category_id
+        ON CONFLICT (category_id) DO UPDATE SET quote_count = category_counts.quote_count + EXCLUDED.quote_count;
+        -- Quotes whose only links are the new ones were uncategorized until now
+        UPDATE category_counts SET quote_count = quote_count - (
+            SELECT count(DISTINCT n.quote_id) FROM new_links n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM quote_categories q
+                WHERE q.quote_id = n.quote_id AND NOT EXISTS (
+                    SELECT 1 FROM new_links o WHERE o.quote_id = q.quote_id AND o.category_id = q.category_id))
+        ) WHERE category_id = {UNCATEGORIZED_ID};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION category_counts_links_deleted() RETURNS trigger AS $$
+    BEGIN
+        UPDATE category_counts SET quote_count = category_counts.quote_count - removed.links
+        FROM (SELECT category_id, count(*) AS links FROM old_links GROUP BY category_id) AS removed
+        WHERE category_counts.category_id = removed.category_id;
+        UPDATE category_counts SET quote_count = quote_count + (
+            SELECT count(DISTINCT o.quote_id) FROM old_links o
+            WHERE EXISTS (SELECT 1 FROM quotes WHERE quotes.id = o.quote_id)
+              AND NOT EXISTS (SELECT 1 FROM quote_categories q WHERE q.quote_id = o.quote_id)
+        ) WHERE category_id = {UNCATEGORIZED_ID};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION category_counts_quotes_inserted() RETURNS trigger AS $$
+    BEGIN
+        UPDATE category_counts SET quote_count = quote_count + (SELECT count(*) FROM new_quotes)
+        WHERE category_id = {UNCATEGORIZED_ID};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION category_counts_quotes_deleted() RETURNS trigger AS $$
+    BEGIN
+        UPDATE category_counts SET quote_count = quote_count - (
+            SELECT count(*) FROM old_quotes o
+            WHERE NOT EXISTS (SELECT 1 FROM quote_categories q WHERE q.quote_id = o.id)
+        ) WHERE category_id = {UNCATEGORIZED_ID};
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER category_counts_links_insert AFTER INSERT ON quote_categories
+    REFERENCING NEW TABLE AS new_links FOR EACH STATEMENT EXECUTE FUNCTION category_counts_links_inserted()
+    """,
+    """
+    CREATE TRIGGER category_counts_links_delete AFTER DELETE ON quote_categories
+    REFERENCING OLD TABLE AS old_links FOR EACH STATEMENT EXECUTE FUNCTION category_counts_links_deleted()
+    """,
+    """
+    CREATE TRIGGER category_counts_quotes_insert AFTER INSERT ON quotes
+    REFERENCING NEW TABLE AS new_quotes FOR EACH STATEMENT EXECUTE FUNCTION category_counts_quotes_inserted()
+    """,
+    """
+    CREATE TRIGGER category_counts_quotes_delete AFTER DELETE ON quotes
+    REFERENCING OLD TABLE AS old_quotes FOR EACH STATEMENT EXECUTE FUNCTION category_counts_quotes_deleted()
+    """,
+]
+
+POSTGRES_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS category_counts_links_insert ON quote_categories",
+    "DROP TRIGGER IF EXISTS category_counts_links_delete ON quote_categories",
+    "DROP TRIGGER IF EXISTS category_counts_quotes_insert ON quotes",
+    "DROP TRIGGER IF EXISTS category_counts_quotes_delete ON quotes",
+    "DROP FUNCTION IF EXISTS category_counts_links_inserted()",
+    "DROP FUNCTION IF EXISTS category_counts_links_deleted()",
+    "DROP FUNCTION IF EXISTS category_counts_quotes_inserted()",
+    "DROP FUNCTION IF EXISTS category_counts_quotes_deleted()",
+]
+
+# SQLite (development): row-level triggers
+SQLITE_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS category_counts_links_insert AFTER INSERT ON quote_categories BEGIN
+        INSERT OR IGNORE INTO category_counts (category_id, quote_count) VALUES (new.category_id, 0);
+        UPDATE category_counts SET quote_count = quote_count + 1 WHERE category_id = new.category_id;
+        UPDATE category_counts SET quote_count = quote_count - 1
+        WHERE category_id = {UNCATEGORIZED_ID} AND NOT EXISTS (
+            SELECT 1 FROM quote_categories WHERE quote_id = new.quote_id AND category_id != new.category_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS category_counts_links_delete AFTER DELETE ON quote_categories BEGIN
+        UPDATE category_counts SET quote_count = quote_count - 1 WHERE category_id = old.category_id;
+        UPDATE category_counts SET quote_count = quote_count + 1
+        WHERE category_id = {UNCATEGORIZED_ID}
+          AND EXISTS (SELECT 1 FROM quotes WHERE id = old.quote_id)
+          AND NOT EXISTS (SELECT 1 FROM quote_categories WHERE quote_id = old.quote_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS category_counts_quotes_insert AFTER INSERT ON quotes BEGIN
+        UPDATE category_counts SET quote_count = quote_count + 1 WHERE category_id = {UNCATEGORIZED_ID};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS category_counts_quotes_delete AFTER DELETE ON quotes BEGIN
+        UPDATE category_counts SET quote_count = quote_count - 1
+        WHERE category_id = {UNCATEGORIZED_ID}
+          AND NOT EXISTS (SELECT 1 FROM quote_categories WHERE quote_id = old.id);
+    END
+    """,
+]
+
+SQLITE_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS category_counts_links_insert",
+    "DROP TRIGGER IF EXISTS category_counts_links_delete",
+    "DROP TRIGGER IF EXISTS category_counts_quotes_insert",
+    "DROP TRIGGER IF EXISTS category_counts_quotes_delete",
+]
+
+
+def _fill_category_counts(connection):
+    linked = sa.select(_quote_categories.c.category_id, sa.func.count().label('quote_count')) \
+        .group_by(_quote_categories.c.category_id)
+    uncategorized = sa.select(sa.func.count()).select_from(_quotes).where(
+        ~sa.exists().where(_quote_categories.c.quote_id == _quotes.c.id))
+    rows = [{'category_id': category_id, 'quote_count': quote_count}
+            for category_id, quote_count in connection.execute(linked)]
+    rows.append({'category_id': UNCATEGORIZED_ID, 'quote_count': connection.execute(uncategorized).scalar()})
+    connection.execute(sa.insert(_counts), rows)
+
+
+def _run(statements):
+    for statement in statements:
+        op.execute(sa.text(statement))
+
+
+def upgrade():
+    op.create_table(
+        'category_counts',
+        sa.Column('category_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('quote_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('category_id'),
+    )
+    # Triggers on quotes and quote_categories, then the initial counts
+    connection = op.get_bind()
+    if connection.dialect.name == 'postgresql':
+        _run(POSTGRES_DROP_DDL + POSTGRES_DDL)
+    elif connection.dialect.name == 'sqlite':
+        _run(SQLITE_DROP_DDL + SQLITE_DDL)
+    else:
+        raise RuntimeError(f"No category count triggers for dialect {connection.dialect.name}.")
+    _fill_category_counts(connection)
+
+
+def downgrade():
+    _run({'postgresql': POSTGRES_DROP_DDL, 'sqlite': SQLITE_DROP_DDL}.get(op.get_bind().dialect.name, []))
+    op.drop_table('category_counts')
@@ -0,0 +1,107 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src import create_app
+from src.config import config_options
+from src.current_user import get_current_user
+from src.models import db, User
+from src.passwords import password_hasher, login_limiter
+
+BENCH_PASSWORD = 'bench-password'
+
+
+# Function to build an app hashing passwords with `hash_workers` pool processes (0: inline) on a scratch database
+def create_bench_app(hash_workers, users=10, database_url=None):
+    env = os.getenv("FLASK_ENV", "default")
+    base = config_options.get(env, config_options["default"])
+    overrides = {
+        'SQLALCHEMY_DATABASE_URI': database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'logins.db'),
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_BACKEND': 'local',
+        'SESSION_BACKEND': 'cookie',
+        'PASSWORD_HASH_WORKERS': hash_workers,
+    }
+    app = create_app(type('LoginBenchConfig', (base,), overrides))
+
+    # A light authenticated page standing in for browsing
+    def browse():
+        user = get_current_user()
+        return user.username if user else 'anonymous'
+
+    app.add_url_rule('/_bench/browse', 'bench_browse', browse)
+    with app.app_context():
+        db.create_all()
+        password_hash = password_hasher.hash(BENCH_PASSWORD)
+        db.session.add_all([User(username=f'bench{number}', email=f'bench{number}@example.com',
+                                 password_hash=password_hash) for number in range(users)])
+        db.session.commit()
+    return app
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    return {
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p99_ms': round(timings[max(int(len(timings) * 0.99) - 1, 0)], 3),
+    }
+
+
+def _browse(app, requests, timings):
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench0', 'password': BENCH_PASSWORD})
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get('/_bench/browse')
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+def _log_in(app, number, requests, timings):
+    client = app.test_client()
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.post('/login', data={'username': f'bench{number}', 'password': BENCH_PASSWORD})
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+# Function to time browsing while other threads log in, once per pool size.
+# Returns {hash_workers: {'browse': summary, 'login': summary}}.
+def benchmark_logins(pool_sizes=(0, 1), browse_requests=500, login_requests=20, browse_threads=4, login_threads=4):
+    results = {}
+    for hash_workers in pool_sizes:
+        app = create_bench_app(hash_workers, users=login_threads)
+        login_limiter.clear()
+        browse_timings, login_timings = [], []
+        with ThreadPoolExecutor(max_workers=browse_threads + login_threads) as executor:
+            futures = [executor.submit(_log_in, app, number, login_requests, login_timings)
+                       for number in range(login_threads)]
+            futures += [executor.submit(_browse, app, browse_requests, browse_timings) for _ in range(browse_threads)]
+            for future in futures:
+                future.result()
+        results[hash_workers] = {'browse': _summary(browse_timings), 'login': _summary(login_timings)}
+        password_hasher.shutdown()
+    return results
+
+
+# Command line entry point; run from the repository root: python -m scripts.login_bench [--pool-size N ...]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time browsing while other threads log in.")
+    parser.add_argument('--pool-size', dest='pool_sizes', action='append', type=int,
+                        help='Hashing processes to measure (repeatable; default: 0 and 1).')
+    parser.add_argument('--requests', type=int, default=500, help='Timed browse requests per browsing thread.')
+    parser.add_argument('--logins', type=int, default=20, help='Logins per logging-in thread.')
+    args = parser.parse_args(argv)
+    results = benchmark_logins(args.pool_sizes or (0, 1), browse_requests=args.requests, login_requests=args.logins)
+    print(f"{'pool':<6}{'request':<9}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for pool_size, kinds in results.items():
+        for kind, summary in kinds.items():
+            print(f"{pool_size:<6}{kind:<9}{summary['mean_ms']:>10}{summary['p50_ms']:>10}{summary['p99_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from flask import session
+from src import create_app
+from src.config import config_options
+from src.models import db
+from src.sessions import SESSION_BACKENDS
+
+
+# Function to build an app using the given session backend on a scratch database
+def create_bench_app(backend, database_url=None):
+    env = os.getenv("FLASK_ENV", "default")
+    base = config_options.get(env, config_options["default"])
+    overrides = {
+        'SQLALCHEMY_DATABASE_URI': database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'sessions.db'),
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_BACKEND': 'local',
+        'SESSION_BACKEND': backend,
+        'SESSION_FILE_DIR': tempfile.mkdtemp(),
+    }
+    app = create_app(type('SessionBenchConfig', (base,), overrides))
+
+    # Minimal endpoints, so the timings are dominated by loading and saving the session
+    def log_in():
+        session['user_id'] = 1
+        return 'ok'
+
+    def read():
+        return str(session.get('user_id'))
+
+    def write():
+        session['visits'] = session.get('visits', 0) + 1
+        return 'ok'
+
+    app.add_url_rule('/_bench/login', 'bench_login', log_in)
+    app.add_url_rule('/_bench/read', 'bench_read', read)
+    app.add_url_rule('/_bench/write', 'bench_write', write)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def _timings(client, path, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get(path)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    return {
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+    }
+
+
+# Function to time logged-in requests that only read the session and ones that modify it.
+# Returns {backend: {'read': summary, 'write': summary}}.
+def benchmark_sessions(backends=SESSION_BACKENDS, requests=500, warmup=20, database_url=None):
+    results = {}
+    for backend in backends:
+        app = create_bench_app(backend, database_url)
+        client = app.test_client()
+        client.get('/_bench/login')
+        _timings(client, '/_bench/read', warmup)
+        results[backend] = {
+            'read': _summary(_timings(client, '/_bench/read', requests)),
+            'write': _summary(_timings(client, '/_bench/write', requests)),
+        }
+    return results
+
+
+# Command line entry point; run from the repository root: python -m scripts.session_bench [--backend NAME ...]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-request session overhead across the session backends.")
+    parser.add_argument('--backend', dest='backends', action='append', choices=SESSION_BACKENDS,
+                        help='Backend to measure (repeatable; default: all).')
+    parser.add_argument('--requests', type=int, default=500, help='Timed requests per backend and mode.')
+    args = parser.parse_args(argv)
+    results = benchmark_sessions(args.backends or SESSION_BACKENDS, args.requests)
+    print(f"{'backend':<12}{'mode':<7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for backend, modes in results.items():
+        for mode, summary in modes.items():
+            print(f"{backend:<12}{mode:<7}{summary['mean_ms']:>10}{summary['p50_ms']:>10}{summary['p95_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
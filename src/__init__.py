@@ -2,11 +2,21 @@ import os
 from dotenv import load_dotenv
 from flask import Flask
 from src.models import db
+from src.cache import snapshot_cache
+from src.votes import vote_buffer
+from src.current_user import current_user_loader
+from src.passwords import password_hasher, login_limiter
+from src.upstream import upstream
 from src.routes import routes
-from flask_session import Session
+from src.commands import register_commands
+from src.sessions import init_sessions
+from src.log_config import configure_logging
+from src.instrumentation import request_metrics
 from flask_wtf.csrf import CSRFProtect
 from flask_cors import CORS
 from flask_migrate import Migrate
+from sqlalchemy.orm import configure_mappers
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,19 +26,36 @@ def create_app(config_class):
 
     # Load configuration
     app.config.from_object(config_class)
+    configure_logging(app)
 
     # Ensure DATABASE_URL is set
     if not app.config.get("SQLALCHEMY_DATABASE_URI"):
         raise ValueError("DATABASE_URL is not set. Check your environment variables.")
 
+    # Trust X-Forwarded-For from the configured number of proxies, so request.remote_addr is the client
+    if app.config.get("PROXY_FIX_HOPS"):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_HOPS"])
+
     # Initialize extensions
     db.init_app(app)
+    # Resolve relationships and backrefs (e.g. Quote.user) before any query options use them
+    configure_mappers()
+    snapshot_cache.init_app(app)
+    vote_buffer.init_app(app)
+    current_user_loader.init_app(app)
+    password_hasher.init_app(app)
+    login_limiter.init_app(app)
+    request_metrics.init_app(app)
+    upstream.init_app(app)
     Migrate(app, db)
     CSRFProtect(app)
-    Session(app)
+    init_sessions(app)
     CORS(app, resources={r"/*": {"origins": ["http://localhost:3000"]}}, supports_credentials=True)
 
     # Register blueprints
     app.register_blueprint(routes)
 
+    # Register CLI commands
+    register_commands(app)
+
     return app
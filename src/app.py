@@ -20,17 +20,16 @@ app = create_app(config_class)
 # Initialize Flask-Migrate
 migrate = Migrate(app, db)  
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by create_app from the LOG_* settings
 logger = logging.getLogger(__name__)
 
 # Debugging info
-logger.info(f"Current working directory: {os.getcwd()}")
-logger.info(f"Python path: {sys.path}")
+logger.info("Current working directory: %s", os.getcwd())
+logger.debug("Python path: %s", sys.path)
 
 # Determine the port
 port = int(os.environ.get("PORT", 10000)) 
-logger.info(f"Starting app on port {port}")
+logger.info("Starting app on port %s", port)
 
 # Run the app in development mode
 if __name__ == "__main__":
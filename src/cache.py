@@ -0,0 +1,300 @@
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Data version scopes: quote and category content changes rarely, vote counters on every vote
+CONTENT = 'content'
+VOTES = 'votes'
+
+# Tables whose writes make cached snapshots stale, and the scope they bump
+WATCHED_TABLES = {'quotes': CONTENT, 'categories': CONTENT, 'quote_categories': CONTENT,
+                  'daily_quotes': CONTENT, 'category_leaderboard': VOTES}
+
+# Quote columns written by votes; updates touching only these bump VOTES instead of CONTENT
+COUNTER_COLUMNS = {'upvotes', 'downvotes'}
+
+VERSION_KEY = 'data_version'
+_DIRTY_FLAG = 'snapshot_cache_dirty'
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with optional per-entry expiry."""
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # Function to set a key only if it is absent (or expired); returns True if it was set
+    def add(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] >= now):
+                return False
+            self._data[key] = (value, now + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Function to build the optional shared cachelib backend from config
+def create_shared_backend(config):
+    backend = config.get('CACHE_BACKEND', 'local')
+    timeout = config.get('CACHE_DEFAULT_TTL', 300)
+
+    if backend == 'filesystem':
+        from cachelib import FileSystemCache
+        return FileSystemCache(config.get('CACHE_DIR', '/tmp/quotes-cache'), default_timeout=timeout)
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            logger.warning("CACHE_BACKEND is 'redis' but the redis package is not installed; using the local cache only.")
+            return None
+        from cachelib import RedisCache
+        client = redis.Redis.from_url(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        return RedisCache(host=client, default_timeout=timeout, key_prefix='quotes:')
+    if backend != 'local':
+        logger.warning("Unknown CACHE_BACKEND %r; using the local cache only.", backend)
+    return None
+
+
+class SnapshotCache:
+    """Two-tier (in-process LRU + optional shared cachelib) cache keyed by data versions.
+
+    Each scope's version is bumped after any commit that wrote to its WATCHED_TABLES,
+    so entries built from older data are simply never looked up again and age out
+    of the LRU.
+    """
+
+    def __init__(self):
+        self.local = LRUCache()
+        self.shared = None
+        self.ttl = 300
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        self.local = LRUCache(maxsize=app.config.get('CACHE_LOCAL_SIZE', 128), ttl=self.ttl)
+        self.shared = create_shared_backend(app.config)
+        register_invalidation_listeners()
+        app.extensions['snapshot_cache'] = self
+
+    def data_version(self, scope=CONTENT):
+        if self.shared is not None:
+            key = f"{VERSION_KEY}:{scope}"
+            try:
+                version = self.shared.get(key)
+                if version is None:
+                    self.shared.add(key, 0, timeout=0)
+                    version = self.shared.get(key)
+                if version is not None:
+                    return int(version)
+            except Exception as e:
+                logger.warning("Shared cache unavailable, falling back to local data version: %s", e)
+        return self._versions.get(scope, 0)
+
+    def bump_version(self, scope=CONTENT):
+        with self._lock:
+            self._versions[scope] = version = self._versions.get(scope, 0) + 1
+        if self.shared is not None:
+            try:
+                if self.shared.inc(f"{VERSION_KEY}:{scope}") is None:
+                    self.shared.set(f"{VERSION_KEY}:{scope}", version, timeout=0)
+            except Exception as e:
+                logger.warning("Could not bump shared data version: %s", e)
+        logger.debug("Snapshot cache %s version bumped.", scope)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                logger.warning("Shared cache read failed for %s: %s", key, e)
+                value = None
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value, timeout=ttl)
+            except Exception as e:
+                logger.warning("Shared cache write failed for %s: %s", key, e)
+
+    # Function to set a key only if no worker has set it yet; returns True if this call set it
+    def add(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if self.shared is not None:
+            try:
+                added = self.shared.add(key, value, timeout=ttl)
+            except Exception as e:
+                logger.warning("Shared cache add failed for %s: %s", key, e)
+            else:
+                if added:
+                    self.local.set(key, value, ttl)
+                return bool(added)
+        return self.local.add(key, value, ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(key)
+            except Exception as e:
+                logger.warning("Shared cache delete failed for %s: %s", key, e)
+
+    # Context manager giving one caller at a time the right to do `name`'s work.
+    # Threads in this process queue on a lock; other workers are kept out by an
+    # expiring add() on the shared backend. Yields False if the lock was not acquired.
+    @contextmanager
+    def lock(self, name, timeout=30):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+        if not key_lock.acquire(timeout=timeout):
+            yield False
+            return
+        try:
+            token = uuid.uuid4().hex
+            lock_key = f"lock:{name}"
+            if self.shared is None:
+                yield True
+                return
+            try:
+                acquired = self.shared.add(lock_key, token, timeout=timeout)
+            except Exception as e:
+                logger.warning("Shared lock unavailable for %s, using the process lock only: %s", name, e)
+                yield True
+                return
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    try:
+                        if self.shared.get(lock_key) == token:
+                            self.shared.delete(lock_key)
+                    except Exception as e:
+                        logger.warning("Could not release shared lock %s: %s", name, e)
+        finally:
+            key_lock.release()
+
+    # Function to get `name` built from the current data of `scopes`, building it on a miss
+    def get_or_build(self, name, builder, ttl=None, scopes=(CONTENT,)):
+        key = name + ''.join(f":{scope}{self.data_version(scope)}" for scope in scopes)
+        value = self.get(key)
+        if value is None:
+            value = builder()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+
+snapshot_cache = SnapshotCache()
+
+
+# Function to get the scope a write to `table` with the changed `columns` (None: a whole row) bumps
+def _scope_for(table, columns=None):
+    scope = WATCHED_TABLES.get(table)
+    if scope == CONTENT and table == 'quotes' and columns and set(columns) <= COUNTER_COLUMNS:
+        return VOTES
+    return scope
+
+
+# Session event hooks used to invalidate snapshots after relevant commits
+def _mark_dirty(session, scope):
+    if scope is not None:
+        session.info.setdefault(_DIRTY_FLAG, set()).add(scope)
+
+
+def _after_flush(session, flush_context):
+    for obj in itertools.chain(session.new, session.deleted):
+        _mark_dirty(session, _scope_for(getattr(obj, '__tablename__', None)))
+    for obj in session.dirty:
+        table = getattr(obj, '__tablename__', None)
+        if table in WATCHED_TABLES:
+            changed = [attr.key for attr in inspect(obj).attrs if attr.history.has_changes()]
+            _mark_dirty(session, _scope_for(table, changed))
+
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        statement = orm_execute_state.statement
+        table = getattr(getattr(statement, 'table', None), 'name', None)
+        columns = None
+        if orm_execute_state.is_update:
+            # The SET clause of update().values(); executemany updates without it count as content
+            columns = [getattr(column, 'key', column) for column in statement._values or ()]
+        _mark_dirty(orm_execute_state.session, _scope_for(table, columns))
+
+
+def _after_commit(session):
+    for scope in sorted(session.info.pop(_DIRTY_FLAG, ())):
+        snapshot_cache.bump_version(scope)
+
+
+def _after_rollback(session):
+    session.info.pop(_DIRTY_FLAG, None)
+
+
+_listeners_registered = False
+
+
+def register_invalidation_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_rollback', _after_rollback)
+    _listeners_registered = True
@@ -0,0 +1,117 @@
+import click
+import logging
+from src.models import db
+from src.cache import snapshot_cache, CONTENT, VOTES
+from src.consolidation import run_consolidation
+from src.search import install_search_index, install_trigram_index
+
+logger = logging.getLogger(__name__)
+
+
+def register_commands(app):
+    @app.cli.command('consolidate-categories')
+    @click.option('--force', is_flag=True, help='Run even if this consolidation version was already recorded.')
+    def consolidate_categories_command(force):
+        """Rename and merge legacy categories (one-shot, idempotent)."""
+        from src.leaderboard import rebuild_leaderboards
+        with db.engine.begin() as connection:
+            changes = run_consolidation(connection, force=force)
+            if changes:
+                # Merged categories leave leaderboard rows under the old ids
+                rebuild_leaderboards(connection)
+        if changes is None:
+            click.echo("Category consolidation already applied.")
+        else:
+            snapshot_cache.bump_version(CONTENT)
+            snapshot_cache.bump_version(VOTES)
+            click.echo(f"Category consolidation applied {changes} change(s).")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Recreate the full-text and trigram search indexes and reindex every quote."""
+        with db.engine.begin() as connection:
+            install_search_index(connection)
+            install_trigram_index(connection)
+        click.echo("Search index rebuilt.")
+
+    @app.cli.command('rebuild-leaderboards')
+    def rebuild_leaderboards_command():
+        """Recompute every category leaderboard from the quote vote counters."""
+        from src.leaderboard import rebuild_leaderboards
+        with db.engine.begin() as connection:
+            rows = rebuild_leaderboards(connection)
+        snapshot_cache.bump_version(VOTES)
+        click.echo(f"Leaderboards rebuilt with {rows} entries.")
+
+    @app.cli.command('refresh-trending')
+    @click.option('--rebuild-buckets', is_flag=True, help='Recount the hourly vote buckets from the votes table first.')
+    def refresh_trending_command(rebuild_buckets):
+        """Recompute the trending quotes list."""
+        import datetime
+        from src.trending import rebuild_vote_buckets, refresh_trending_from_config
+        if rebuild_buckets:
+            since = datetime.datetime.utcnow() - datetime.timedelta(hours=app.config.get('TRENDING_BUCKET_RETENTION_HOURS', 168))
+            with db.engine.begin() as connection:
+                click.echo(f"Rebuilt {rebuild_vote_buckets(connection, since)} vote buckets.")
+        click.echo(f"{refresh_trending_from_config(app.config)} trending quotes.")
+
+    @app.cli.command('import-quotes')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['json', 'jsonl', 'csv']), help='Input format (default: from the extension).')
+    @click.option('--batch-size', default=1000, show_default=True, help='Quotes per transaction.')
+    @click.option('--dry-run', is_flag=True, help='Report what would be imported without writing.')
+    @click.option('--resume', is_flag=True, help='Continue from the last saved checkpoint.')
+    @click.option('--checkpoint', help='Checkpoint file (default: <path>.checkpoint).')
+    def import_quotes_command(path, fmt, batch_size, dry_run, resume, checkpoint):
+        """Bulk import quotes from a JSON, JSONL or CSV file."""
+        from src.import_quotes import run_import
+        stats = run_import(path, fmt, batch_size, dry_run, resume, checkpoint, progress=click.echo)
+        click.echo(f"{stats['imported']} new quotes, {stats['duplicates']} duplicates skipped, "
+                   f"{stats['invalid']} invalid records, {stats['categories_created']} categories created.")
+
+    @app.cli.command('check-query-plans')
+    @click.option('--database-url', help='Scratch database to seed (default: a temporary SQLite file).')
+    @click.option('--min-rows', default=1000, show_default=True, help='Tables with at least this many rows must not be scanned.')
+    def check_query_plans_command(database_url, min_rows):
+        """Seed a scratch database, EXPLAIN every query the app issues and fail on full table or index scans."""
+        from src.query_plans import create_plan_app, seed_database, check_query_plans
+        plan_app = create_plan_app(database_url)
+        with plan_app.app_context():
+            seed_database()
+        violations, checked = check_query_plans(plan_app, min_rows=min_rows)
+        for scenario, table, statement in violations:
+            click.echo(f"[{scenario}] full scan on {table}:\n  {' '.join(statement.split())}\n", err=True)
+        click.echo(f"Checked {checked} statements: {len(violations)} full scan(s) on large tables.")
+        if violations:
+            raise SystemExit(1)
+
+    @app.cli.command('ingest-quotes')
+    @click.option('--total', default=500, show_default=True, help='Number of new quotes to store.')
+    @click.option('--batch-size', type=int, help='Quotes per API request (default: INGEST_BATCH_SIZE).')
+    @click.option('--concurrency', type=int, help='Requests in flight (default: INGEST_CONCURRENCY).')
+    @click.option('--resume/--restart', default=True, show_default=True, help='Continue from the saved progress.')
+    @click.option('--checkpoint', help='Progress file (default: INGEST_CHECKPOINT).')
+    def ingest_quotes_command(total, batch_size, concurrency, resume, checkpoint):
+        """Fetch random quotes from the API within its rate limit and store the new ones."""
+        from src.ingest import run_ingestion
+        stored = run_ingestion(app, total, batch_size, concurrency, resume, checkpoint, progress=click.echo)
+        click.echo(f"{stored} new quotes stored.")
+
+    @app.cli.command('scheduler')
+    @click.option('--wait/--no-wait', default=True, show_default=True,
+                  help='Stand by until the current leader exits, instead of quitting.')
+    def scheduler_command(wait):
+        """Run scheduled jobs in the foreground (one leader across all processes)."""
+        from src.tasks import run_scheduler
+        if not run_scheduler(app, wait=wait):
+            click.echo("Another scheduler is already running.")
+
+    @app.cli.command('materialize-daily-quotes')
+    @click.option('--days-ahead', type=int, help='Also pick featured quotes for this many future days (default: QOD_PRECOMPUTE_DAYS).')
+    def materialize_daily_quotes_command(days_ahead):
+        """Store today's featured and community quotes if they are not stored yet."""
+        from src.daily import materialize_daily_quotes
+        if days_ahead is None:
+            days_ahead = app.config.get('QOD_PRECOMPUTE_DAYS', 0)
+        stored = materialize_daily_quotes(days_ahead=days_ahead)
+        click.echo(f"{stored} daily quotes stored.")
@@ -9,15 +9,108 @@ class Config:
         "max_overflow": 10,
         "pool_timeout": 30
     }
-    SESSION_TYPE = "filesystem"
+    # Session storage: "cookie" (signed cookie, no server state), "sql", "cachelib" or "filesystem"; see src/sessions.py
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "cookie")
+    SESSION_SWEEP_BATCH_SIZE = 1000
     SESSION_PERMANENT = False  
     SESSION_USE_SIGNER = True
     SESSION_COOKIE_HTTPONLY = True
+    # Snapshot cache: "local" (per process), "filesystem" or "redis" (shared across workers)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", 60))
+    CACHE_LOCAL_SIZE = 128
+    CACHE_DIR = os.getenv("CACHE_DIR", "/tmp/quotes-cache")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # quotes.rest client: base URL, token, (connect, read) timeouts, retries and circuit breaker
+    QUOTES_API_URL = os.getenv("QUOTES_API_URL", "https://quotes.rest")
+    QUOTES_API_TOKEN = os.getenv("API_TOKEN")
+    UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+    UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", 10))
+    UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", 2))
+    UPSTREAM_BACKOFF_BASE = 0.5
+    UPSTREAM_BACKOFF_MAX = 30
+    UPSTREAM_POOL_SIZE = 10
+    UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", 5))
+    UPSTREAM_BREAKER_RESET = int(os.getenv("UPSTREAM_BREAKER_RESET", 60))
+    # Bulk ingestion from quotes.rest: request quota per period, burst, quotes per request, parallel requests
+    INGEST_QUOTA_REQUESTS = int(os.getenv("INGEST_QUOTA_REQUESTS", 10))
+    INGEST_QUOTA_PERIOD = int(os.getenv("INGEST_QUOTA_PERIOD", 3600))
+    INGEST_BURST = int(os.getenv("INGEST_BURST", 1))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 10))
+    INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 4))
+    INGEST_CHECKPOINT = os.getenv("INGEST_CHECKPOINT", "ingest.checkpoint")
+    # Quote of the day: cache lifetime, and the wait after a failed fetch when the API sends no Retry-After
+    QOD_CACHE_TTL = int(os.getenv("QOD_CACHE_TTL", 3600))
+    QOD_RETRY_AFTER = int(os.getenv("QOD_RETRY_AFTER", 300))
+    # Days after today whose featured quote the nightly job picks in advance
+    QOD_PRECOMPUTE_DAYS = int(os.getenv("QOD_PRECOMPUTE_DAYS", 0))
+    # Job runner (flask scheduler): timezone for cron jobs (default: local), leader lock file when not on PostgreSQL
+    SCHEDULER_TIMEZONE = os.getenv("SCHEDULER_TIMEZONE")
+    SCHEDULER_LOCK_FILE = os.getenv("SCHEDULER_LOCK_FILE")
+    SCHEDULER_LEADER_POLL = 30
+    SCHEDULER_MISFIRE_GRACE_TIME = 3600
+    # Personalized feed: page sizes, newest and best-rated quotes considered per category, categories considered per user
+    FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", 20))
+    FEED_HOME_SIZE = int(os.getenv("FEED_HOME_SIZE", 6))
+    FEED_CANDIDATES_PER_CATEGORY = int(os.getenv("FEED_CANDIDATES_PER_CATEGORY", 100))
+    FEED_MAX_CATEGORIES = int(os.getenv("FEED_MAX_CATEGORIES", 20))
+    # Home page: best quotes shown per category (from the category leaderboards)
+    HOME_TOP_PER_CATEGORY = int(os.getenv("HOME_TOP_PER_CATEGORY", 3))
+    # Trending: window and decay half-life of the scores, list size, how old the list may get before a
+    # request refreshes it (the scheduler refreshes it every 5 minutes), and how long vote buckets are kept
+    TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", 24))
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 6))
+    TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", 50))
+    TRENDING_MAX_AGE_MINUTES = int(os.getenv("TRENDING_MAX_AGE_MINUTES", 15))
+    TRENDING_BUCKET_RETENTION_HOURS = int(os.getenv("TRENDING_BUCKET_RETENTION_HOURS", 168))
+    # Password hashing: werkzeug method (e.g. "pbkdf2:sha256:600000") and salt length; changing them
+    # rehashes each password at its next login. Hashing runs in a pool of PASSWORD_HASH_WORKERS processes
+    # per web worker (0: inline), with at most PASSWORD_HASH_MAX_PENDING passwords waiting per web worker.
+    # A request waits up to PASSWORD_HASH_TIMEOUT seconds (then 503), so run a threaded worker class (see Procfile)
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:260000")
+    PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 8))
+    PASSWORD_HASH_TIMEOUT = 10
+    # Login limiter: failed logins allowed per username and per client address within the window (seconds)
+    LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", 5))
+    LOGIN_MAX_ATTEMPTS_PER_ADDRESS = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_ADDRESS", 20))
+    LOGIN_ATTEMPT_WINDOW = int(os.getenv("LOGIN_ATTEMPT_WINDOW", 300))
+    LOGIN_LIMITER_MAX_KEYS = 10000
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted for client addresses
+    PROXY_FIX_HOPS = int(os.getenv("PROXY_FIX_HOPS", 0))
+    # Logging: root level, per-logger overrides ("sqlalchemy.engine=INFO,urllib3=WARNING"), "text" or
+    # "json" lines, writing through a background queue, and the share of DEBUG records kept
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    LOG_QUEUE = os.getenv("LOG_QUEUE", "false").lower() == "true"
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 1.0))
+    # Instrumentation: Server-Timing headers, the per-process Prometheus endpoint (empty path disables it;
+    # with METRICS_TOKEN set it needs "Authorization: Bearer <token>"), and the threshold above which a
+    # request is logged with its slowest SQL statements
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", 1000))
+    SLOW_REQUEST_SQL_LIMIT = 5
+    # Logged-in user cache: users kept per process, and seconds before a cached user is reloaded
+    CURRENT_USER_CACHE_SIZE = int(os.getenv("CURRENT_USER_CACHE_SIZE", 1024))
+    CURRENT_USER_CACHE_TTL = int(os.getenv("CURRENT_USER_CACHE_TTL", 30))
+    # Write-behind voting: buffer votes in memory and flush them in batches.
+    # The buffer lives in each web worker's memory. With several workers, two clicks by one user
+    # that reach different workers can end differently than in synchronous mode (each worker
+    # toggles against the database, not the other's unflushed vote), and a killed worker loses
+    # up to VOTE_FLUSH_INTERVAL seconds of votes. Keep it off unless one worker serves all votes.
+    VOTE_WRITE_BEHIND = os.getenv("VOTE_WRITE_BEHIND", "false").lower() == "true"
+    VOTE_FLUSH_INTERVAL = float(os.getenv("VOTE_FLUSH_INTERVAL", 2.0))
+    VOTE_FLUSH_MAX_PENDING = int(os.getenv("VOTE_FLUSH_MAX_PENDING", 500))
     DEBUG = False
 
 class DevelopmentConfig(Config):
     """Configuration for development"""
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///dev.db")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
     DEBUG = True
 
 class ProductionConfig(Config):
@@ -0,0 +1,106 @@
+import datetime
+import logging
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+# Bump the version whenever CATEGORY_MAPPING changes so the job runs again.
+CONSOLIDATION_VERSION = 'consolidate_categories_v1'
+
+CATEGORY_MAPPING = {
+    'inspire': 'Inspiration',
+    'management': 'Management',
+    'sports': 'Sports',
+    'life': 'Life',
+    'funny': 'Humor',
+    'students': 'Education',
+    'hardwork': 'Hard Work',
+    'self-improvement': 'Self Improvement',
+    'self-worth': 'Self Worth',
+    'self-imposed-limits': 'Self Imposed Limits',
+}
+
+# Lightweight table definitions so the job can run on a plain connection from the CLI
+categories = sa.table('categories', sa.column('id', sa.Integer), sa.column('name', sa.String))
+quote_categories = sa.table('quote_categories', sa.column('quote_id', sa.Integer), sa.column('category_id', sa.Integer))
+user_preferences = sa.table('user_preferences', sa.column('user_id', sa.Integer), sa.column('category_id', sa.Integer))
+data_migrations = sa.table('data_migrations', sa.column('name', sa.String), sa.column('applied_at', sa.DateTime))
+
+
+# Function to check whether a data job has already been recorded
+def has_run(connection, name=CONSOLIDATION_VERSION):
+    query = sa.select(data_migrations.c.name).where(data_migrations.c.name == name)
+    return connection.execute(query).first() is not None
+
+
+# Function to record that a data job has run
+def record_run(connection, name=CONSOLIDATION_VERSION):
+    connection.execute(sa.insert(data_migrations).values(name=name, applied_at=datetime.datetime.utcnow()))
+
+
+# Function to move every row of an association table from one category to another
+def _move_links(connection, table, key_column, old_id, new_id):
+    already_linked = sa.select(table.c[key_column]).where(table.c.category_id == new_id)
+    connection.execute(
+        sa.insert(table).from_select(
+            [key_column, 'category_id'],
+            sa.select(table.c[key_column], sa.literal(new_id)).where(
+                table.c.category_id == old_id,
+                table.c[key_column].not_in(already_linked)
+            )
+        )
+    )
+    connection.execute(sa.delete(table).where(table.c.category_id == old_id))
+
+
+# Function to rename and merge categories according to CATEGORY_MAPPING
+def consolidate_categories(connection):
+    rows = connection.execute(sa.select(categories.c.id, categories.c.name)).all()
+    category_ids = {row.name.lower(): row.id for row in rows}
+    category_names = {row.id: row.name for row in rows}
+    changes = 0
+
+    for old_name, new_name in CATEGORY_MAPPING.items():
+        old_key = old_name.lower()
+        new_key = new_name.lower()
+        if old_key not in category_ids:
+            continue
+
+        if old_key == new_key:
+            # Only the capitalisation differs; never merge a category into itself
+            category_id = category_ids[old_key]
+            if category_names[category_id] != new_name:
+                connection.execute(sa.update(categories).where(categories.c.id == category_id).values(name=new_name))
+                logger.info("Renamed category '%s' to '%s'", category_names[category_id], new_name)
+                changes += 1
+            continue
+
+        old_id = category_ids.pop(old_key)
+        if new_key not in category_ids:
+            # Rename the category
+            connection.execute(sa.update(categories).where(categories.c.id == old_id).values(name=new_name))
+            category_ids[new_key] = old_id
+            logger.info("Renamed category '%s' to '%s'", old_name, new_name)
+        else:
+            # Merge quotes and user preferences from the old category into the new one
+            new_id = category_ids[new_key]
+            _move_links(connection, quote_categories, 'quote_id', old_id, new_id)
+            _move_links(connection, user_preferences, 'user_id', old_id, new_id)
+            connection.execute(sa.delete(categories).where(categories.c.id == old_id))
+            logger.info("Merged category '%s' into '%s'", old_name, new_name)
+        changes += 1
+
+    return changes
+
+
+# Function to run the consolidation once and record it
+def run_consolidation(connection, force=False):
+    if not force and has_run(connection):
+        logger.info("Category consolidation %s has already run; skipping.", CONSOLIDATION_VERSION)
+        return None
+
+    changes = consolidate_categories(connection)
+    if not has_run(connection):
+        record_run(connection)
+    logger.info("Category consolidation %s applied %d change(s).", CONSOLIDATION_VERSION, changes)
+    return changes
@@ -0,0 +1,118 @@
+import logging
+from flask import g, session
+from sqlalchemy import and_, delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models import db, User, user_preferences
+from src.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class CurrentUser:
+    """The logged-in user as plain data: id, username, email and preferred category ids."""
+
+    def __init__(self, id, username, email, category_ids=()):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.category_ids = frozenset(category_ids)
+
+    def __repr__(self):
+        return f"<CurrentUser {self.id} {self.username}>"
+
+
+class CurrentUserLoader:
+    """Loads the session's user once per request, through a short-lived per-process cache.
+
+    The user row and its preferred category ids come from one query; the result
+    is kept in g for the rest of the request and in an LRU cache for `ttl`
+    seconds. Call invalidate() after changing a user's data so this worker
+    drops its copy at once (other workers catch up when the TTL expires).
+    Cached data is for reads only; writes read the rows they change from the database.
+    """
+
+    def __init__(self, app=None):
+        self.cache = LRUCache(maxsize=1024, ttl=30)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.cache = LRUCache(maxsize=app.config.get('CURRENT_USER_CACHE_SIZE', 1024),
+                              ttl=app.config.get('CURRENT_USER_CACHE_TTL', 30))
+        app.extensions['current_user_loader'] = self
+
+    # Function to load a user with their category ids in one query; None if the user does not exist
+    def load(self, user_id):
+        rows = db.session.query(User.id, User.username, User.email, user_preferences.c.category_id) \
+            .outerjoin(user_preferences, user_preferences.c.user_id == User.id) \
+            .filter(User.id == user_id).all()
+        if not rows:
+            return None
+        first = rows[0]
+        return CurrentUser(first.id, first.username, first.email,
+                           [row.category_id for row in rows if row.category_id is not None])
+
+    def get(self, user_id):
+        user = self.cache.get(user_id)
+        if user is None:
+            user = self.load(user_id)
+            if user is not None:
+                self.cache.set(user_id, user)
+        return user
+
+    def invalidate(self, user_id):
+        self.cache.delete(user_id)
+
+
+current_user_loader = CurrentUserLoader()
+
+
+# Function to get the logged-in user for this request (a CurrentUser), or None
+def get_current_user():
+    user_id = session.get('user_id')
+    # g outlives the request when an app context was already pushed, so the entry is keyed by user id
+    cached = g.get('_current_user')
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+    user = current_user_loader.get(user_id) if user_id is not None else None
+    if user_id is not None and user is None:
+        logger.error("No user found with ID: %s", user_id)
+    g._current_user = (user_id, user)
+    return user
+
+
+# Function to drop cached copies of a user after their data changed
+def invalidate_current_user(user_id):
+    current_user_loader.invalidate(user_id)
+    g.pop('_current_user', None)
+
+
+# Function to build an INSERT for user_preferences that skips rows already present
+def _preference_insert_statement(dialect):
+    if dialect == 'postgresql':
+        return postgresql_insert(user_preferences).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite_insert(user_preferences).on_conflict_do_nothing()
+    return insert(user_preferences)
+
+
+# Function to replace a user's preferred categories, writing only the rows that change.
+# The current rows are read in this transaction, never from the cached CurrentUser: other
+# workers may have changed them within the cache TTL. The caller commits and then calls
+# invalidate_current_user().
+def set_user_category_ids(user_id, category_ids):
+    # Concurrent saves by the same user queue up on the user row (PostgreSQL)
+    db.session.execute(select(User.id).where(User.id == user_id).with_for_update())
+    current_ids = set(db.session.execute(
+        select(user_preferences.c.category_id).where(user_preferences.c.user_id == user_id)).scalars())
+    category_ids = set(category_ids)
+    removed = current_ids - category_ids
+    added = category_ids - current_ids
+    if removed:
+        db.session.execute(delete(user_preferences).where(
+            and_(user_preferences.c.user_id == user_id, user_preferences.c.category_id.in_(removed))))
+    if added:
+        statement = _preference_insert_statement(db.session.get_bind().dialect.name)
+        db.session.execute(statement, [{'user_id': user_id, 'category_id': category_id}
+                                       for category_id in sorted(added)])
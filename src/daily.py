@@ -0,0 +1,129 @@
+import datetime
+import logging
+from sqlalchemy import case, exists, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from src.models import db, Quote, Vote, DailyQuote
+from src.loading import quote_options
+
+logger = logging.getLogger(__name__)
+
+FEATURED = 'featured'
+COMMUNITY = 'community'
+DAILY_KINDS = (FEATURED, COMMUNITY)
+
+# A quote is not chosen as the community quote again within this many days
+COMMUNITY_REPEAT_WINDOW = 30
+
+
+def _day_bounds(day):
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return start, start + datetime.timedelta(days=1)
+
+
+# Function to get the quotes chosen for a day as {kind: Quote}, in one query
+def get_daily_quotes(day):
+    rows = DailyQuote.query.options(
+        joinedload(DailyQuote.quote).options(*quote_options('detail'))
+    ).filter_by(day=day).all()
+    return {row.kind: row.quote for row in rows}
+
+
+# Function to rank quotes by the net votes cast on `day`; returns [(quote_id, score)]
+def rank_community_candidates(day, limit=10, exclude_ids=()):
+    start, end = _day_bounds(day)
+    score = func.sum(case((Vote.vote_type == 'upvote', 1), else_=-1)).label('score')
+    query = db.session.query(Vote.quote_id, score).filter(Vote.created_at >= start, Vote.created_at < end)
+    if exclude_ids:
+        query = query.filter(Vote.quote_id.not_in(exclude_ids))
+    rows = query.group_by(Vote.quote_id).having(score > 0) \
+        .order_by(score.desc(), func.count(Vote.id).desc(), Vote.quote_id).limit(limit)
+    return [(row.quote_id, row.score) for row in rows]
+
+
+def _recent_community_ids(day):
+    since = day - datetime.timedelta(days=COMMUNITY_REPEAT_WINDOW)
+    return [quote_id for (quote_id,) in db.session.query(DailyQuote.quote_id).filter(
+        DailyQuote.kind == COMMUNITY, DailyQuote.day >= since, DailyQuote.day < day
+    )]
+
+
+# Function to choose the community quote for `day` from the votes cast the day before.
+# Falls back to the best-rated quote overall (a full scan) when nobody voted, if local_fallback.
+# Returns (quote_id, score) or None.
+def pick_community_quote(day, local_fallback=True):
+    recent = _recent_community_ids(day)
+    ranked = rank_community_candidates(day - datetime.timedelta(days=1), limit=1, exclude_ids=recent)
+    if ranked or not local_fallback:
+        return ranked[0] if ranked else None
+
+    net = (func.coalesce(Quote.upvotes, 0) - func.coalesce(Quote.downvotes, 0)).label('net')
+    query = db.session.query(Quote.id, net).filter(net > 0)
+    if recent:
+        query = query.filter(Quote.id.not_in(recent))
+    row = query.order_by(net.desc(), Quote.id).first()
+    return (row.id, row.net) if row else None
+
+
+# Function to choose the featured quote for `day`: the API's quote of the day when it is
+# for that day, otherwise (if local_fallback) a quote from our collection never featured before
+def pick_featured_quote(day, today=None, local_fallback=True):
+    today = today or datetime.date.today()
+    quote = Quote.query.filter_by(date_fetched=day, is_featured_qod=True).first()
+    if quote is None and day == today:
+        from src.services import get_quote_of_the_day
+        fetched = get_quote_of_the_day()
+        if fetched is not None and fetched.date_fetched == day and fetched.is_featured_qod:
+            quote = fetched
+    if quote is not None:
+        return quote.id
+    if not local_fallback:
+        return None
+
+    already_featured = exists().where(DailyQuote.quote_id == Quote.id, DailyQuote.kind == FEATURED)
+    quote_id = db.session.query(Quote.id).filter(
+        ~already_featured, Quote.is_featured_qod.isnot(True)
+    ).order_by(func.random()).limit(1).scalar()
+    return quote_id
+
+
+# Function to store the quote chosen for a day; returns False if that day already has one of this kind
+def store_daily_quote(day, kind, quote_id, score=None):
+    db.session.add(DailyQuote(day=day, kind=kind, quote_id=quote_id, score=score))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Another process stored this day's quote first
+        db.session.rollback()
+        return False
+
+
+# Function to fill in any missing daily quotes for `day` and the `days_ahead` days after it.
+# Community quotes depend on the previous day's votes, so they are only computed up to today.
+# Without local_fallback only the API quote and yesterday's votes are used. Returns the number of rows stored.
+def materialize_daily_quotes(day=None, days_ahead=0, local_fallback=True):
+    today = datetime.date.today()
+    day = day or today
+    stored = 0
+    for offset in range(days_ahead + 1):
+        target = day + datetime.timedelta(days=offset)
+        existing = set(kind for (kind,) in db.session.query(DailyQuote.kind).filter_by(day=target))
+
+        if FEATURED not in existing:
+            quote_id = pick_featured_quote(target, today, local_fallback)
+            if quote_id is not None and store_daily_quote(target, FEATURED, quote_id):
+                stored += 1
+        if COMMUNITY not in existing and target <= today:
+            picked = pick_community_quote(target, local_fallback)
+            if picked is not None and store_daily_quote(target, COMMUNITY, *picked):
+                stored += 1
+    if stored:
+        logger.info("Stored %d daily quote(s) starting %s.", stored, day.isoformat())
+    return stored
+
+
+# Function to get today's {kind: Quote}. Read-only: the scheduled job (or
+# `flask materialize-daily-quotes`) stores the rows, so page requests never write them.
+def get_todays_quotes():
+    return get_daily_quotes(datetime.date.today())
@@ -0,0 +1,128 @@
+import datetime
+import logging
+import math
+from collections import Counter
+from flask import current_app
+from sqlalchemy import select, union_all
+from src.models import db, Quote, CategoryLeaderboard, quote_categories, user_preferences
+from src.loading import quote_options
+
+logger = logging.getLogger(__name__)
+
+# Ranking weights: net votes (log-scaled), freshness (halves every RECENCY_HALF_LIFE
+# days) and the share of the user's categories a quote belongs to
+VOTE_WEIGHT = 1.0
+RECENCY_WEIGHT = 2.0
+RECENCY_HALF_LIFE = 7
+MATCH_WEIGHT = 1.0
+
+
+class FeedPage:
+    """One page of a user's ranked feed; next_cursor is None on the last page."""
+
+    def __init__(self, quotes, scores, next_cursor=None):
+        self.quotes = quotes
+        self.scores = scores
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.quotes)
+
+    def __len__(self):
+        return len(self.quotes)
+
+
+# Function to encode a feed position as an opaque cursor string
+def encode_cursor(score, quote_id):
+    return f"{score:.6f}:{quote_id}"
+
+
+# Function to decode a cursor; returns (score, quote_id), or None if it is malformed
+def decode_cursor(cursor):
+    try:
+        score, quote_id = cursor.split(':')
+        return round(float(score), 6), int(quote_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+# Function to get the ids of a user's preferred categories without loading the user
+def user_category_ids(user_id):
+    return [category_id for (category_id,) in db.session.execute(
+        select(user_preferences.c.category_id).where(user_preferences.c.user_id == user_id)
+        .order_by(user_preferences.c.category_id)
+    )]
+
+
+# Function to collect, in one round trip, the newest `per_category` quote ids of each category
+# and its `per_category` best-rated ones from the category leaderboard, so well-voted older
+# quotes still reach the feed. Returns {quote_id: number of the given categories it belongs to}.
+def feed_candidates(category_ids, per_category):
+    if not category_ids:
+        return Counter()
+    # Each branch is a bounded range read on ix_quote_categories_category_id_quote_id
+    # or on the leaderboard's (category_id, score) index
+    newest = [
+        select(quote_categories.c.category_id, quote_categories.c.quote_id)
+        .where(quote_categories.c.category_id == category_id)
+        .order_by(quote_categories.c.quote_id.desc()).limit(per_category).subquery()
+        for category_id in category_ids
+    ]
+    best = [
+        select(CategoryLeaderboard.category_id, CategoryLeaderboard.quote_id)
+        .where(CategoryLeaderboard.category_id == category_id)
+        .order_by(CategoryLeaderboard.score.desc(), CategoryLeaderboard.quote_id.desc()).limit(per_category).subquery()
+        for category_id in category_ids
+    ]
+    query = union_all(*(select(*branch.c) for branch in newest + best))
+    # A quote can be both new and highly rated in a category; count that category once
+    pairs = set(db.session.execute(query).tuples())
+    return Counter(quote_id for _, quote_id in pairs)
+
+
+# Function to score one quote for a user
+def score_quote(upvotes, downvotes, date_fetched, matches, category_count, today):
+    net = (upvotes or 0) - (downvotes or 0)
+    votes = math.copysign(math.log10(1 + abs(net)), net)
+    age = (today - date_fetched).days if date_fetched else None
+    recency = 0.5 ** (max(age, 0) / RECENCY_HALF_LIFE) if age is not None else 0
+    match = matches / category_count if category_count else 0
+    return round(VOTE_WEIGHT * votes + RECENCY_WEIGHT * recency + MATCH_WEIGHT * match, 6)
+
+
+# Function to rank the candidates for a user; returns [(score, quote_id)] best first
+def rank_feed(category_ids, per_category):
+    candidates = feed_candidates(category_ids, per_category)
+    if not candidates:
+        return []
+    today = datetime.date.today()
+    rows = db.session.query(Quote.id, Quote.upvotes, Quote.downvotes, Quote.date_fetched) \
+        .filter(Quote.id.in_(list(candidates)))
+    ranked = [(score_quote(row.upvotes, row.downvotes, row.date_fetched, candidates[row.id], len(category_ids), today),
+               row.id) for row in rows]
+    ranked.sort(reverse=True)
+    return ranked
+
+
+# Function to get one page of a user's feed, ranked by votes, recency and category match.
+# Work is bounded by 2 * FEED_MAX_CATEGORIES * FEED_CANDIDATES_PER_CATEGORY candidates,
+# however many quotes the categories hold. Pass the user's sorted category_ids if already loaded.
+def get_feed(user_id, cursor=None, limit=None, shape='feed', category_ids=None):
+    config = current_app.config
+    limit = limit or config.get('FEED_PAGE_SIZE', 20)
+    if category_ids is None:
+        category_ids = user_category_ids(user_id)
+    category_ids = list(category_ids)[:config.get('FEED_MAX_CATEGORIES', 20)]
+    ranked = rank_feed(category_ids, config.get('FEED_CANDIDATES_PER_CATEGORY', 100))
+
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        ranked = [entry for entry in ranked if entry < position]
+    page = ranked[:limit + 1]
+    next_cursor = encode_cursor(*page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+
+    scores = {quote_id: score for score, quote_id in page}
+    quotes = Quote.query.filter(Quote.id.in_(list(scores))).options(*quote_options(shape)).all() if scores else []
+    quotes.sort(key=lambda quote: (scores[quote.id], quote.id), reverse=True)
+    return FeedPage(quotes, scores, next_cursor)
@@ -1,55 +1,390 @@
 import sys
 import os
-import json  
+import io
+import csv
+import json
+import re
+import time
+import argparse
+import logging
+from typing import Optional
+import msgspec
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.models import db, Quote, Category
+from sqlalchemy import insert, text as sql_text
+from src.models import db, Quote, Category, quote_categories, quote_text_hash, existing_text_hashes
+from src.cache import snapshot_cache
 from src import create_app
+from src.config import config_options
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bulk_quotes.json')
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 1 << 16
+# How far into a .json file to look for the start of the quotes array
+MAX_JSON_HEADER_SIZE = 1 << 20
+FORMATS = ('json', 'jsonl', 'csv')
+
 def create_import_app():
-    app = create_app({
-        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL'),
-        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
-        'SECRET_KEY': os.getenv("SECRET_KEY")
-    })
-    return app
-
-def main():
+    env = os.getenv("FLASK_ENV", "default")
+    return create_app(config_options.get(env, config_options["default"]))
+
+class QuoteRecord(msgspec.Struct):
+    text: str = ''
+    author: Optional[str] = 'Unknown'
+    category: Optional[str] = 'Uncategorized'
+
+_record_decoder = msgspec.json.Decoder(QuoteRecord)
+_JSON_SPECIAL = re.compile(rb'["\\\[\]{}]')
+_QUOTE, _BACKSLASH, _OPENERS, _CLOSERS = ord('"'), ord('\\'), (ord('{'), ord('[')), (ord('}'), ord(']'))
+
+# Function to guess the input format from the file extension
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    return 'json'
+
+# Function to yield the raw bytes of each element of a JSON array without loading the document.
+# Accepts either a top-level array or an object holding the array under `key`.
+def iter_json_array_items(file, key='quotes', chunk_size=READ_CHUNK_SIZE):
+    array_start = re.compile(rb'\s*\[|.*?"' + re.escape(key.encode()) + rb'"\s*:\s*\[', re.DOTALL)
+    head = b''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        head += chunk
+        match = array_start.match(head)
+        if match:
+            data = head[match.end():]
+            break
+        if len(head) > MAX_JSON_HEADER_SIZE:
+            raise ValueError(f'Could not find a "{key}" array near the start of the file.')
+    # The opening bracket may end the chunk; the items start in the next one (empty only at EOF)
+    if not data:
+        data = file.read(chunk_size)
+
+    depth, in_string, skip_to = 0, False, 0
+    item_start, pending = None, b''
+    while data:
+        for match in _JSON_SPECIAL.finditer(data):
+            i = match.start()
+            if i < skip_to:
+                continue
+            char = data[i]
+            if in_string:
+                if char == _BACKSLASH:
+                    skip_to = i + 2
+                elif char == _QUOTE:
+                    in_string = False
+            elif char == _QUOTE:
+                in_string = True
+            elif char in _OPENERS:
+                if depth == 0:
+                    item_start, pending = i, b''
+                depth += 1
+            elif char in _CLOSERS:
+                if depth == 0:
+                    return
+                depth -= 1
+                if depth == 0:
+                    yield pending + data[item_start:i + 1]
+                    item_start, pending = None, b''
+
+        # Carry a partially read item over to the next chunk
+        if item_start is not None:
+            pending += data[item_start:]
+            item_start = 0
+        skip_to = max(0, skip_to - len(data))
+        data = file.read(chunk_size)
+
+# Function to turn a decoded record into the importer's dict shape (None if unusable)
+def normalize_record(record):
+    text = (record.text or '').strip()
+    if not text:
+        return None
+    return {
+        'text': text,
+        'text_hash': quote_text_hash(text),
+        'author': record.author or 'Unknown',
+        'category': record.category or 'Uncategorized',
+    }
+
+def _decode_json_record(raw):
+    try:
+        return normalize_record(_record_decoder.decode(raw))
+    except msgspec.DecodeError as e:
+        logger.warning("Skipping invalid record: %s", e)
+        return None
+
+def _iter_raw_records(file, fmt):
+    if fmt == 'json':
+        for raw in iter_json_array_items(file):
+            yield raw, _decode_json_record
+    elif fmt == 'jsonl':
+        for line in file:
+            if line.strip():
+                yield line, _decode_json_record
+    else:
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+        for row in reader:
+            yield row, _convert_csv_record
+
+def _convert_csv_record(row):
+    try:
+        return normalize_record(msgspec.convert(row, QuoteRecord))
+    except msgspec.ValidationError as e:
+        logger.warning("Skipping invalid record: %s", e)
+        return None
+
+# Function to stream quote records from a JSON, JSONL or CSV file in constant memory.
+# Yields one item per input record (None for records that cannot be imported),
+# after skipping the first `skip` records so an interrupted import can resume.
+def read_quotes(path, fmt=None, skip=0):
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+    with open(path, 'rb') as file:
+        for position, (raw, decode) in enumerate(_iter_raw_records(file, fmt)):
+            if position >= skip:
+                yield decode(raw)
+
+
+class ImportCheckpoint:
+    """Remembers how many records from a source have been committed, so a run can resume."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, source):
+        try:
+            with open(self.path, 'r') as file:
+                state = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+        if state.get('source') != source:
+            logger.warning("Ignoring checkpoint %s: it belongs to %s.", self.path, state.get('source'))
+            return 0
+        return int(state.get('records', 0))
+
+    def save(self, source, records):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump({'source': source, 'records': records}, file)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+# Function to group an iterable into lists of at most `size` items
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BulkImporter:
+    """Imports quotes in batches with set-based deduplication.
+
+    Categories are resolved once into a name -> id map, duplicates are found
+    by content hash with one query per batch, and new rows are written with executemany
+    (or COPY into a staging table on PostgreSQL).
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=print):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress = progress
+        self.category_ids = {}
+        self.stats = {'read': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0, 'categories_created': 0}
+        self._started = time.monotonic()
+        # Dry runs write nothing, so remember hashes that earlier batches would have inserted
+        self._dry_run_hashes = set()
+
+    def load_categories(self):
+        self.category_ids = dict(db.session.query(Category.name, Category.id).all())
+
+    def resolve_categories(self, names):
+        missing = sorted(set(names) - set(self.category_ids))
+        if not missing:
+            return
+        self.stats['categories_created'] += len(missing)
+        if self.dry_run:
+            for name in missing:
+                self.category_ids[name] = None
+            return
+        result = db.session.execute(
+            insert(Category.__table__).returning(Category.__table__.c.id, sort_by_parameter_order=True),
+            [{'name': name} for name in missing]
+        )
+        self.category_ids.update(zip(missing, result.scalars().all()))
+
+    def import_batch(self, records):
+        self.stats['read'] += len(records)
+        valid_records = [record for record in records if record is not None]
+        self.stats['invalid'] += len(records) - len(valid_records)
+        records = valid_records
+
+        # Deduplicate within the batch, then against the database in one query
+        unique = {}
+        for record in records:
+            unique.setdefault(record['text_hash'], record)
+        existing = existing_text_hashes(unique) if not self._uses_copy() else set()
+        new_records = [
+            record for text_hash, record in unique.items()
+            if text_hash not in existing and text_hash not in self._dry_run_hashes
+        ]
+
+        self.resolve_categories(record['category'] for record in new_records)
+        if self.dry_run:
+            imported = len(new_records)
+            self._dry_run_hashes.update(record['text_hash'] for record in new_records)
+        elif self._uses_copy():
+            imported = self._copy_batch(new_records)
+        else:
+            imported = self._insert_batch(new_records)
+
+        if not self.dry_run:
+            db.session.commit()
+        self.stats['imported'] += imported
+        self.stats['duplicates'] += len(records) - imported
+        self._report()
+
+    def _uses_copy(self):
+        return not self.dry_run and db.session.get_bind().dialect.name == 'postgresql'
+
+    def _insert_batch(self, records):
+        if not records:
+            return 0
+        quotes = Quote.__table__
+        result = db.session.execute(
+            insert(quotes).returning(quotes.c.id, sort_by_parameter_order=True),
+            [{'text': record['text'], 'text_hash': record['text_hash'], 'author': record['author']}
+             for record in records]
+        )
+        links = [
+            {'quote_id': quote_id, 'category_id': self.category_ids[record['category']]}
+            for quote_id, record in zip(result.scalars().all(), records)
+        ]
+        db.session.execute(insert(quote_categories), links)
+        return len(records)
+
+    def _copy_batch(self, records):
+        if not records:
+            return 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in records:
+            writer.writerow([record['text'], record['text_hash'], record['author'],
+                             self.category_ids[record['category']]])
+        buffer.seek(0)
+
+        db.session.execute(sql_text(
+            "CREATE TEMP TABLE IF NOT EXISTS import_staging "
+            "(text TEXT, text_hash VARCHAR(64), author TEXT, category_id INTEGER) ON COMMIT DELETE ROWS"
+        ))
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(
+            "COPY import_staging (text, text_hash, author, category_id) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+        # Insert only quotes whose hash is not already stored, and link their categories
+        result = db.session.execute(sql_text("""
+            WITH inserted AS (
+                INSERT INTO quotes (text, text_hash, author, date_fetched, is_community_qod, is_featured_qod,
+                                    report_count, upvotes, downvotes)
+                SELECT DISTINCT ON (s.text_hash) s.text, s.text_hash, s.author, CURRENT_DATE, false, false, 0, 0, 0
+                FROM import_staging s
+                ORDER BY s.text_hash
+                ON CONFLICT (text_hash) DO NOTHING
+                RETURNING id, text_hash
+            ), linked AS (
+                INSERT INTO quote_categories (quote_id, category_id)
+                SELECT DISTINCT inserted.id, s.category_id
+                FROM inserted JOIN import_staging s ON s.text_hash = inserted.text_hash
+                RETURNING quote_id
+            )
+            SELECT count(DISTINCT quote_id) FROM linked
+        """))
+        return result.scalar() or 0
+
+    def _report(self):
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        self.progress(
+            f"{'[dry run] ' if self.dry_run else ''}Processed {self.stats['read']} quotes: "
+            f"{self.stats['imported']} imported, {self.stats['duplicates']} duplicates, {self.stats['invalid']} invalid "
+            f"({self.stats['read'] / elapsed:.0f} quotes/s)"
+        )
+
+    # Function to import records; with a checkpoint, progress is saved after every committed batch
+    def run(self, records, checkpoint=None, source=None, start=0):
+        self._started = time.monotonic()
+        self.load_categories()
+        position = start
+        for batch in batched(records, self.batch_size):
+            self.import_batch(batch)
+            position += len(batch)
+            if checkpoint is not None and not self.dry_run:
+                checkpoint.save(source, position)
+        if checkpoint is not None and not self.dry_run:
+            checkpoint.clear()
+        if not self.dry_run and self.stats['imported']:
+            snapshot_cache.bump_version()
+        return self.stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import quotes into the database.")
+    parser.add_argument('path', nargs='?', default=DEFAULT_INPUT, help="Path to a .json, .jsonl or .csv file.")
+    parser.add_argument('--format', choices=FORMATS, help="Input format (default: from the file extension).")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Quotes per transaction.")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be imported without writing.")
+    parser.add_argument('--resume', action='store_true', help="Continue from the last saved checkpoint.")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <path>.checkpoint).")
+    return parser.parse_args(argv)
+
+# Function to run an import with checkpointing; shared by this script and the flask CLI
+def run_import(path, fmt=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, resume=False,
+               checkpoint_path=None, progress=print):
+    checkpoint = ImportCheckpoint(checkpoint_path or f"{path}.checkpoint")
+    source = os.path.abspath(path)
+    start = checkpoint.load(source) if resume else 0
+    if start:
+        progress(f"Resuming after {start} records.")
+    importer = BulkImporter(batch_size=batch_size, dry_run=dry_run, progress=progress)
+    return importer.run(read_quotes(path, fmt, skip=start), checkpoint=checkpoint, source=source, start=start)
+
+def main(argv=None):
+    args = parse_args(argv)
     app = create_import_app()
     with app.app_context():
         try:
-            with open('bulk_quotes.json', 'r') as file:
-                quotes_data = json.load(file)
+            stats = run_import(args.path, args.format, args.batch_size, args.dry_run, args.resume, args.checkpoint)
         except FileNotFoundError:
-            print("Error: bulk_quotes.json not found.")
+            print(f"Error: {args.path} not found.")
             sys.exit(1)
-        except json.JSONDecodeError:
-            print("Error: Invalid JSON in bulk_quotes.json.")
+        except (ValueError, msgspec.DecodeError) as e:
+            print(f"Error: Could not read {args.path}: {e}")
             sys.exit(1)
 
-        for item in quotes_data.get('quotes', []):
-            text = item.get('text')
-            author = item.get('author', 'Unknown')
-            category_name = item.get('category', 'Uncategorized')
-
-            # Find or create the category
-            category = Category.query.filter_by(name=category_name).first()
-            if not category:
-                category = Category(name=category_name)
-                db.session.add(category)
-
-            # Avoid duplicate quotes
-            existing_quote = Quote.query.filter_by(text=text).first()
-            if not existing_quote:
-                new_quote = Quote(text=text, author=author)
-                new_quote.categories.append(category)
-                db.session.add(new_quote)
-
-        db.session.commit()
-        print("Quotes imported successfully!")
+        print(f"Quotes imported successfully! {stats['imported']} new quotes, "
+              f"{stats['duplicates']} duplicates skipped, {stats['invalid']} invalid records, "
+              f"{stats['categories_created']} categories created.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import time
+from src.import_quotes import BulkImporter, ImportCheckpoint, QuoteRecord, normalize_record
+from src.upstream import upstream, UpstreamError, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+INGEST_SOURCE = 'quotes.rest:/quote/random'
+
+
+class TokenBucket:
+    """Asyncio token bucket: allows `rate` acquisitions per second with bursts of `capacity`.
+
+    pause() empties the bucket and blocks every waiter until the given time has
+    passed, which is how a Retry-After from the upstream is applied to all fetchers.
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        now = self.clock()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self.clock()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class IngestionPipeline:
+    """Fetches random quotes from the API concurrently and stores them in batches.
+
+    `concurrency` fetchers share one TokenBucket sized to the upstream quota and
+    each asks for up to `batch_size` quotes per request. A single writer
+    deduplicates and inserts them with BulkImporter, then records the running
+    total in the checkpoint so a stopped run can resume where it left off.
+    """
+
+    def __init__(self, app, total, batch_size=10, concurrency=4, bucket=None, write_batch_size=100,
+                 checkpoint=None, start=0, max_rate_limit_hits=5, max_idle_fetches=20, progress=None):
+        self.app = app
+        self.total = total
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.bucket = bucket or TokenBucket(rate=1.0)
+        self.write_batch_size = write_batch_size
+        self.checkpoint = checkpoint
+        self.imported = start
+        self.max_rate_limit_hits = max_rate_limit_hits
+        self.max_idle_fetches = max_idle_fetches
+        self.progress = progress or (lambda message: logger.info("%s", message))
+        self.stats = {'requests': 0, 'received': 0, 'rate_limited': 0, 'errors': 0}
+        self.importer = BulkImporter(batch_size=write_batch_size, progress=lambda message: None)
+        self._idle_fetches = 0
+        self._stop = None
+
+    def _remaining(self):
+        return max(self.total - self.imported, 0)
+
+    def stop(self, reason):
+        if not self._stop.is_set():
+            logger.info("Stopping ingestion: %s", reason)
+            self._stop.set()
+
+    async def _fetch(self, queue):
+        while not self._stop.is_set():
+            await self.bucket.acquire()
+            if self._stop.is_set():
+                break
+            params = {'language': 'en', 'limit': min(self.batch_size, max(self._remaining(), 1))}
+            self.stats['requests'] += 1
+            try:
+                # The bucket does the pacing, so the client itself does not retry
+                data = await asyncio.to_thread(upstream.get_json, '/quote/random', params, 0)
+            except CircuitOpenError as e:
+                self.bucket.pause(e.retry_after or 1)
+                continue
+            except UpstreamError as e:
+                if e.status_code == 429:
+                    self.stats['rate_limited'] += 1
+                    logger.warning("Rate limited; pausing all fetchers for %ss.", e.retry_after or 60)
+                    self.bucket.pause(e.retry_after or 60)
+                    if self.stats['rate_limited'] >= self.max_rate_limit_hits:
+                        self.stop(f"rate limited {self.stats['rate_limited']} times")
+                elif e.status_code is not None and e.status_code < 500:
+                    self.stats['errors'] += 1
+                    self.stop(f"upstream rejected the request: {e}")
+                else:
+                    self.stats['errors'] += 1
+                    logger.warning("Fetch failed: %s", e)
+                continue
+
+            quotes = data.get('contents', {}).get('quotes', []) if isinstance(data, dict) else []
+            records = [normalize_record(QuoteRecord(text=quote.get('quote') or '', author=quote.get('author'),
+                                                    category=quote.get('category')))
+                       for quote in quotes if isinstance(quote, dict)]
+            self.stats['received'] += len(records)
+            await queue.put(records)
+
+    # Function to write one batch on a worker thread; returns the number of new quotes
+    def _write(self, records):
+        with self.app.app_context():
+            before = self.importer.stats['imported']
+            self.importer.import_batch(records)
+            return self.importer.stats['imported'] - before
+
+    async def _writer(self, queue):
+        batch, fetches_in_batch = [], 0
+        while True:
+            records = await queue.get()
+            if records is None:
+                break
+            batch.extend(records)
+            fetches_in_batch += 1
+            # Write as soon as nothing else is waiting, so progress is saved promptly at low rates
+            if len(batch) >= self.write_batch_size or queue.empty():
+                await self._flush(batch, fetches_in_batch)
+                batch, fetches_in_batch = [], 0
+        if fetches_in_batch:
+            await self._flush(batch, fetches_in_batch)
+
+    async def _flush(self, batch, fetches):
+        remaining = self._remaining()
+        if not remaining:
+            return
+        imported = await asyncio.to_thread(self._write, batch[:remaining]) if batch else 0
+        self.imported += imported
+        if self.checkpoint is not None:
+            self.checkpoint.save(INGEST_SOURCE, self.imported)
+        self.progress(f"Stored {self.imported}/{self.total} quotes "
+                      f"({self.stats['requests']} requests, {self.stats['rate_limited']} rate limited)")
+
+        # The upstream pool is finite: give up once fetches stop producing new quotes
+        self._idle_fetches = 0 if imported else self._idle_fetches + fetches
+        if not self._remaining():
+            self.stop("target reached")
+        elif self._idle_fetches >= self.max_idle_fetches:
+            self.stop(f"{self._idle_fetches} fetches in a row returned only known quotes")
+
+    async def run(self):
+        self._stop = asyncio.Event()
+        if not self._remaining():
+            return self.imported
+        with self.app.app_context():
+            self.importer.load_categories()
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        writer = asyncio.create_task(self._writer(queue))
+        fetchers = [asyncio.create_task(self._fetch(queue)) for _ in range(self.concurrency)]
+        stopped = asyncio.create_task(self._stop.wait())
+        try:
+            # Fetchers may be sleeping on the bucket for minutes, so stop them as soon as we are done
+            await asyncio.wait([stopped, writer, *fetchers], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopped.cancel()
+            for fetcher in fetchers:
+                fetcher.cancel()
+            results = await asyncio.gather(*fetchers, return_exceptions=True)
+            if not writer.done():
+                await queue.put(None)
+            await writer
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        if self.checkpoint is not None and not self._remaining():
+            self.checkpoint.clear()
+        return self.imported
+
+
+# Function to build a pipeline from the app config and run it to completion.
+# Returns the number of new quotes stored in this run.
+def run_ingestion(app, total, batch_size=None, concurrency=None, resume=False, checkpoint_path=None, progress=None):
+    config = app.config
+    checkpoint = ImportCheckpoint(checkpoint_path or config.get('INGEST_CHECKPOINT', 'ingest.checkpoint'))
+    start = checkpoint.load(INGEST_SOURCE) if resume else 0
+    bucket = TokenBucket(
+        rate=config.get('INGEST_QUOTA_REQUESTS', 10) / config.get('INGEST_QUOTA_PERIOD', 3600),
+        capacity=config.get('INGEST_BURST', 1),
+    )
+    pipeline = IngestionPipeline(
+        app, total,
+        batch_size=batch_size or config.get('INGEST_BATCH_SIZE', 10),
+        concurrency=concurrency or config.get('INGEST_CONCURRENCY', 4),
+        bucket=bucket,
+        checkpoint=checkpoint,
+        start=start,
+        progress=progress,
+    )
+    if start:
+        pipeline.progress(f"Resuming with {start} quotes already stored.")
+    return asyncio.run(pipeline.run()) - start
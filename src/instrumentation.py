@@ -0,0 +1,217 @@
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, abort, before_render_template, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# Longest SQL text quoted in a slow-request log line
+SQL_LOG_LENGTH = 500
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """A Prometheus histogram with labels, kept in process memory."""
+
+    def __init__(self, name, documentation, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One count per bucket, then the sum and the total count
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    # Function to render the histogram in the Prometheus text format
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {values[-1]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {values[-1]}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class RequestTimings:
+    """What one request spent its time on; kept in g while the request runs."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = []
+        self.render_time = 0.0
+        self.upstream_time = 0.0
+        self.upstream_count = 0
+        self._render_starts = []
+
+
+# Function to get the timings of the request being served, or None outside a request
+def current_timings():
+    return g.get('_request_timings') if has_app_context() else None
+
+
+# Context manager to add the time spent in its block to the request's upstream HTTP time
+@contextmanager
+def track_upstream():
+    timings = current_timings()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.upstream_time += time.perf_counter() - start
+            timings.upstream_count += 1
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_timings() is not None:
+        context._timing_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = current_timings()
+    start = getattr(context, '_timing_start', None)
+    if timings is None or start is None:
+        return
+    elapsed = time.perf_counter() - start
+    timings.sql_count += 1
+    timings.sql_time += elapsed
+    timings.statements.append((elapsed, statement))
+
+
+def _before_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings._render_starts.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None and timings._render_starts:
+        timings.render_time += time.perf_counter() - timings._render_starts.pop()
+
+
+class RequestMetrics:
+    """Per-request instrumentation: SQL statements and time, template render time and upstream HTTP time.
+
+    Each response gets a Server-Timing header, every request feeds the
+    per-endpoint histograms served at METRICS_PATH, and requests slower than
+    SLOW_REQUEST_MS are logged with their slowest SQL statements. Histograms
+    are per process; with several workers Prometheus scrapes each one.
+    """
+
+    def __init__(self, app=None):
+        self.server_timing = True
+        self.slow_request_ms = 1000
+        self.slow_sql_limit = 5
+        self.token = None
+        self.duration = Histogram('http_request_duration_seconds', 'Time to serve a request.',
+                                  ('endpoint', 'method', 'status'))
+        self.sql_time = Histogram('http_request_sql_seconds', 'Time a request spent running SQL.', ('endpoint',))
+        self.sql_statements = Histogram('http_request_sql_statements', 'SQL statements run by a request.',
+                                        ('endpoint',), buckets=STATEMENT_BUCKETS)
+        self.render_time = Histogram('http_request_render_seconds', 'Time a request spent rendering templates.',
+                                     ('endpoint',))
+        self.upstream_time = Histogram('http_request_upstream_seconds', 'Time a request spent calling the quotes API.',
+                                       ('endpoint',))
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.server_timing = app.config.get('SERVER_TIMING', True)
+        self.slow_request_ms = app.config.get('SLOW_REQUEST_MS', 1000)
+        self.slow_sql_limit = app.config.get('SLOW_REQUEST_SQL_LIMIT', 5)
+        self.token = app.config.get('METRICS_TOKEN')
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if app.config.get('METRICS_PATH', '/metrics'):
+            app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', self.metrics_view)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+        # Engine-wide listeners, so every engine's statements count towards the request that ran them
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            self._listening = True
+        app.extensions['request_metrics'] = self
+
+    def histograms(self):
+        return [self.duration, self.sql_time, self.sql_statements, self.render_time, self.upstream_time]
+
+    def _start(self):
+        g._request_timings = RequestTimings()
+
+    def _finish(self, response):
+        timings = g.pop('_request_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.start
+        endpoint = request.endpoint or 'unmatched'
+
+        self.duration.observe((endpoint, request.method, str(response.status_code)), total)
+        self.sql_time.observe((endpoint,), timings.sql_time)
+        self.sql_statements.observe((endpoint,), timings.sql_count)
+        self.render_time.observe((endpoint,), timings.render_time)
+        self.upstream_time.observe((endpoint,), timings.upstream_time)
+
+        if self.server_timing:
+            response.headers['Server-Timing'] = ', '.join([
+                f'db;dur={timings.sql_time * 1000:.1f};desc="{timings.sql_count} queries"',
+                f'render;dur={timings.render_time * 1000:.1f}',
+                f'upstream;dur={timings.upstream_time * 1000:.1f};desc="{timings.upstream_count} calls"',
+                f'total;dur={total * 1000:.1f}',
+            ])
+
+        if self.slow_request_ms and total * 1000 >= self.slow_request_ms:
+            slowest = sorted(timings.statements, key=lambda entry: entry[0], reverse=True)[:self.slow_sql_limit]
+            logger.warning(
+                "Slow request %s %s (%s): %.1f ms; %d SQL statement(s) in %.1f ms, render %.1f ms, upstream %.1f ms%s",
+                request.method, request.path, endpoint, total * 1000, timings.sql_count, timings.sql_time * 1000,
+                timings.render_time * 1000, timings.upstream_time * 1000,
+                ''.join(f"\n  {elapsed * 1000:.1f} ms: {' '.join(statement.split())[:SQL_LOG_LENGTH]}"
+                        for elapsed, statement in slowest),
+            )
+        return response
+
+    def metrics_view(self):
+        if self.token and request.headers.get('Authorization') != f"Bearer {self.token}":
+            abort(401)
+        lines = [line for histogram in self.histograms() for line in histogram.render()]
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+request_metrics = RequestMetrics()
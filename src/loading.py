@@ -0,0 +1,66 @@
+import logging
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+from src.models import db, Quote
+
+logger = logging.getLogger(__name__)
+
+# Eager-loading presets for the shapes in which quotes are rendered.
+# Lists use selectinload for the categories collection (one extra query per
+# page instead of one per quote); single rows join everything in one query.
+# Quote.user is a backref declared on User and only exists once the mappers are
+# configured (create_app does it), so each preset is built on first use.
+QUOTE_LOAD_SHAPES = {
+    # Quote cards in category listings: submitter name and categories
+    'listing': lambda: (joinedload(Quote.user), selectinload(Quote.categories)),
+    # A single quote (e.g. quote of the day) with everything on its card
+    'detail': lambda: (joinedload(Quote.user), joinedload(Quote.categories)),
+    # Personalized feed cards only show the submitter
+    'feed': lambda: (joinedload(Quote.user),),
+}
+_quote_load_options = {}
+
+
+# Function to get the loader options for a rendering shape
+def quote_options(shape):
+    options = _quote_load_options.get(shape)
+    if options is None:
+        options = _quote_load_options[shape] = QUOTE_LOAD_SHAPES[shape]()
+    return options
+
+
+class QueryCounter:
+    """Collects the SQL statements executed on an engine while it is listening."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+# Context manager that counts the SQL statements issued inside the block
+@contextmanager
+def count_queries(engine=None):
+    engine = engine if engine is not None else db.engine
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+# Context manager for tests: fails if the block issues more than `limit` statements
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(f"  {i + 1}. {statement}" for i, statement in enumerate(counter.statements))
+        raise AssertionError(f"Expected at most {limit} queries, got {counter.count}:\n{statements}")
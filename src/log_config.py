@@ -0,0 +1,88 @@
+import atexit
+import datetime
+import json
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_handler = None
+_listener = None
+
+
+class SampledDebugFilter(logging.Filter):
+    """Keeps every INFO and higher record but only a `rate` share of DEBUG records."""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Function to parse per-logger levels written as "name=LEVEL,name=LEVEL"
+def parse_levels(spec):
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Function to configure the root logger from the app's LOG_* settings.
+# Safe to call again: it replaces the handler it installed before and leaves others alone.
+def configure_logging(app):
+    global _handler, _listener
+    config = app.config
+    root = logging.getLogger()
+
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _stop_listener()
+
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if config.get('LOG_FORMAT', 'text') == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    if config.get('LOG_QUEUE', False):
+        # Requests only enqueue records; a background thread formats and writes them
+        _handler = QueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+    else:
+        _handler = output
+    _handler.addFilter(SampledDebugFilter(config.get('LOG_DEBUG_SAMPLE_RATE', 1.0)))
+    root.addHandler(_handler)
+
+    # Loggers check the level before building a record, so disabled levels cost one comparison
+    root.setLevel(config.get('LOG_LEVEL', 'INFO').upper())
+    for name, level in parse_levels(config.get('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+
+atexit.register(_stop_listener)
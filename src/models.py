@@ -1,14 +1,28 @@
 import datetime
+import hashlib
+import re
+import unicodedata
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import TSVECTOR
 import logging
 
 
 db = SQLAlchemy()
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Function to normalize quote text for duplicate detection (Unicode form, case and whitespace)
+def normalize_quote_text(text):
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE_RE.sub(' ', text).strip().casefold()
+
+# Function to compute the content hash stored in Quote.text_hash
+def quote_text_hash(text):
+    return hashlib.sha256(normalize_quote_text(text).encode('utf-8')).hexdigest()
+
 # Models
 
 class User(db.Model):
@@ -24,7 +38,7 @@ class User(db.Model):
     categories = db.relationship('Category', secondary='user_preferences', back_populates='users')
 
     def __init__(self, username, email, password_hash):
-        logger.debug(f"Creating new User: {username}, {email}")
+        logger.debug("Creating new User: %s, %s", username, email)
         self.username = username
         self.email = email
         self.password_hash = password_hash
@@ -42,13 +56,32 @@ class Quote(db.Model):
     report_count = db.Column(db.Integer, default=0)
     upvotes = db.Column(db.Integer, default=0)
     downvotes = db.Column(db.Integer, default=0)
+    # SHA-256 of the normalized text; unique, so each quote is stored once (see quote_text_hash)
+    text_hash = db.Column(db.String(64), nullable=True)
+    # Full-text search document, maintained by a database trigger (see src/search.py)
+    search_vector = db.deferred(db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql'), nullable=True))
 
     votes = db.relationship('Vote', backref='quote', lazy=True)
     reports = db.relationship('Report', backref='quote', lazy=True)
     categories = db.relationship('Category', secondary='quote_categories', back_populates='quotes')
 
+    __table_args__ = (
+        db.Index('ix_quotes_text_hash', 'text_hash', unique=True),
+        db.Index('ix_quotes_submitted_by', 'submitted_by'),
+        db.Index('ix_quotes_date_fetched_featured', 'date_fetched', 'is_featured_qod'),
+        db.Index('ix_quotes_is_community_qod', 'is_community_qod'),
+        # At most one featured quote of the day per date
+        db.Index('uq_quotes_featured_qod_per_day', 'date_fetched', unique=True,
+                 postgresql_where=db.text('is_featured_qod'), sqlite_where=db.text('is_featured_qod')),
+        db.Index('ix_quotes_search_vector', 'search_vector', postgresql_using='gin').ddl_if(dialect='postgresql'),
+        db.Index('ix_quotes_author_trgm', 'author', postgresql_using='gin',
+                 postgresql_ops={'author': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_quotes_text_trgm', 'text', postgresql_using='gin',
+                 postgresql_ops={'text': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+
     def __init__(self, text, author, date_fetched=None, submitted_by=None, is_community_qod=False, is_featured_qod=False):
-        logger.debug(f"Creating new Quote: {text} by {author}")
+        logger.debug("Creating new Quote: %s by %s", text, author)
         self.text = text
         self.author = author
         self.date_fetched = date_fetched if date_fetched else datetime.date.today()
@@ -56,19 +89,28 @@ class Quote(db.Model):
         self.is_community_qod = is_community_qod
         self.is_featured_qod = is_featured_qod
 
+# Keep text_hash in sync whenever a quote's text is set through the ORM
+@event.listens_for(Quote.text, 'set')
+def _update_quote_text_hash(target, value, oldvalue, initiator):
+    target.text_hash = quote_text_hash(value)
+
 class Vote(db.Model):
     __tablename__ = 'votes'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     quote_id = db.Column(db.Integer, db.ForeignKey('quotes.id'))
     vote_type = db.Column(db.String, nullable=False)
+    # When the vote was cast (or last switched sides); NULL for votes older than this column
+    created_at = db.Column(db.DateTime, nullable=True, default=datetime.datetime.utcnow)
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'quote_id', name='unique_user_quote_vote'),
+        db.Index('ix_votes_quote_id', 'quote_id'),
+        db.Index('ix_votes_created_at', 'created_at'),
     )
 
     def __init__(self, user_id, quote_id, vote_type):
-        logger.debug(f"Creating new Vote: User ID {user_id}, Quote ID {quote_id}, Vote Type {vote_type}")
+        logger.debug("Creating new Vote: User ID %s, Quote ID %s, Vote Type %s", user_id, quote_id, vote_type)
         self.user_id = user_id
         self.quote_id = quote_id
         self.vote_type = vote_type
@@ -82,8 +124,12 @@ class Report(db.Model):
     report_reason = db.Column(db.String, nullable=True)
     report_date = db.Column(db.Date, default=datetime.date.today)
 
+    __table_args__ = (
+        db.Index('ix_reports_quote_id', 'quote_id'),
+    )
+
     def __init__(self, user_id, quote_id, report_reason):
-        logger.debug(f"Creating new Report: User ID {user_id}, Quote ID {quote_id}, Reason: {report_reason}")
+        logger.debug("Creating new Report: User ID %s, Quote ID %s, Reason: %s", user_id, quote_id, report_reason)
         self.user_id = user_id
         self.quote_id = quote_id
         self.report_reason = report_reason
@@ -98,7 +144,7 @@ class Category(db.Model):
     quotes = db.relationship('Quote', secondary='quote_categories', back_populates='categories')
 
     def __init__(self, name):
-        logger.debug(f"Creating new Category: {name}")
+        logger.debug("Creating new Category: %s", name)
         self.name = name
 
 
@@ -109,9 +155,126 @@ user_preferences = db.Table('user_preferences',
 
 quote_categories = db.Table('quote_categories',
     db.Column('quote_id', db.Integer, db.ForeignKey('quotes.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+    db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True),
+    # The primary key covers quote -> categories; this covers category -> quotes
+    db.Index('ix_quote_categories_category_id_quote_id', 'category_id', 'quote_id')
 )
 
+
+class CategoryCount(db.Model):
+    """Number of quotes linked to a category, kept current by database triggers (see src/category_counts.py).
+
+    The row with category_id 0 counts the quotes that have no category.
+    """
+    __tablename__ = 'category_counts'
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quote_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, category_id, quote_count=0):
+        self.category_id = category_id
+        self.quote_count = quote_count
+
+
+class CategoryLeaderboard(db.Model):
+    """Ranking score of a voted quote within one of its categories, kept current on every vote."""
+    __tablename__ = 'category_leaderboard'
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    quote_id = db.Column(db.Integer, db.ForeignKey('quotes.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        # Top-N reads walk this index backwards from the highest score
+        db.Index('ix_category_leaderboard_category_id_score', 'category_id', 'score', 'quote_id'),
+        # Incremental updates replace a quote's rows across its categories
+        db.Index('ix_category_leaderboard_quote_id', 'quote_id'),
+    )
+
+    def __init__(self, category_id, quote_id, score):
+        self.category_id = category_id
+        self.quote_id = quote_id
+        self.score = score
+
+
+class VoteBucket(db.Model):
+    """Net votes on a quote during one clock hour (UTC), kept current on every vote for trending scores."""
+    __tablename__ = 'vote_buckets'
+    quote_id = db.Column(db.Integer, db.ForeignKey('quotes.id', ondelete='CASCADE'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    upvotes = db.Column(db.Integer, nullable=False, default=0)
+    downvotes = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_vote_buckets_hour', 'hour'),
+    )
+
+
+class TrendingQuote(db.Model):
+    """One entry of the precomputed trending list, ordered by rank."""
+    __tablename__ = 'trending_quotes'
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quote_id = db.Column(db.Integer, db.ForeignKey('quotes.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    upvotes = db.Column(db.Integer, nullable=False, default=0)
+    downvotes = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    quote = db.relationship('Quote')
+
+
+class DailyQuote(db.Model):
+    """The quote shown for a day, per kind ('featured' or 'community'), precomputed by a nightly job."""
+    __tablename__ = 'daily_quotes'
+    day = db.Column(db.Date, primary_key=True)
+    kind = db.Column(db.String(16), primary_key=True)
+    quote_id = db.Column(db.Integer, db.ForeignKey('quotes.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    quote = db.relationship('Quote')
+
+    def __init__(self, day, kind, quote_id, score=None):
+        self.day = day
+        self.kind = kind
+        self.quote_id = quote_id
+        self.score = score
+
+
+class SessionRecord(db.Model):
+    """A server-side session, used when SESSION_BACKEND is "sql" (see src/sessions.py)."""
+    __tablename__ = 'sessions'
+    session_id = db.Column(db.String(255), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expiry = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        # The expiry sweep deletes in expiry order
+        db.Index('ix_sessions_expiry', 'expiry'),
+    )
+
+
+class DataMigration(db.Model):
+    """Records one-shot data jobs (e.g. category consolidation) that have already run."""
+    __tablename__ = 'data_migrations'
+    name = db.Column(db.String, primary_key=True)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __init__(self, name, applied_at=None):
+        self.name = name
+        self.applied_at = applied_at if applied_at else datetime.datetime.utcnow()
+
+# Function to find a stored quote with the same normalized text, if any
+def find_duplicate_quote(text):
+    return Quote.query.filter_by(text_hash=quote_text_hash(text)).first()
+
+# Function to find which of the given text hashes are already stored, in bounded IN() chunks
+def existing_text_hashes(hashes, chunk_size=1000):
+    hashes = list(hashes)
+    found = set()
+    for start in range(0, len(hashes), chunk_size):
+        chunk = hashes[start:start + chunk_size]
+        found.update(db.session.execute(select(Quote.text_hash).where(Quote.text_hash.in_(chunk))).scalars())
+    return found
+
 # Function to initialize predefined categories
 def initialize_categories():
     predefined_categories = [
@@ -122,5 +285,5 @@ def initialize_categories():
         if not existing_category:
             new_category = Category(name=category_name)
             db.session.add(new_category)
-            logger.debug(f"Added predefined category: {category_name}")
+            logger.debug("Added predefined category: %s", category_name)
     db.session.commit()
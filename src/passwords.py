@@ -0,0 +1,193 @@
+import atexit
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is full and a password cannot be hashed in time."""
+
+
+# Function to spell out a werkzeug hash method with its defaults, e.g. "pbkdf2" -> "pbkdf2:sha256:260000"
+def normalize_method(method):
+    parts = method.split(':')
+    if parts[0] != 'pbkdf2':
+        return method
+    hash_name = parts[1] if len(parts) > 1 else 'sha256'
+    iterations = int(parts[2]) if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS
+    return f"pbkdf2:{hash_name}:{iterations}"
+
+
+class PasswordHasher:
+    """Hashes and checks passwords in a small process pool instead of the request's worker.
+
+    At most `max_pending` passwords per web worker wait for or occupy the pool;
+    further logins fail fast with PasswordHasherBusy rather than queueing up
+    behind the CPU-bound work. With `workers` set to 0 hashing runs inline.
+    """
+
+    def __init__(self, app=None):
+        self.method = normalize_method('pbkdf2:sha256')
+        self.salt_length = 16
+        self.workers = 0
+        self.max_pending = 8
+        self.timeout = 10
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = normalize_method(app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'))
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', 16)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 1)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', 8)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['password_hasher'] = self
+
+    # Function to get this process's pool; a forked web worker builds its own on first use
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Forked children only run werkzeug's hash functions, and unlike spawned ones
+                # they do not re-import the web worker's main module
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('fork') if 'fork' in methods else None
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                if self._pid is None:
+                    atexit.register(self.shutdown)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        slots = self._slots
+        if not slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            future = self._pool().submit(function, *args)
+        except BrokenProcessPool:
+            slots.release()
+            return self._run_inline_after_break(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is held until the work finishes, even if this request stops waiting for it
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            raise PasswordHasherBusy() from None
+        except BrokenProcessPool:
+            return self._run_inline_after_break(function, *args)
+
+    def _run_inline_after_break(self, function, *args):
+        logger.exception("Password hashing pool broke; hashing inline and restarting it.")
+        self.shutdown()
+        return function(*args)
+
+    # Function to hash a password with the configured method and salt length
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    # Function to check a password against a stored hash
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    # Function to tell whether a stored hash was made with other settings than the current ones
+    def needs_rehash(self, pwhash):
+        method, _, rest = pwhash.partition('$')
+        salt = rest.partition('$')[0]
+        return normalize_method(method) != self.method or len(salt) != self.salt_length
+
+    # Function to stop this process's pool. It waits for the pool's threads to exit: a pool
+    # forked while they still hold their locks inherits them held and can hang on exit.
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+class LoginAttemptLimiter:
+    """Counts failed logins per client address and per username over a sliding window.
+
+    Counts live in process memory, so each web worker enforces the limits on
+    the logins it serves. At most `max_keys` addresses and usernames are
+    tracked; the least recently failing ones are forgotten first.
+    """
+
+    def __init__(self, app=None):
+        self.max_per_user = 5
+        self.max_per_address = 20
+        self.window = 300
+        self.max_keys = 10000
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_per_user = app.config.get('LOGIN_MAX_ATTEMPTS', 5)
+        self.max_per_address = app.config.get('LOGIN_MAX_ATTEMPTS_PER_ADDRESS', 20)
+        self.window = app.config.get('LOGIN_ATTEMPT_WINDOW', 300)
+        self.max_keys = app.config.get('LOGIN_LIMITER_MAX_KEYS', 10000)
+        app.extensions['login_limiter'] = self
+
+    def _limits(self, address, username):
+        return [(('address', address), self.max_per_address),
+                (('user', (username or '').strip().lower()), self.max_per_user)]
+
+    # Function to get the seconds until another attempt is allowed; 0 if it is allowed now
+    def retry_after(self, address, username):
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key, limit in self._limits(address, username):
+                failures = self._failures.get(key)
+                if failures is None:
+                    continue
+                while failures and failures[0] <= now - self.window:
+                    failures.popleft()
+                if len(failures) >= limit:
+                    wait = max(wait, failures[0] + self.window - now)
+        return math.ceil(wait)
+
+    def record_failure(self, address, username):
+        now = time.monotonic()
+        with self._lock:
+            for key, limit in self._limits(address, username):
+                # Only the newest `limit` failures matter for the window
+                failures = self._failures.get(key)
+                if failures is None:
+                    failures = self._failures[key] = deque(maxlen=limit)
+                failures.append(now)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    # Function to clear a username's failures after it logs in; the address keeps its count
+    def record_success(self, username):
+        with self._lock:
+            self._failures.pop(('user', (username or '').strip().lower()), None)
+
+    def clear(self):
+        with self._lock:
+            self._failures.clear()
+
+
+password_hasher = PasswordHasher()
+login_limiter = LoginAttemptLimiter()
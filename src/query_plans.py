@@ -0,0 +1,307 @@
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+from collections import Counter
+from sqlalchemy import event, insert, inspect, text as sql_text
+from src import create_app
+from src.config import config_options
+from src.models import (db, User, Quote, Vote, Report, Category, quote_categories, user_preferences,
+                        quote_text_hash)
+from src.leaderboard import rebuild_leaderboards
+from src.category_counts import install_category_counts
+from src.search import install_search_index, install_trigram_index
+from src.trending import rebuild_vote_buckets
+
+logger = logging.getLogger(__name__)
+
+# Seeded row counts; tables at or above MIN_LARGE_TABLE_ROWS must never be scanned in full
+SEED_SIZES = {'users': 2000, 'quotes': 20000, 'votes': 20000, 'reports': 2000, 'categories': 30}
+MIN_LARGE_TABLE_ROWS = 1000
+
+# Full scans that are part of a scenario's design, with the reason they are accepted.
+# Keyed by (scenario, table, dialect); a dialect of None applies to every database.
+ALLOWED_SCANS = {
+    # The nightly job's fallbacks (best all-time quote, random unfeatured quote) run once a day
+    ('daily_quotes', 'quotes', None): "nightly daily-quotes job",
+    # Without pg_trgm, fuzzy matching builds an in-memory trigram index once per content version
+    ('fuzzy', 'quotes', 'sqlite'): "in-memory trigram fallback index (cached)",
+}
+
+# Full walks of a table or of one of its indexes. SEARCH rows are bounded index ranges, and
+# FTS5 "VIRTUAL TABLE INDEX" lookups are not listed here.
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?(?P<index> USING (?:COVERING )?INDEX \w+)?$')
+_SQL_LIMIT_RE = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+# PostgreSQL index nodes; without an Index Cond they walk the whole index
+_POSTGRES_INDEX_SCANS = {'Index Scan', 'Index Only Scan'}
+_ALIAS_SUFFIX_RE = re.compile(r'_\d+$')
+
+
+class CapturedStatement:
+    """A SELECT issued by a scenario, with the parameters needed to EXPLAIN it."""
+
+    def __init__(self, scenario, statement, parameters):
+        self.scenario = scenario
+        self.statement = statement
+        self.parameters = parameters
+
+
+class StatementRecorder:
+    """Records the SELECT statements executed on an engine, tagged with the current scenario."""
+
+    def __init__(self):
+        self.scenario = None
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.scenario is None or executemany:
+            return
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.statements.append(CapturedStatement(self.scenario, statement, parameters))
+
+
+# Function to build an app bound to a scratch database for plan checks
+def create_plan_app(database_url=None):
+    env = os.getenv("FLASK_ENV", "default")
+    base = config_options.get(env, config_options["default"])
+    overrides = {
+        'SQLALCHEMY_DATABASE_URI': database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'plans.db'),
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'CACHE_BACKEND': 'local',
+        'VOTE_WRITE_BEHIND': False,
+        'SESSION_FILE_DIR': tempfile.mkdtemp(),
+    }
+    return create_app(type('QueryPlanConfig', (base,), overrides))
+
+
+# Function to create the schema and fill it with enough rows for the planner to prefer indexes
+def seed_database(sizes=None, seed=0):
+    sizes = dict(SEED_SIZES, **(sizes or {}))
+    rng = random.Random(seed)
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(sql_text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    db.create_all()
+
+    today = datetime.date.today()
+    now = datetime.datetime.utcnow()
+    users = [{'username': f"user{i}", 'email': f"user{i}@example.com", 'password_hash': 'x'}
+             for i in range(sizes['users'])]
+    categories = [{'name': f"category{i}"} for i in range(sizes['categories'])]
+    votes = {(rng.randint(1, sizes['users']), rng.randint(1, sizes['quotes'])): rng.choice(['upvote', 'downvote'])
+             for _ in range(sizes['votes'])}
+    vote_counts = {}
+    for (_, quote_id), vote_type in votes.items():
+        vote_counts.setdefault(quote_id, Counter())[vote_type] += 1
+    quotes = []
+    for i in range(sizes['quotes']):
+        text = f"Quote number {i} about {rng.choice(['life', 'love', 'art', 'work'])} and patience"
+        quotes.append({
+            'text': text, 'text_hash': quote_text_hash(text), 'author': f"Author {i % 500}",
+            'date_fetched': today - datetime.timedelta(days=i % 365), 'submitted_by': rng.randint(1, sizes['users']),
+            'is_featured_qod': i == 0, 'is_community_qod': i == 1, 'report_count': 0,
+            'upvotes': vote_counts.get(i + 1, {}).get('upvote', 0),
+            'downvotes': vote_counts.get(i + 1, {}).get('downvote', 0),
+        })
+    # Roughly one in ten quotes is left uncategorized
+    links = {(quote_id, rng.randint(1, sizes['categories'])) for quote_id in range(1, sizes['quotes'] + 1)
+             if quote_id % 10}
+    preferences = {(user_id, rng.randint(1, sizes['categories'])) for user_id in range(1, sizes['users'] + 1)}
+
+    db.session.execute(insert(User.__table__), users)
+    db.session.execute(insert(Category.__table__), categories)
+    db.session.execute(insert(Quote.__table__), quotes)
+    db.session.execute(insert(quote_categories), [{'quote_id': q, 'category_id': c} for q, c in links])
+    db.session.execute(insert(user_preferences), [{'user_id': u, 'category_id': c} for u, c in preferences])
+    db.session.execute(insert(Vote.__table__), [
+        {'user_id': u, 'quote_id': q, 'vote_type': vote_type,
+         'created_at': now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 30))} for (u, q), vote_type in votes.items()
+    ])
+    db.session.execute(insert(Report.__table__), [
+        {'user_id': rng.randint(1, sizes['users']), 'quote_id': rng.randint(1, sizes['quotes']),
+         'report_reason': 'spam', 'report_date': today} for _ in range(sizes['reports'])
+    ])
+    db.session.commit()
+
+    with db.engine.begin() as connection:
+        rebuild_leaderboards(connection)
+        rebuild_vote_buckets(connection, now - datetime.timedelta(days=7))
+        install_search_index(connection)
+        install_trigram_index(connection)
+        install_category_counts(connection)
+    # Fresh statistics, so plans reflect the seeded sizes
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(sql_text('ANALYZE'))
+
+
+# Function to log a test client in as the given user
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+
+# Scenarios exercising the queries issued by routes.py and services.py.
+# Each takes a test client and returns nothing; responses only need to succeed.
+def _daily_quotes(client):
+    from src.daily import materialize_daily_quotes
+    materialize_daily_quotes(days_ahead=1)
+
+def _home_anonymous(client):
+    client.get('/')
+
+def _quote_of_the_day(client):
+    from src.services import get_quote_of_the_day
+    get_quote_of_the_day()
+
+def _home_personalized(client):
+    _login(client, 1)
+    client.get('/')
+
+def _feed(client):
+    _login(client, 5)
+    response = client.get('/api/feed?limit=5')
+    client.get(f"/feed?cursor={response.get_json()['next_cursor']}")
+
+def _trending(client):
+    client.get('/api/trending')
+    client.get('/trending')
+
+def _view_quotes(client):
+    client.get('/quotes?expanded_categories=category1,uncategorized')
+    client.get('/quotes?page=3&expanded_categories=uncategorized')
+    client.get('/quotes?expanded_categories=category2&cursor_category=category2&cursor=5000')
+
+def _search(client):
+    client.get('/quotes?search=patience&expanded_categories=category3')
+    client.get('/api/search?q=love')
+
+def _fuzzy(client):
+    client.get('/api/authors/suggest?q=Auth')
+    client.get('/api/quotes/fuzzy?q=patiense')
+    client.get('/quotes?search=zzzz')
+
+def _accounts(client):
+    client.post('/signup', data={'username': 'user1', 'email': 'new@example.com', 'password': 'secret123'})
+    client.post('/login', data={'username': 'user1', 'password': 'wrong'})
+
+def _submit_quote(client):
+    _login(client, 2)
+    client.get('/quotes/new')
+    client.post('/quotes/new', data={'text': 'Quote number 7 about art and patience', 'author': 'Someone'})
+
+def _preferences(client):
+    _login(client, 3)
+    client.get('/preferences')
+    client.post('/preferences', data={'categories': ['1', '2']})
+
+def _vote(client):
+    _login(client, 4)
+    client.post('/vote/123', data={'vote_type': 'upvote'})
+    client.post('/vote/123', data={'vote_type': 'downvote'})
+    client.post('/vote/123', data={'vote_type': 'downvote'})
+
+SCENARIOS = {
+    'daily_quotes': _daily_quotes,
+    'home': _home_anonymous,
+    'quote_of_the_day': _quote_of_the_day,
+    'home_personalized': _home_personalized,
+    'feed': _feed,
+    'trending': _trending,
+    'view_quotes': _view_quotes,
+    'search': _search,
+    'fuzzy': _fuzzy,
+    'accounts': _accounts,
+    'submit_quote': _submit_quote,
+    'preferences': _preferences,
+    'vote': _vote,
+}
+
+
+# Function to run the scenarios and capture every SELECT they issue
+def capture_statements(app, scenarios=None):
+    recorder = StatementRecorder()
+    event.listen(db.engine, 'before_cursor_execute', recorder)
+    try:
+        for name, scenario in (scenarios or SCENARIOS).items():
+            recorder.scenario = name
+            scenario(app.test_client())
+    finally:
+        recorder.scenario = None
+        event.remove(db.engine, 'before_cursor_execute', recorder)
+    return recorder.statements
+
+
+# Function to list the tables a statement walks in full: sequential scans, and index scans
+# with no range condition. An index walk under LIMIT that stops after the first rows (a
+# PostgreSQL Limit node without a Filter; the outermost SQLite loop with no sort) is bounded.
+def full_scans(connection, statement, parameters):
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        tables, nodes = [], [(plan[0]['Plan'], False)]
+        while nodes:
+            node, limited = nodes.pop()
+            node_type = node.get('Node Type')
+            if node_type == 'Seq Scan':
+                tables.append(node['Relation Name'])
+            elif node_type in _POSTGRES_INDEX_SCANS and 'Index Cond' not in node:
+                if not limited or 'Filter' in node:
+                    tables.append(node['Relation Name'])
+            limited = limited or node_type == 'Limit'
+            nodes.extend((child, limited) for child in node.get('Plans', []))
+        return tables
+
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    sorted_ = any('USE TEMP B-TREE' in row[-1] for row in rows)
+    first_loop = next((row for row in rows if row[1] == 0 and not row[-1].startswith('USE ')), None)
+    tables = []
+    for row in rows:
+        match = _SQLITE_SCAN_RE.match(row[-1])
+        if not match:
+            continue
+        bounded = (match.group('index') and row is first_loop and not sorted_
+                   and _SQL_LIMIT_RE.search(statement))
+        if not bounded:
+            # SQLAlchemy aliases tables as <name>_1, <name>_2, ...
+            tables.append(_ALIAS_SUFFIX_RE.sub('', match.group(1)))
+    return tables
+
+
+# Function to get the tables big enough that a full scan is a regression
+def large_tables(connection, min_rows=MIN_LARGE_TABLE_ROWS):
+    large = set()
+    for table in inspect(connection).get_table_names():
+        count = connection.execute(sql_text(f'SELECT count(*) FROM "{table}"')).scalar()
+        if count >= min_rows:
+            large.add(table)
+    return large
+
+
+# Function to EXPLAIN every captured statement; returns (scenario, table, statement) for each violation
+def check_query_plans(app, scenarios=None, allowed=None, min_rows=MIN_LARGE_TABLE_ROWS):
+    allowed = ALLOWED_SCANS if allowed is None else allowed
+    with app.app_context():
+        statements = capture_statements(app, scenarios)
+        violations, seen = [], set()
+        with db.engine.connect() as connection:
+            dialect = connection.dialect.name
+            large = large_tables(connection, min_rows)
+            for captured in statements:
+                key = (captured.scenario, captured.statement)
+                if key in seen:
+                    continue
+                seen.add(key)
+                for table in full_scans(connection, captured.statement, captured.parameters):
+                    if table not in large:
+                        continue
+                    if {(captured.scenario, table, None), (captured.scenario, table, dialect)} & set(allowed):
+                        continue
+                    violations.append((captured.scenario, table, captured.statement))
+    logger.info("Checked %d distinct statements, %d violation(s).", len(seen), len(violations))
+    return violations, len(seen)
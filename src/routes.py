@@ -1,102 +1,125 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from src.models import db, User, Quote, Vote, Report, Category
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, abort, current_app
+from src.models import db, User, Quote, Vote, Report, Category, find_duplicate_quote
 from flask_cors import cross_origin
-from werkzeug.security import generate_password_hash, check_password_hash
 import logging
-from src.services import get_quote_of_the_day, fetch_multiple_quotes_from_api, get_categorized_quotes, get_uncategorized_quotes
+from src.services import (get_quote_of_the_day, fetch_multiple_quotes_from_api, get_home_snapshot, QuotePage,
+                          get_category_page, get_category_quotes, has_uncategorized_quotes, count_uncategorized_quotes,
+                          get_uncategorized_page, quote_json)
+from src.feed import get_feed
+from src.current_user import get_current_user, invalidate_current_user, set_user_category_ids
+from src.leaderboard import top_quotes
+from src.trending import get_trending
+from src.search import search_quotes, suggest_authors, fuzzy_search_quotes
 from src.forms import QuoteForm, SignupForm
-from sqlalchemy.exc import IntegrityError
+from src.passwords import password_hasher, login_limiter, PasswordHasherBusy
+from src.votes import apply_vote, vote_buffer, VOTE_TYPES, VOTE_ADDED, VOTE_REMOVED, VOTE_CHANGED
+from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
 routes = Blueprint('routes', __name__)
 
+CSRF_DEBUG_ENDPOINTS = frozenset({'routes.signup', 'routes.new_quote'})
+
 @routes.route('/')
 @cross_origin()
 def home():
+    # Shared home page data comes from a cached snapshot; only the feed is per user.
+    # Building it may store the day's quotes and commit, so it comes before the feed is loaded.
+    snapshot = get_home_snapshot()
+
     personalized_quotes = []
-    if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-        if user:
-            # Fetch personalized quotes based on user's preferred categories
-            personalized_quotes = Quote.query.join(Quote.categories).filter(
-                Category.id.in_([c.id for c in user.categories])
-            ).all()
-        else:
-            logger.error(f"No user found with ID: {session['user_id']}")
+    user = get_current_user()
+    if user:
+        # The top of the user's ranked feed; the rest is on /feed
+        personalized_quotes = get_feed(user.id, limit=current_app.config.get('FEED_HOME_SIZE', 6),
+                                       category_ids=sorted(user.category_ids)).quotes
     else:
-        logger.warning("No user is logged in.")
-
-    # Consolidate categories (rename, merge, etc.)
-    consolidate_categories()
+        logger.debug("No user is logged in.")
 
-    categorized_quotes = get_categorized_quotes()
-    uncategorized_quotes = get_uncategorized_quotes()
-
-    logger.debug("Home route accessed.")
-    logger.debug(f"Categorized Quotes Retrieved: {categorized_quotes}")
-    logger.debug(f"Uncategorized Quotes Retrieved: {uncategorized_quotes}")
-    logger.debug(f"Personalized Quotes Retrieved: {personalized_quotes}")
-
-    featured_qod = get_quote_of_the_day()
-    community_qod = Quote.query.filter_by(is_community_qod=True).first()
+    logger.debug("Home route accessed with %d personalized quotes.", len(personalized_quotes))
 
     return render_template(
         'index.html',
-        categorized_quotes=categorized_quotes,
-        uncategorized_quotes=uncategorized_quotes,
-        community_qod=community_qod,
-        featured_qod=featured_qod,
+        top_quotes=snapshot['top_quotes'],
+        community_qod=snapshot['community_qod'],
+        featured_qod=snapshot['featured_qod'],
         personalized_quotes=personalized_quotes
     )
 
-def consolidate_categories():
-    try:
-        category_mapping = {
-            'inspire': 'Inspiration',
-            'management': 'Management',
-            'sports': 'Sports',
-            'life': 'Life',
-            'funny': 'Humor',
-            'students': 'Education',
-            'hardwork': 'Hard Work',
-            'self-improvement': 'Self Improvement',
-            'self-worth': 'Self Worth',
-            'self-imposed-limits': 'Self Imposed Limits',
-        }
-
-        all_categories = Category.query.all()
-        category_names = {category.name.lower(): category for category in all_categories}
-
-        for old_name, new_name in category_mapping.items():
-            old_key = old_name.lower()
-            new_key = new_name.lower()
-
-            if old_key in category_names and new_key not in category_names:
-                # Rename the category
-                cat = category_names[old_key]
-                cat.name = new_name
-                logger.info(f"Updating category '{old_name}' to '{new_name}'")
-            elif old_key in category_names and new_key in category_names:
-                # Merge quotes from old category into the new one
-                old_category = category_names[old_key]
-                new_category = category_names[new_key]
-                for quote in old_category.quotes:
-                    if quote not in new_category.quotes:
-                        new_category.quotes.append(quote)
-                db.session.delete(old_category)
-                logger.info(f"Merging category '{old_name}' into '{new_name}'")
-
-        db.session.commit()
-    except IntegrityError as e:
-        db.session.rollback()
-        logger.error(f"Error consolidating categories: {str(e)}")
-
 @routes.before_app_request
 def debug_csrf_token():
-    if request.endpoint in ['routes.signup', 'routes.new_quote']:
-        logger.debug(f"CSRF Token (from cookie): {request.cookies.get('csrf_token')}")
-        logger.debug(f"CSRF Token (from form): {request.form.get('csrf_token')}")
+    # Checked before touching the request, so this costs nothing unless DEBUG is on for this logger
+    if logger.isEnabledFor(logging.DEBUG) and request.endpoint in CSRF_DEBUG_ENDPOINTS:
+        logger.debug("CSRF token present in cookie: %s, in form: %s",
+                     'csrf_token' in request.cookies, 'csrf_token' in request.form)
+
+@routes.route('/feed', methods=["GET"])
+@cross_origin()
+def personalized_feed():
+    user = get_current_user()
+    if not user:
+        flash('You need to be logged in to see your feed.', 'warning')
+        return redirect(url_for('routes.login'))
+
+    feed = get_feed(user.id, cursor=request.args.get('cursor'), category_ids=sorted(user.category_ids))
+    return render_template('personalized_feed.html', quotes=feed.quotes, next_cursor=feed.next_cursor)
+
+@routes.route('/api/feed', methods=["GET"])
+@cross_origin()
+def api_feed():
+    user = get_current_user()
+    if not user:
+        return jsonify({'error': 'Login required.'}), 401
+
+    limit = min(max(request.args.get('limit', current_app.config.get('FEED_PAGE_SIZE', 20), type=int), 1), 100)
+    feed = get_feed(user.id, cursor=request.args.get('cursor'), limit=limit, shape='listing',
+                    category_ids=sorted(user.category_ids))
+    return jsonify({
+        'next_cursor': feed.next_cursor,
+        'results': [dict(quote_json(quote), score=feed.scores[quote.id]) for quote in feed.quotes]
+    })
+
+@routes.route('/categories/<name>/top', methods=["GET"])
+@cross_origin()
+def category_top(name):
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    entries = top_quotes(name, limit)
+    if entries is None:
+        abort(404)
+    return render_template('category_top.html', category_name=name.strip().lower(), entries=entries)
+
+@routes.route('/api/categories/<name>/top', methods=["GET"])
+@cross_origin()
+def api_category_top(name):
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    entries = top_quotes(name, limit)
+    if entries is None:
+        return jsonify({'error': 'Unknown category.'}), 404
+    return jsonify({
+        'category': name.strip().lower(),
+        'results': [dict(quote_json(quote), score=score) for quote, score in entries]
+    })
+
+@routes.route('/trending', methods=["GET"])
+@cross_origin()
+def trending():
+    entries = get_trending(current_app.config.get('TRENDING_SIZE', 50))
+    return render_template('trending.html', entries=entries,
+                           window_hours=current_app.config.get('TRENDING_WINDOW_HOURS', 24))
+
+@routes.route('/api/trending', methods=["GET"])
+@cross_origin()
+def api_trending():
+    size = current_app.config.get('TRENDING_SIZE', 50)
+    limit = min(max(request.args.get('limit', size, type=int), 1), size)
+    entries = get_trending(limit)
+    return jsonify({
+        'window_hours': current_app.config.get('TRENDING_WINDOW_HOURS', 24),
+        'refreshed_at': entries[0].refreshed_at.isoformat() if entries else None,
+        'results': [dict(quote_json(entry.quote), rank=entry.rank, score=entry.score,
+                         recent_upvotes=entry.upvotes, recent_downvotes=entry.downvotes) for entry in entries]
+    })
 
 @routes.route('/signup', methods=["GET", "POST"])
 @cross_origin()
@@ -115,7 +138,12 @@ def signup():
             flash('Email already exists.', 'warning')
             return redirect(url_for('routes.signup'))
 
-        password_hash = generate_password_hash(password)
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            logger.warning("Password hashing pool is full; rejecting signup.")
+            flash('The server is busy. Please try again in a moment.', 'warning')
+            return render_template('signup.html', form=form), 503
         new_user = User(email=email, username=username, password_hash=password_hash)
 
         db.session.add(new_user)
@@ -139,11 +167,35 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
 
+        address = request.remote_addr
+        retry_after = login_limiter.retry_after(address, username)
+        if retry_after:
+            logger.warning("Too many failed logins for username %s or address %s", username, address)
+            flash(f'Too many failed login attempts. Please try again in {retry_after} seconds.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
+
         user = User.query.filter_by(username=username).first()
-        if not user or not check_password_hash(user.password_hash, password):
-            logger.warning(f"Login failed for username: {username}")
+        try:
+            valid = bool(user) and password_hasher.verify(user.password_hash, password)
+        except PasswordHasherBusy:
+            logger.warning("Password hashing pool is full; rejecting login.")
+            flash('The server is busy. Please try again in a moment.', 'warning')
+            return render_template('login.html'), 503
+        if not valid:
+            login_limiter.record_failure(address, username)
+            logger.warning("Login failed for username: %s", username)
             flash('Invalid username or password.', 'danger')
             return redirect(url_for('routes.login'))
+        login_limiter.record_success(username)
+
+        # Upgrade hashes made with older settings while the plain password is at hand
+        if password_hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = password_hasher.hash(password)
+                db.session.commit()
+                logger.info("Rehashed password for user %s", user.id)
+            except PasswordHasherBusy:
+                logger.info("Skipped rehashing password for user %s; hashing pool is full.", user.id)
 
         session['user_id'] = user.id
         session.modified = True
@@ -156,7 +208,7 @@ def login():
 @cross_origin()
 def logout():
     user_id = session.pop('user_id', None)
-    logger.info(f"User {user_id} logged out")
+    logger.info("User %s logged out", user_id)
     flash('You have been logged out.', 'success')
     return redirect(url_for('routes.home'))
 
@@ -169,55 +221,90 @@ def view_quotes():
     per_page = request.args.get('per_page', 10, type=int)
     search_query = request.args.get('search', '').strip()
 
-    categorized_quotes = {}
-    uncategorized_quotes = []
-
-    if search_query:
-        all_quotes = Quote.query.join(User, User.id == Quote.submitted_by, isouter=True).filter(
-            (Quote.text.ilike(f"%{search_query}%")) |
-            (Quote.author.ilike(f"%{search_query}%")) |
-            (User.username.ilike(f"%{search_query}%"))
-        ).order_by(Quote.id).all()
-    else:
-        all_quotes = Quote.query.order_by(Quote.id).all()
-
-    for quote in all_quotes:
-        if quote.categories:
-            for cat in quote.categories:
-                cat_name = cat.name.strip().lower()
-                if cat_name not in categorized_quotes:
-                    categorized_quotes[cat_name] = []
-                categorized_quotes[cat_name].append(quote)
-        else:
-            uncategorized_quotes.append(quote)
+    expanded_categories = request.args.get('expanded_categories', '').split(',')
+    cursor_category = request.args.get('cursor_category', '')
+    cursor = request.args.get('cursor', type=int)
 
-    sorted_categories = dict(sorted(categorized_quotes.items()))
-    category_list = list(sorted_categories.items())
+    # Page through categories in SQL, then load quotes only for expanded ones
+    category_rows, total_categories = get_category_page(page, per_page, search_query)
+    uncategorized_exists = has_uncategorized_quotes(search_query)
 
-    total_categories = len(category_list)
     total_pages = (total_categories // per_page) + (1 if total_categories % per_page != 0 else 0)
-    if uncategorized_quotes:
+    if uncategorized_exists:
         total_pages += 1
 
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    paginated_categories = category_list[start_index:end_index]
+    paginated_categories = []
+    for category_name, quote_count in category_rows:
+        if category_name in expanded_categories:
+            after_id = cursor if cursor_category == category_name else None
+            quotes = get_category_quotes(category_name, quote_count, search_query, after_id=after_id)
+        else:
+            quotes = QuotePage([], quote_count)
+        paginated_categories.append((category_name, quotes))
+
+    uncategorized_quotes = []
+    show_uncategorized = (page == total_pages) and uncategorized_exists
+    if show_uncategorized:
+        uncategorized_total = count_uncategorized_quotes(search_query)
+        if 'uncategorized' in expanded_categories:
+            after_id = cursor if cursor_category == 'uncategorized' else None
+            uncategorized_quotes = get_uncategorized_page(uncategorized_total, search_query, after_id=after_id)
+        else:
+            uncategorized_quotes = QuotePage([], uncategorized_total)
 
-    show_uncategorized = (page == total_pages) and uncategorized_quotes
+    # Nothing matched exactly: offer close author names instead of an empty page
+    author_suggestions = []
+    if search_query and not total_categories and not uncategorized_exists:
+        author_suggestions = [s['author'] for s in suggest_authors(search_query, limit=3)]
 
     logger.info("Rendering view quotes page with grouped quotes by categories.")
     return render_template(
         'view_quotes.html',
         paginated_categories=paginated_categories,
-        uncategorized_quotes=uncategorized_quotes if show_uncategorized else [],
+        uncategorized_quotes=uncategorized_quotes,
         total_categories=total_categories,
         total_pages=total_pages,
         page=page,
         per_page=per_page,
         search_query=search_query,
-        expanded_categories=request.args.get('expanded_categories', '').split(',')
+        expanded_categories=expanded_categories,
+        author_suggestions=author_suggestions
     )
 
+@routes.route('/api/search', methods=["GET"])
+@cross_origin()
+def api_search():
+    search_query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    quotes, has_more = search_quotes(search_query, page, per_page)
+    return jsonify({
+        'query': search_query,
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more,
+        'results': [quote_json(quote) for quote in quotes]
+    })
+
+@routes.route('/api/authors/suggest', methods=["GET"])
+@cross_origin()
+def api_suggest_authors():
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    return jsonify({'query': query, 'suggestions': suggest_authors(query, limit)})
+
+@routes.route('/api/quotes/fuzzy', methods=["GET"])
+@cross_origin()
+def api_fuzzy_quotes():
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    matches = fuzzy_search_quotes(query, limit)
+    return jsonify({
+        'query': query,
+        'results': [dict(quote_json(quote), score=round(score, 3)) for quote, score in matches]
+    })
+
 @routes.route('/quotes/new', methods=["GET", "POST"])
 @cross_origin()
 def new_quote():
@@ -227,15 +314,21 @@ def new_quote():
     if form.validate_on_submit():
         logger.debug("New quote form submitted.")
 
-        if 'user_id' not in session:
+        user = get_current_user()
+        if not user:
             logger.warning("User must be logged in to submit a quote.")
             flash('You need to be logged in to submit a quote.', 'warning')
             return redirect(url_for('routes.login'))
 
+        if find_duplicate_quote(form.text.data):
+            logger.info("Rejected duplicate quote submission.")
+            form.text.errors.append('This quote has already been submitted.')
+            return render_template('submit_quote.html', form=form)
+
         new_quote_obj = Quote(
             text=form.text.data,
             author=form.author.data,
-            submitted_by=session['user_id']
+            submitted_by=user.id
         )
         db.session.add(new_quote_obj)
 
@@ -254,12 +347,12 @@ def new_quote():
 @routes.route('/preferences', methods=["GET", "POST"])
 @cross_origin()
 def preferences():
-    if 'user_id' not in session:
+    user = get_current_user()
+    if not user:
         logger.warning("Attempt to access preferences without logging in.")
         flash('You need to be logged in to set preferences.', 'warning')
         return redirect(url_for('routes.login'))
 
-    user = User.query.get(session['user_id'])
     categories = Category.query.all()
     if not categories:
         logger.debug("No categories available, rendering an empty form.")
@@ -267,11 +360,13 @@ def preferences():
 
     if request.method == "POST":
         logger.debug("Preferences form submitted.")
-        selected_category_ids = request.form.getlist('categories')
-        selected_cats = Category.query.filter(Category.id.in_(selected_category_ids)).all()
+        known_ids = {category.id for category in categories}
+        selected_category_ids = {int(category_id) for category_id in request.form.getlist('categories')
+                                 if category_id.isdigit() and int(category_id) in known_ids}
 
-        user.categories = selected_cats
+        set_user_category_ids(user.id, selected_category_ids)
         db.session.commit()
+        invalidate_current_user(user.id)
 
         logger.info("User preferences updated.")
         flash('Your preferences have been updated.', 'success')
@@ -283,61 +378,41 @@ def preferences():
 @routes.route('/vote/<int:quote_id>', methods=["POST"])
 @cross_origin()
 def vote_quote(quote_id):
-    logger.debug(f"Vote request received for quote ID {quote_id}")
-    if 'user_id' not in session:
+    logger.debug("Vote request received for quote ID %s", quote_id)
+    user = get_current_user()
+    if not user:
         logger.warning("User must be logged in to vote.")
         flash('You need to be logged in to vote.', 'danger')
         return redirect(url_for('routes.login'))
 
-    try:
-        user_id = session['user_id']
-        vote_type = request.form.get('vote_type')
-
-        if not vote_type:
-            logger.error("Invalid vote type provided.")
-            flash('Invalid vote type.', 'danger')
-            return redirect(request.referrer or url_for('routes.home'))
-
-        quote = Quote.query.get_or_404(quote_id)
-        logger.info(f"Updating vote for quote ID {quote_id}")
+    user_id = user.id
+    vote_type = request.form.get('vote_type')
 
-        existing_vote = Vote.query.filter_by(user_id=user_id, quote_id=quote_id).first()
+    if vote_type not in VOTE_TYPES:
+        logger.error("Invalid vote type provided.")
+        flash('Invalid vote type.', 'danger')
+        return redirect(request.referrer or url_for('routes.home'))
 
-        if not existing_vote:
-            logger.debug(f"Creating new Vote: User ID {user_id}, Quote ID {quote_id}, Vote Type {vote_type}")
-            new_vote = Vote(user_id=user_id, quote_id=quote_id, vote_type=vote_type)
-            db.session.add(new_vote)
+    try:
+        logger.debug("Updating vote for quote ID %s", quote_id)
+        if vote_buffer.enabled:
+            outcome = vote_buffer.submit(user_id, quote_id, vote_type)
+        else:
+            outcome = apply_vote(user_id, quote_id, vote_type)
+        if outcome is None:
+            db.session.rollback()
+            abort(404)
+        db.session.commit()
+        logger.info("Vote successfully updated for quote ID %s", quote_id)
 
-            if vote_type == 'upvote':
-                quote.upvotes += 1
-            elif vote_type == 'downvote':
-                quote.downvotes += 1
+        if outcome == VOTE_ADDED:
             flash('Vote added successfully!', 'success')
+        elif outcome == VOTE_REMOVED:
+            flash('Vote removed successfully.', 'info')
+        elif outcome == VOTE_CHANGED:
+            flash('Vote updated successfully!', 'success')
         else:
-            if existing_vote.vote_type == vote_type:
-                logger.info(f"User {user_id} clicked the same vote type. Removing vote.")
-                if vote_type == 'upvote':
-                    quote.upvotes -= 1
-                elif vote_type == 'downvote':
-                    quote.downvotes -= 1
-                db.session.delete(existing_vote)
-                flash('Vote removed successfully.', 'info')
-            else:
-                logger.info(f"User {user_id} changed vote from {existing_vote.vote_type} to {vote_type}.")
-                if existing_vote.vote_type == 'upvote':
-                    quote.upvotes -= 1
-                elif existing_vote.vote_type == 'downvote':
-                    quote.downvotes -= 1
-
-                existing_vote.vote_type = vote_type
-                if vote_type == 'upvote':
-                    quote.upvotes += 1
-                elif vote_type == 'downvote':
-                    quote.downvotes += 1
-                flash('Vote updated successfully!', 'success')
-
-        db.session.commit()
-        logger.info(f"Vote successfully updated for quote ID {quote_id}")
+            flash('Your vote was already recorded.', 'info')
 
         expanded_categories = request.form.get('expanded_categories', '')
         page = request.form.get('page', 1)
@@ -349,8 +424,8 @@ def vote_quote(quote_id):
                                                expanded_categories=expanded_categories)
         return redirect(next_page + f"#quote-{quote_id}")
 
-    except Exception as e:
+    except SQLAlchemyError as e:
         db.session.rollback()
-        logger.error(f"Error occurred during voting process: {str(e)}")
+        logger.error("Error occurred during voting process: %s", e)
         flash('An error occurred while processing your vote. Please try again.', 'danger')
         return redirect(request.referrer or url_for('routes.home'))
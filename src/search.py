@@ -0,0 +1,311 @@
+import logging
+import re
+import threading
+import sqlalchemy as sa
+from src.models import db, Quote, User
+from src.cache import snapshot_cache, CONTENT
+from src.loading import quote_options
+from src.trigram import TrigramIndex
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration used for the PostgreSQL tsvector column
+TS_CONFIG = 'english'
+# Upper bound on search terms so a pasted paragraph cannot build a huge query
+MAX_SEARCH_TERMS = 8
+
+# Fuzzy lookups: minimum input length and pg_trgm-style similarity cut-off
+MIN_FUZZY_QUERY_LENGTH = 2
+FUZZY_THRESHOLD = 0.3
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_backend_by_engine = {}
+_fallback_indexes = {}
+_fallback_lock = threading.Lock()
+
+# PostgreSQL: tsvector column on quotes maintained by a trigger, with a GIN index
+POSTGRES_DDL = [
+    f"""
+    CREATE OR REPLACE FUNCTION quotes_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(NEW.text, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT username FROM users WHERE id = NEW.submitted_by), '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS quotes_search_vector_trigger ON quotes",
+    """
+    CREATE TRIGGER quotes_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF text, author, submitted_by ON quotes
+    FOR EACH ROW EXECUTE FUNCTION quotes_search_vector_update()
+    """,
+    # Backfill existing rows by firing the trigger
+    "UPDATE quotes SET text = text",
+]
+
+# PostgreSQL: trigram indexes for fuzzy author/quote lookups
+TRIGRAM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_quotes_author_trgm ON quotes USING gin (author gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_quotes_text_trgm ON quotes USING gin (text gin_trgm_ops)",
+]
+
+TRIGRAM_DROP_DDL = [
+    "DROP INDEX IF EXISTS ix_quotes_text_trgm",
+    "DROP INDEX IF EXISTS ix_quotes_author_trgm",
+]
+
+POSTGRES_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS quotes_search_vector_trigger ON quotes",
+    "DROP FUNCTION IF EXISTS quotes_search_vector_update()",
+]
+
+# SQLite (development): FTS5 table kept in sync with quotes by triggers
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE quotes_fts USING fts5(text, author, username, tokenize='porter unicode61')",
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_insert AFTER INSERT ON quotes BEGIN
+        INSERT INTO quotes_fts (rowid, text, author, username)
+        VALUES (new.id, new.text, coalesce(new.author, ''),
+                coalesce((SELECT username FROM users WHERE id = new.submitted_by), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_delete AFTER DELETE ON quotes BEGIN
+        DELETE FROM quotes_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_update AFTER UPDATE OF text, author, submitted_by ON quotes BEGIN
+        DELETE FROM quotes_fts WHERE rowid = old.id;
+        INSERT INTO quotes_fts (rowid, text, author, username)
+        VALUES (new.id, new.text, coalesce(new.author, ''),
+                coalesce((SELECT username FROM users WHERE id = new.submitted_by), ''));
+    END
+    """,
+    """
+    INSERT INTO quotes_fts (rowid, text, author, username)
+    SELECT quotes.id, quotes.text, coalesce(quotes.author, ''), coalesce(users.username, '')
+    FROM quotes LEFT OUTER JOIN users ON users.id = quotes.submitted_by
+    """,
+]
+
+SQLITE_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS quotes_fts_insert",
+    "DROP TRIGGER IF EXISTS quotes_fts_delete",
+    "DROP TRIGGER IF EXISTS quotes_fts_update",
+    "DROP TABLE IF EXISTS quotes_fts",
+]
+
+
+# Function to create (or rebuild) the search index for the connection's database
+def install_search_index(connection):
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        statements = POSTGRES_DDL
+    elif dialect == 'sqlite':
+        statements = SQLITE_DROP_DDL + SQLITE_DDL
+    else:
+        logger.warning("No full-text search index available for dialect %s.", dialect)
+        return
+    for statement in statements:
+        connection.execute(sa.text(statement))
+    _backend_by_engine.clear()
+    logger.info("Installed full-text search index for %s.", dialect)
+
+
+# Function to drop the search index triggers and tables
+def drop_search_index(connection):
+    dialect = connection.dialect.name
+    statements = {'postgresql': POSTGRES_DROP_DDL, 'sqlite': SQLITE_DROP_DDL}.get(dialect, [])
+    for statement in statements:
+        connection.execute(sa.text(statement))
+    _backend_by_engine.clear()
+
+
+# Function to determine which search implementation the current database supports
+def search_backend():
+    engine = db.engine
+    backend = _backend_by_engine.get(engine.url)
+    if backend is None:
+        dialect = engine.dialect.name
+        if dialect == 'postgresql':
+            backend = 'postgresql'
+        elif dialect == 'sqlite' and sa.inspect(engine).has_table('quotes_fts'):
+            backend = 'sqlite'
+        else:
+            logger.warning("Full-text search index not installed; falling back to LIKE search.")
+            backend = 'like'
+        _backend_by_engine[engine.url] = backend
+    return backend
+
+
+# Function to split a search box query into safe, bounded search terms
+def search_terms(search_query):
+    return _TOKEN_RE.findall(search_query.lower())[:MAX_SEARCH_TERMS]
+
+
+def _tsquery(terms):
+    # Every term must match; each term also matches as a prefix
+    return sa.func.to_tsquery(TS_CONFIG, ' & '.join(f"{term}:*" for term in terms))
+
+
+def _fts5_query(terms):
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _like_condition(search_query):
+    pattern = f"%{search_query}%"
+    return sa.or_(
+        Quote.text.ilike(pattern),
+        Quote.author.ilike(pattern),
+        Quote.submitted_by.in_(sa.select(User.id).where(User.username.ilike(pattern)))
+    )
+
+
+# Function to build an SQL predicate on Quote matching the search box query
+def search_condition(search_query):
+    terms = search_terms(search_query)
+    if not terms:
+        return sa.false()
+
+    backend = search_backend()
+    if backend == 'postgresql':
+        return Quote.search_vector.op('@@')(_tsquery(terms))
+    if backend == 'sqlite':
+        matching_ids = sa.select(sa.literal_column('rowid')).select_from(sa.table('quotes_fts')).where(
+            sa.text('quotes_fts MATCH :fts_query').bindparams(fts_query=_fts5_query(terms))
+        )
+        return Quote.id.in_(matching_ids)
+    return _like_condition(search_query)
+
+
+# Function to get one page of quote ids matching the query, best match first
+def search_quote_ids(search_query, page=1, per_page=20):
+    terms = search_terms(search_query)
+    if not terms:
+        return [], False
+
+    offset = (page - 1) * per_page
+    backend = search_backend()
+    if backend == 'postgresql':
+        tsquery = _tsquery(terms)
+        query = sa.select(Quote.id).where(Quote.search_vector.op('@@')(tsquery)).order_by(
+            sa.func.ts_rank(Quote.search_vector, tsquery).desc(), Quote.id
+        )
+    elif backend == 'sqlite':
+        query = sa.text(
+            "SELECT rowid FROM quotes_fts WHERE quotes_fts MATCH :fts_query "
+            "ORDER BY bm25(quotes_fts, 3.0, 2.0, 1.0), rowid LIMIT :limit OFFSET :offset"
+        ).bindparams(fts_query=_fts5_query(terms), limit=per_page + 1, offset=offset)
+        ids = list(db.session.execute(query).scalars())
+        return ids[:per_page], len(ids) > per_page
+    else:
+        query = sa.select(Quote.id).where(_like_condition(search_query)).order_by(Quote.id)
+
+    ids = list(db.session.execute(query.limit(per_page + 1).offset(offset)).scalars())
+    return ids[:per_page], len(ids) > per_page
+
+
+# Function to get one page of ranked quotes matching the query
+def search_quotes(search_query, page=1, per_page=20):
+    ids, has_more = search_quote_ids(search_query, page, per_page)
+    if not ids:
+        return [], has_more
+    quotes = Quote.query.options(*quote_options('listing')).filter(Quote.id.in_(ids)).all()
+    quotes_by_id = {quote.id: quote for quote in quotes}
+    return [quotes_by_id[quote_id] for quote_id in ids if quote_id in quotes_by_id], has_more
+
+
+# Function to create the pg_trgm indexes (no-op outside PostgreSQL)
+def install_trigram_index(connection):
+    if connection.dialect.name != 'postgresql':
+        return
+    for statement in TRIGRAM_DDL:
+        connection.execute(sa.text(statement))
+
+
+# Function to drop the pg_trgm indexes
+def drop_trigram_index(connection):
+    if connection.dialect.name != 'postgresql':
+        return
+    for statement in TRIGRAM_DROP_DDL:
+        connection.execute(sa.text(statement))
+
+
+# Function to get an in-memory trigram index, rebuilt when quote content changes (votes leave it alone)
+def _fallback_index(name, build):
+    version = snapshot_cache.data_version(CONTENT)
+    entry = _fallback_indexes.get(name)
+    if entry is None or entry[0] != version:
+        with _fallback_lock:
+            entry = _fallback_indexes.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, build())
+                _fallback_indexes[name] = entry
+                logger.info("Built in-memory trigram index %s.", name)
+    return entry[1]
+
+
+def _build_author_index():
+    index = TrigramIndex()
+    counts = {}
+    rows = db.session.query(Quote.author, sa.func.count()).filter(Quote.author.isnot(None)).group_by(Quote.author)
+    for author, quote_count in rows:
+        index.add(author, author)
+        counts[author] = quote_count
+    return index, counts
+
+
+def _build_quote_index():
+    index = TrigramIndex()
+    for quote_id, text in db.session.query(Quote.id, Quote.text).yield_per(1000):
+        index.add(quote_id, text)
+    return index
+
+
+# Function to suggest authors for partially typed or misspelled input
+def suggest_authors(query, limit=10):
+    query = query.strip()
+    if len(query) < MIN_FUZZY_QUERY_LENGTH:
+        return []
+
+    if db.engine.dialect.name == 'postgresql':
+        score = sa.func.max(sa.func.word_similarity(query, Quote.author)).label('score')
+        rows = db.session.query(Quote.author, score, sa.func.count().label('quote_count')).filter(
+            sa.literal(query).op('<%')(Quote.author)
+        ).group_by(Quote.author).order_by(score.desc(), Quote.author).limit(limit).all()
+        return [{'author': row.author, 'score': round(float(row.score), 3), 'quotes': row.quote_count} for row in rows]
+
+    index, counts = _fallback_index('authors', _build_author_index)
+    return [
+        {'author': author, 'score': round(score, 3), 'quotes': counts[author]}
+        for author, score in index.search(query, limit=limit, threshold=FUZZY_THRESHOLD)
+    ]
+
+
+# Function to find quotes whose text approximately matches the input
+def fuzzy_search_quotes(query, limit=10):
+    query = query.strip()
+    if len(query) < MIN_FUZZY_QUERY_LENGTH:
+        return []
+
+    if db.engine.dialect.name == 'postgresql':
+        score = sa.func.word_similarity(query, Quote.text)
+        rows = db.session.query(Quote.id, score).filter(
+            sa.literal(query).op('<%')(Quote.text)
+        ).order_by(score.desc(), Quote.id).limit(limit).all()
+        matches = [(row[0], float(row[1])) for row in rows]
+    else:
+        index = _fallback_index('quotes', _build_quote_index)
+        matches = index.search(query, limit=limit, threshold=FUZZY_THRESHOLD)
+
+    if not matches:
+        return []
+    quotes = Quote.query.options(*quote_options('listing')).filter(Quote.id.in_([quote_id for quote_id, _ in matches])).all()
+    quotes_by_id = {quote.id: quote for quote in quotes}
+    return [(quotes_by_id[quote_id], score) for quote_id, score in matches if quote_id in quotes_by_id]
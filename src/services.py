@@ -1,179 +1,151 @@
-import requests
 import datetime
-import time
-from src.models import db, Quote, Category 
+from flask import current_app
+from src.models import db, Quote, Category, CategoryCount, quote_categories, find_duplicate_quote
+from src.category_counts import UNCATEGORIZED_ID
+from src.cache import snapshot_cache, CONTENT, VOTES
+from src.daily import get_daily_quotes, get_todays_quotes, store_daily_quote, FEATURED, COMMUNITY
+from src.leaderboard import top_quotes_by_category
+from src.loading import quote_options
+from src.search import search_condition
+from src.upstream import upstream, UpstreamError
 import logging
-import os
-from collections import defaultdict
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 
 logger = logging.getLogger(__name__)
 
+# How long one quote-of-the-day fetch may hold the lock
+QOD_LOCK_TIMEOUT = 30
+
+# Function to look up today's featured quote, through the cache. A quote fetched today is
+# dated today; a stored quote the API features again only has today's daily_quotes row.
+def _cached_quote_of_the_day(today):
+    cache_key = f"qod:{today.isoformat()}"
+    quote_id = snapshot_cache.get(cache_key)
+    if quote_id is not None:
+        quote = db.session.get(Quote, quote_id, options=quote_options('detail'))
+        if quote is not None:
+            return quote
+        snapshot_cache.delete(cache_key)
+
+    quote = Quote.query.options(*quote_options('detail')).filter_by(date_fetched=today, is_featured_qod=True).first()
+    if quote is None:
+        quote = get_daily_quotes(today).get(FEATURED)
+    if quote is not None:
+        snapshot_cache.set(cache_key, quote.id, current_app.config['QOD_CACHE_TTL'])
+    return quote
+
+# Function to get the most recent featured quote before today, shown while today's cannot be fetched
+def _previous_quote_of_the_day(today):
+    return Quote.query.options(*quote_options('detail')).filter(
+        Quote.date_fetched < today, Quote.is_featured_qod.is_(True)
+    ).order_by(Quote.date_fetched.desc()).first()
+
+# Function to get the quote of the day without calling the API or writing anything
+def get_stored_quote_of_the_day():
+    today = datetime.date.today()
+    return _cached_quote_of_the_day(today) or _previous_quote_of_the_day(today)
+
 # Function to get the quote of the day
 def get_quote_of_the_day():
     today = datetime.date.today()
-    quote = Quote.query.filter_by(date_fetched=today, is_featured_qod=True).first()
-
+    quote = _cached_quote_of_the_day(today)
     if quote:
         logger.info("Returning existing quote of the day from database.")
         return quote
 
-    logger.info("No quote of the day found for today. Checking cache before fetching a new one.")
+    # Single flight: one request fetches, concurrent ones wait here and then reuse its result
+    with snapshot_cache.lock(f"qod:{today.isoformat()}", timeout=QOD_LOCK_TIMEOUT) as acquired:
+        quote = _cached_quote_of_the_day(today)
+        if quote:
+            return quote
+        if not acquired:
+            logger.info("Another worker is fetching the quote of the day; using the previous one.")
+            return _previous_quote_of_the_day(today)
+        if snapshot_cache.get(f"qod-backoff:{today.isoformat()}"):
+            logger.info("Skipping API call: backing off after a failed fetch.")
+            return _previous_quote_of_the_day(today)
 
-    # Check if we've recently hit the API (avoid calling too often)
-    # last_fetched_time = cache.get("last_qod_fetch_time")
-    # if last_fetched_time and (datetime.datetime.now() - last_fetched_time).seconds < 3600:
-    #     logger.info("Skipping API call: Recently fetched.")
-    #     return create_default_quote(today)
+        quote = fetch_new_quote_from_api(today)
+    return quote or _previous_quote_of_the_day(today)
 
-    # cache.set("last_qod_fetch_time", datetime.datetime.now())  
-    return fetch_new_quote_from_api(today)
+# Function to stop calling the API for a while after a failure
+def _back_off_quote_of_the_day(today, seconds):
+    logger.info("Not fetching the quote of the day again for %ss.", seconds)
+    snapshot_cache.set(f"qod-backoff:{today.isoformat()}", True, seconds)
 
-# Function to fetch a new quote from the API
+# Function to fetch a new quote from the API; returns None (and backs off) on failure
 def fetch_new_quote_from_api(today):
     logger.info("Attempting to fetch a new quote from the API.")
-    api_url = "https://quotes.rest/qod?language=en"
-    headers = {
-        "Authorization": f"Bearer {os.getenv('API_TOKEN')}",
-        "Accept": "application/json"
-    }
+    retry_after = current_app.config['QOD_RETRY_AFTER']
 
+    # No retries here: this runs inside a page request, and failures are backed off instead
     try:
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        if "contents" in data and "quotes" in data["contents"]:
-            new_quote = data["contents"]["quotes"][0]
-            category_name = new_quote.get("category", "Uncategorized")
-
-            # Fetch or create the category in the database
-            category = Category.query.filter_by(name=category_name).first()
-            if not category:
-                category = Category(name=category_name)
-                db.session.add(category)
-                db.session.commit()
-
-            # Create a new quote and associate it with the category
-            quote = Quote(
-                text=new_quote["quote"],
-                author=new_quote["author"],
-                date_fetched=today,
-                is_featured_qod=True
-            )
-            quote.categories.append(category)  # Associate the quote with the category
-            db.session.add(quote)
-            db.session.commit()
-            logger.info("Fetched and saved new quote of the day.")
-            return quote
-        else:
-            logger.warning("No quote found in API response, creating default quote.")
-            return create_default_quote(today)
-    except requests.exceptions.HTTPError as http_err:
-        if response.status_code == 429:
-            logger.error(f"Rate limit reached: {http_err}. Creating a default quote to avoid further attempts.")
-            return create_default_quote(today)  # Create a default quote to avoid errors
+        data = upstream.get_json('/qod', params={'language': 'en'}, retries=0)
+    except UpstreamError as e:
+        if e.status_code == 429:
+            logger.error("Rate limit reached: %s.", e)
         else:
-            logger.error(f"HTTP error occurred: {http_err}")
-            return create_default_quote(today)
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching quote: {e}")
-        return create_default_quote(today)
-
-# Function to create a default quote
-def create_default_quote(today):
-    logger.info("Creating a default quote.")
-    default_quote = Quote(
-        text="This is a default quote as we couldn't fetch a quote today.",
-        author="Admin",
-        date_fetched=today,
-        is_featured_qod=True
-    )
-    db.session.add(default_quote)
-    db.session.commit()
-    logger.info("Created and saved default quote of the day.")
-    return default_quote
-
-# Function to fetch multiple quotes from the API
-def fetch_multiple_quotes_from_api(total_quotes=500):
-    logger.info(f"Attempting to fetch {total_quotes} quotes from the API.")
-    quotes_fetched = 0
-    batch_size = 1  # Reducing batch size to avoid potential rate limit issues
-    max_attempts = 5  # Stop if we are rate limited this many times
-    rate_limit_count = 0
-
-    while quotes_fetched < total_quotes:
-        api_url = f"https://quotes.rest/quote/random?language=en&limit={batch_size}"
-        headers = {
-            "Authorization": f"Bearer {os.getenv('API_TOKEN')}",
-            "Accept": "application/json"
-        }
+            logger.error("Error fetching quote: %s", e)
+        _back_off_quote_of_the_day(today, e.retry_after or retry_after)
+        return None
+
+    if not ("contents" in data and "quotes" in data["contents"]):
+        logger.warning("No quote found in API response.")
+        _back_off_quote_of_the_day(today, retry_after)
+        return None
 
+    new_quote = data["contents"]["quotes"][0]
+    category_name = new_quote.get("category", "Uncategorized")
+
+    # Fetch or create the category in the database
+    category = Category.query.filter_by(name=category_name).first()
+    if not category:
+        category = Category(name=category_name)
+        db.session.add(category)
+        db.session.commit()
+
+    # A quote we already have keeps its own date and flags; today's feature goes in daily_quotes
+    quote = find_duplicate_quote(new_quote["quote"])
+    if quote:
+        if category not in quote.categories:
+            quote.categories.append(category)
+        if not store_daily_quote(today, FEATURED, quote.id):
+            logger.info("Today's featured quote was chosen already; using the stored one.")
+            return _cached_quote_of_the_day(today)
+    else:
+        quote = Quote(
+            text=new_quote["quote"],
+            author=new_quote["author"],
+            date_fetched=today,
+            is_featured_qod=True
+        )
+        db.session.add(quote)
+        quote.categories.append(category)  # Associate the quote with the category
         try:
-            response = requests.get(api_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            if "contents" in data and "quotes" in data["contents"]:
-                for new_quote in data["contents"]["quotes"]:
-                    category_name = new_quote.get("category", "Uncategorized")
-
-                    # Fetch or create the category in the database
-                    category = Category.query.filter_by(name=category_name).first()
-                    if not category:
-                        category = Category(name=category_name)
-                        db.session.add(category)
-                        db.session.commit()
-
-                    # Check if the quote already exists to avoid duplicates
-                    existing_quote = Quote.query.filter_by(text=new_quote["quote"]).first()
-                    if not existing_quote:
-                        # Create a new quote and associate it with the category
-                        quote = Quote(
-                            text=new_quote["quote"],
-                            author=new_quote["author"]
-                        )
-                        quote.categories.append(category)  # Associate the quote with the category
-                        db.session.add(quote)
-                        db.session.commit()
-                        quotes_fetched += 1
-                        logger.info(f"Fetched and saved quote: {new_quote['quote'][:30]}...")
-
-            # If we fetched fewer quotes than expected, break to avoid infinite loops
-            if quotes_fetched >= total_quotes:
-                break
-
-        except requests.exceptions.HTTPError as http_err:
-            if response.status_code == 429:
-                rate_limit_count += 1
-                logger.error(f"Rate limit reached: {http_err}. Stopping further attempts after {rate_limit_count} limit hits.")
-                if rate_limit_count >= max_attempts:
-                    logger.error(f"Rate limit reached {rate_limit_count} times. Aborting further requests.")
-                    break
-            else:
-                logger.error(f"HTTP error occurred: {http_err}")
-                break
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching quotes: {e}")
-            break
-
-        # Adding delay to reduce the chance of getting rate-limited
-        time.sleep(3600)  
-
-    logger.info(f"Total quotes fetched: {quotes_fetched}")
+            db.session.commit()
+        except IntegrityError:
+            # Another worker featured a quote for today first (one featured quote per day)
+            db.session.rollback()
+            logger.info("Quote of the day was saved concurrently; using the stored one.")
+            return _cached_quote_of_the_day(today)
+
+    snapshot_cache.set(f"qod:{today.isoformat()}", quote.id, current_app.config['QOD_CACHE_TTL'])
+    logger.info("Fetched and saved new quote of the day.")
+    return quote
+
+# Function to fetch multiple quotes from the API with the rate-limited ingestion pipeline
+def fetch_multiple_quotes_from_api(total_quotes=500, resume=True):
+    from src.ingest import run_ingestion
+    logger.info("Attempting to fetch %s quotes from the API.", total_quotes)
+    quotes_fetched = run_ingestion(current_app._get_current_object(), total_quotes, resume=resume)
+    logger.info("Total quotes fetched: %s", quotes_fetched)
     return quotes_fetched
 
 # Function to fetch categories from the API
 def fetch_categories_from_api():
-    api_url = "https://quotes.rest/qod/categories?language=en&detailed=false"
-    headers = {
-        "Authorization": f"Bearer {os.getenv('API_TOKEN')}",
-        "Accept": "application/json"
-    }
-
     try:
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
+        data = upstream.get_json('/qod/categories', params={'language': 'en', 'detailed': 'false'})
 
         if "contents" in data and "categories" in data["contents"]:
             categories = data["contents"]["categories"]
@@ -183,24 +155,137 @@ def fetch_categories_from_api():
                 return [{'name': key, 'title': value} for key, value in categories.items()]
         logger.warning("No categories found in API response.")
         return []
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching categories: {e}")
+    except UpstreamError as e:
+        logger.error("Error fetching categories: %s", e)
         return []
 
-# Function to get categorized quotes
-def get_categorized_quotes():
-    categorized_quotes = defaultdict(list)
-    quotes = Quote.query.join(Quote.categories).all()
-    for quote in quotes:
-        for category in quote.categories:
-            normalized_category = category.name.strip().lower()
-            categorized_quotes[normalized_category].append(quote)
-
-    logger.info(f"Total categorized quotes count: {len(categorized_quotes)}")
-    return dict(categorized_quotes)
-
-# Function to get uncategorized quotes
-def get_uncategorized_quotes():
-    uncategorized_quotes = Quote.query.filter(~Quote.categories.any()).all()
-    logger.info(f"Total uncategorized quotes count: {len(uncategorized_quotes)}")
-    return uncategorized_quotes
+# Number of quotes shown per expanded category on the /quotes page
+QUOTES_PER_CATEGORY = 20
+
+class QuotePage:
+    """One keyset page of a category's quotes; len() reports the category's total size."""
+
+    def __init__(self, quotes, total, next_cursor=None, after_id=None):
+        self.quotes = quotes
+        self.total = total
+        self.next_cursor = next_cursor
+        self.after_id = after_id
+
+    def __iter__(self):
+        return iter(self.quotes)
+
+    def __len__(self):
+        return self.total
+
+# Function to get one page of normalized category names with their quote counts.
+# Without a search the counts come from category_counts, so the cost follows the number of
+# categories rather than quotes; a search counts its matches. The total comes with the page.
+def get_category_page(page, per_page, search_query=''):
+    category_name = func.lower(func.trim(Category.name)).label('category_name')
+    if search_query:
+        quote_count = func.count(func.distinct(quote_categories.c.quote_id))
+        query = db.session.query(category_name, quote_count.label('quote_count')) \
+            .join(quote_categories, quote_categories.c.category_id == Category.id) \
+            .join(Quote, Quote.id == quote_categories.c.quote_id).filter(search_condition(search_query))
+    else:
+        quote_count = func.sum(CategoryCount.quote_count)
+        query = db.session.query(category_name, quote_count.label('quote_count')) \
+            .join(CategoryCount, CategoryCount.category_id == Category.id)
+
+    query = query.group_by(category_name).having(quote_count > 0)
+    rows = query.add_columns(func.count().over().label('total')) \
+        .order_by(category_name).offset((page - 1) * per_page).limit(per_page).all()
+    # Past the last page there is no row to carry the total
+    total_categories = rows[0].total if rows else (query.count() if page > 1 else 0)
+    return [(row.category_name, row.quote_count) for row in rows], total_categories
+
+# Function to fetch one keyset page of quotes, ordered by id
+def _keyset_page(query, total, after_id, limit):
+    if after_id:
+        query = query.filter(Quote.id > after_id)
+    quotes = query.options(*quote_options('listing')).order_by(Quote.id).limit(limit + 1).all()
+    next_cursor = quotes[limit - 1].id if len(quotes) > limit else None
+    return QuotePage(quotes[:limit], total, next_cursor=next_cursor, after_id=after_id)
+
+# Function to get a page of quotes for one normalized category name
+def get_category_quotes(category_name, total, search_query='', after_id=None, limit=QUOTES_PER_CATEGORY):
+    category_quote_ids = select(quote_categories.c.quote_id).join(
+        Category, Category.id == quote_categories.c.category_id
+    ).where(func.lower(func.trim(Category.name)) == category_name)
+    query = Quote.query.filter(Quote.id.in_(category_quote_ids))
+    if search_query:
+        query = query.filter(search_condition(search_query))
+    return _keyset_page(query, total, after_id, limit)
+
+# Function to build the query for uncategorized quotes matching the search
+def _uncategorized_query(search_query=''):
+    query = Quote.query.filter(~Quote.categories.any())
+    if search_query:
+        query = query.filter(search_condition(search_query))
+    return query
+
+# Function to check whether any uncategorized quotes match the search
+def has_uncategorized_quotes(search_query=''):
+    if not search_query:
+        return count_uncategorized_quotes() > 0
+    return db.session.query(_uncategorized_query(search_query).exists()).scalar()
+
+# Function to count uncategorized quotes matching the search (from category_counts without a search)
+def count_uncategorized_quotes(search_query=''):
+    if not search_query:
+        return db.session.query(CategoryCount.quote_count).filter(
+            CategoryCount.category_id == UNCATEGORIZED_ID).scalar() or 0
+    return _uncategorized_query(search_query).count()
+
+# Function to get a page of uncategorized quotes
+def get_uncategorized_page(total, search_query='', after_id=None, limit=QUOTES_PER_CATEGORY):
+    return _keyset_page(_uncategorized_query(search_query), total, after_id, limit)
+
+# Function to convert a quote into plain data that can be cached between requests
+def quote_snapshot(quote):
+    if quote is None:
+        return None
+    return {
+        'id': quote.id,
+        'text': quote.text,
+        'author': quote.author,
+        'date_fetched': quote.date_fetched,
+        'submitted_by': quote.submitted_by,
+        'upvotes': quote.upvotes,
+        'downvotes': quote.downvotes,
+        'user': {'username': quote.user.username} if quote.user else None,
+        'categories': [{'id': category.id, 'name': category.name} for category in quote.categories],
+    }
+
+# Function to build everything the home page shows to anonymous visitors
+def build_home_snapshot():
+    snapshots = {}
+
+    def snapshot(quote):
+        if quote.id not in snapshots:
+            snapshots[quote.id] = quote_snapshot(quote)
+        return snapshots[quote.id]
+
+    daily = get_todays_quotes()
+    # Until today's quotes are stored, show the stored or previous quote of the day
+    featured_qod = daily.get(FEATURED) or get_stored_quote_of_the_day()
+    community_qod = daily.get(COMMUNITY)
+    top_quotes = top_quotes_by_category(current_app.config.get('HOME_TOP_PER_CATEGORY', 3))
+
+    return {
+        'top_quotes': {name: [snapshot(quote) for quote, _ in entries] for name, entries in top_quotes.items()},
+        'featured_qod': snapshot(featured_qod) if featured_qod else None,
+        'community_qod': snapshot(community_qod) if community_qod else None,
+    }
+
+# Function to convert a quote into JSON-friendly data for the API endpoints
+def quote_json(quote):
+    data = quote_snapshot(quote)
+    if data and data['date_fetched']:
+        data['date_fetched'] = data['date_fetched'].isoformat()
+    return data
+
+# Function to get the cached home page snapshot, rebuilding it when the content or vote counts change
+def get_home_snapshot():
+    today = datetime.date.today()
+    return snapshot_cache.get_or_build(f"home:{today.isoformat()}", build_home_snapshot, scopes=(CONTENT, VOTES))
@@ -0,0 +1,123 @@
+import datetime
+import logging
+import sqlalchemy as sa
+from flask import g
+from flask_session import Session
+from flask_session.base import ServerSideSessionInterface
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models import db, SessionRecord
+from src.cache import create_shared_backend
+
+logger = logging.getLogger(__name__)
+
+# "cookie": Flask's signed cookie (no server storage; the session only holds user_id and the CSRF token)
+# "sql": the sessions table, swept in batches by the scheduler
+# "cachelib": the CACHE_BACKEND store (filesystem/redis), or an in-process dict for a single worker
+# "filesystem": Flask-Session's file per session, one read and write per request (the old default)
+SESSION_BACKENDS = ('cookie', 'sql', 'cachelib', 'filesystem')
+
+_sessions = SessionRecord.__table__
+
+
+class SqlSessionInterface(ServerSideSessionInterface):
+    """Server-side sessions stored in the `sessions` table.
+
+    Reads and writes run in their own short transactions on the engine, so they
+    never commit or roll back the request's db.session. An unmodified session is
+    only written back once less than half its lifetime is left, and expired rows
+    are removed by sweep_expired_sessions() rather than during requests.
+    """
+
+    ttl = False
+
+    def __init__(self, app, key_prefix='session:', permanent=True, sid_length=32, serialization_format='msgpack'):
+        super().__init__(app, key_prefix, False, permanent, sid_length, serialization_format, None)
+
+    def _retrieve_session_data(self, store_id):
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                sa.select(_sessions.c.data, _sessions.c.expiry).where(_sessions.c.session_id == store_id)
+            ).first()
+        if row is None or row.expiry <= datetime.datetime.utcnow():
+            return None
+        g._session_expiry = row.expiry
+        return self.serializer.decode(row.data)
+
+    def _delete_session(self, store_id):
+        with db.engine.begin() as connection:
+            connection.execute(sa.delete(_sessions).where(_sessions.c.session_id == store_id))
+
+    def _upsert_session(self, session_lifetime, session, store_id):
+        values = {'session_id': store_id, 'data': self.serializer.encode(session),
+                  'expiry': datetime.datetime.utcnow() + session_lifetime}
+        with db.engine.begin() as connection:
+            dialect = connection.dialect.name
+            if dialect in ('postgresql', 'sqlite'):
+                insert = postgresql_insert(_sessions) if dialect == 'postgresql' else sqlite_insert(_sessions)
+                connection.execute(insert.values(**values).on_conflict_do_update(
+                    index_elements=['session_id'], set_={'data': values['data'], 'expiry': values['expiry']}))
+            elif not connection.execute(sa.update(_sessions).where(_sessions.c.session_id == store_id)
+                                        .values(data=values['data'], expiry=values['expiry'])).rowcount:
+                connection.execute(sa.insert(_sessions).values(**values))
+
+    def _delete_expired_sessions(self):
+        sweep_expired_sessions(db.engine)
+
+    def should_set_storage(self, app, session):
+        if session.modified:
+            return True
+        if not app.config['SESSION_REFRESH_EACH_REQUEST']:
+            return False
+        expiry = g.get('_session_expiry')
+        return expiry is None or expiry - datetime.datetime.utcnow() < app.permanent_session_lifetime / 2
+
+
+# Function to delete expired sessions in batches of `batch_size`, one short transaction each.
+# Returns the number of sessions deleted.
+def sweep_expired_sessions(engine, batch_size=1000, now=None):
+    now = now or datetime.datetime.utcnow()
+    deleted = 0
+    while True:
+        with engine.begin() as connection:
+            ids = connection.execute(
+                sa.select(_sessions.c.session_id).where(_sessions.c.expiry <= now).limit(batch_size)
+            ).scalars().all()
+            if ids:
+                connection.execute(sa.delete(_sessions).where(_sessions.c.session_id.in_(ids)))
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    if deleted:
+        logger.info("Swept %d expired session(s).", deleted)
+    return deleted
+
+
+# Function to install the session backend chosen by SESSION_BACKEND
+def init_sessions(app):
+    backend = app.config.get('SESSION_BACKEND', 'cookie')
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r}; expected one of {', '.join(SESSION_BACKENDS)}.")
+
+    if backend == 'cookie':
+        # Flask's built-in SecureCookieSessionInterface
+        return
+    if backend == 'sql':
+        app.session_interface = SqlSessionInterface(
+            app,
+            key_prefix=app.config.get('SESSION_KEY_PREFIX', 'session:'),
+            permanent=app.config.get('SESSION_PERMANENT', True),
+            sid_length=app.config.get('SESSION_ID_LENGTH', 32),
+        )
+        return
+    if backend == 'cachelib':
+        if not app.config.get('SESSION_CACHELIB'):
+            from cachelib import SimpleCache
+            shared = create_shared_backend(app.config)
+            if shared is None:
+                logger.info("SESSION_BACKEND is 'cachelib' without a shared CACHE_BACKEND; sessions are per process.")
+            app.config['SESSION_CACHELIB'] = shared or SimpleCache(threshold=10000)
+        app.config['SESSION_TYPE'] = 'cachelib'
+    else:
+        app.config['SESSION_TYPE'] = 'filesystem'
+    Session(app)
@@ -1,18 +1,166 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from src.services import get_quote_of_the_day 
+import hashlib
 import logging
+import os
+import tempfile
+import time
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.blocking import BlockingScheduler
+from sqlalchemy import text as sql_text
+from src.models import db
 
 logger = logging.getLogger(__name__)
 
-# Scheduler to update the quote of the day at midnight
-def fetch_new_quote():
-    logger.info("Running scheduled task to fetch a new quote of the day.")
-    get_quote_of_the_day()
+JOBSTORE_TABLE = 'apscheduler_jobs'
 
-# Setting up the scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(func=fetch_new_quote, trigger="cron", hour=0, minute=0)
+# The app the scheduled jobs run against; set by create_scheduler()
+_app = None
 
-if not scheduler.running:
-    scheduler.start()
-    logger.info("Background scheduler started.")
+# Scheduled jobs: id -> (function reference, trigger arguments).
+# Functions are referenced by name so the database job store can persist them.
+JOBS = {
+    'daily_quotes': ('src.tasks:materialize_daily_quotes', {'trigger': 'cron', 'hour': 0, 'minute': 0}),
+    'rebuild_leaderboards': ('src.tasks:rebuild_leaderboards', {'trigger': 'cron', 'hour': 3, 'minute': 0}),
+    'refresh_trending': ('src.tasks:refresh_trending', {'trigger': 'interval', 'minutes': 5}),
+    'sweep_sessions': ('src.tasks:sweep_sessions', {'trigger': 'interval', 'hours': 1}),
+}
+
+
+# Scheduled task to pick today's featured and community quotes (and upcoming featured ones) at midnight
+def materialize_daily_quotes():
+    from src.daily import materialize_daily_quotes
+    logger.info("Running scheduled task to store the daily quotes.")
+    with _app.app_context():
+        materialize_daily_quotes(days_ahead=_app.config.get('QOD_PRECOMPUTE_DAYS', 0))
+
+
+# Scheduled task to rebuild the category leaderboards from the vote counters, repairing any drift
+def rebuild_leaderboards():
+    from src.cache import snapshot_cache, VOTES
+    from src.leaderboard import rebuild_leaderboards
+    logger.info("Running scheduled task to rebuild the category leaderboards.")
+    with _app.app_context():
+        with db.engine.begin() as connection:
+            rebuild_leaderboards(connection)
+        snapshot_cache.bump_version(VOTES)
+
+
+# Scheduled task to recompute the trending list from the hourly vote buckets
+def refresh_trending():
+    from src.trending import refresh_trending_from_config
+    with _app.app_context():
+        refresh_trending_from_config(_app.config)
+
+
+# Scheduled task to delete expired server-side sessions (SESSION_BACKEND = "sql" only)
+def sweep_sessions():
+    from src.sessions import sweep_expired_sessions
+    if _app.config.get('SESSION_BACKEND') != 'sql':
+        return
+    with _app.app_context():
+        sweep_expired_sessions(db.engine, _app.config.get('SESSION_SWEEP_BATCH_SIZE', 1000))
+
+
+class LeaderLock:
+    """Makes sure only one scheduler process runs jobs.
+
+    On PostgreSQL this is a session-level advisory lock held on a dedicated
+    connection; elsewhere it is an exclusive flock() on a lock file. Both are
+    released by the operating system or database if the process dies, so a
+    standby scheduler can take over.
+    """
+
+    def __init__(self, engine, name='quotes-scheduler', lock_file=None):
+        self.engine = engine
+        self.name = name
+        self.lock_file = lock_file or os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        # pg_try_advisory_lock takes a signed 64-bit key
+        self.key = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], 'big', signed=True)
+        self._connection = None
+        self._file = None
+
+    def acquire(self):
+        if self.engine.dialect.name == 'postgresql':
+            connection = self.engine.connect()
+            acquired = connection.execute(sql_text("SELECT pg_try_advisory_lock(:key)"), {'key': self.key}).scalar()
+            connection.commit()
+            if acquired:
+                self._connection = connection
+            else:
+                connection.close()
+            return bool(acquired)
+
+        import fcntl
+        lock_file = open(self.lock_file, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    # Function to block until this process becomes the leader
+    def wait(self, poll_interval=30):
+        while not self.acquire():
+            logger.info("Another scheduler holds the leader lock; retrying in %ss.", poll_interval)
+            time.sleep(poll_interval)
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(sql_text("SELECT pg_advisory_unlock(:key)"), {'key': self.key})
+                self._connection.commit()
+            finally:
+                self._connection.close()
+                self._connection = None
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+# Function to build the scheduler with a database job store and register every job
+def create_scheduler(app):
+    global _app
+    _app = app
+    with app.app_context():
+        jobstore = SQLAlchemyJobStore(engine=db.engine, tablename=JOBSTORE_TABLE)
+    scheduler = BlockingScheduler(
+        jobstores={'default': jobstore},
+        job_defaults={'coalesce': True, 'max_instances': 1,
+                      'misfire_grace_time': app.config.get('SCHEDULER_MISFIRE_GRACE_TIME', 3600)},
+        timezone=app.config.get('SCHEDULER_TIMEZONE'),
+    )
+    # Drop jobs that were renamed or removed since the job store was written
+    with app.app_context(), db.engine.begin() as connection:
+        jobstore.jobs_t.create(connection, checkfirst=True)
+        connection.execute(jobstore.jobs_t.delete().where(jobstore.jobs_t.c.id.not_in(list(JOBS))))
+    for job_id, (func, trigger) in JOBS.items():
+        scheduler.add_job(func, id=job_id, replace_existing=True, **trigger)
+    return scheduler
+
+
+# Function to run the scheduler in the foreground once this process holds the leader lock
+def run_scheduler(app, wait=True):
+    with app.app_context():
+        lock = LeaderLock(db.engine, lock_file=app.config.get('SCHEDULER_LOCK_FILE'))
+    if wait:
+        lock.wait(app.config.get('SCHEDULER_LEADER_POLL', 30))
+    elif not lock.acquire():
+        logger.info("Another scheduler is already running.")
+        return False
+
+    logger.info("Acquired the scheduler leader lock; starting jobs.")
+    scheduler = create_scheduler(app)
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        lock.release()
+    return True
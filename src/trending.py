@@ -0,0 +1,155 @@
+import datetime
+import logging
+from collections import defaultdict
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from src.models import db, TrendingQuote
+from src.cache import snapshot_cache
+from src.loading import quote_options
+
+logger = logging.getLogger(__name__)
+
+TRENDING_REFRESH_KEY = 'trending-refresh'
+
+# Lightweight table definitions so buckets can be rebuilt on a plain connection (CLI and scheduled jobs)
+_votes = sa.table('votes', sa.column('quote_id', sa.Integer), sa.column('vote_type', sa.String),
+                  sa.column('created_at', sa.DateTime))
+_buckets = sa.table('vote_buckets', sa.column('quote_id', sa.Integer), sa.column('hour', sa.DateTime),
+                    sa.column('upvotes', sa.Integer), sa.column('downvotes', sa.Integer))
+_trending = sa.table('trending_quotes', sa.column('rank', sa.Integer), sa.column('quote_id', sa.Integer),
+                     sa.column('score', sa.Float), sa.column('upvotes', sa.Integer),
+                     sa.column('downvotes', sa.Integer), sa.column('refreshed_at', sa.DateTime))
+
+
+# Function to truncate a timestamp to the start of its hour
+def hour_floor(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+# Function to build an upsert that adds to an existing bucket's counters
+def _bucket_upsert_statement(dialect):
+    if dialect == 'postgresql':
+        statement = postgresql_insert(_buckets)
+    elif dialect == 'sqlite':
+        statement = sqlite_insert(_buckets)
+    else:
+        return None
+    return statement.on_conflict_do_update(
+        index_elements=['quote_id', 'hour'],
+        set_={'upvotes': _buckets.c.upvotes + statement.excluded.upvotes,
+              'downvotes': _buckets.c.downvotes + statement.excluded.downvotes},
+    )
+
+
+# Function to add vote deltas {quote_id: (upvotes, downvotes)} to the current hour's buckets.
+# Removing a vote subtracts in the hour it is removed. Runs in the caller's transaction.
+def record_vote_deltas(deltas, now=None):
+    hour = hour_floor(now or datetime.datetime.utcnow())
+    rows = [{'quote_id': quote_id, 'hour': hour, 'upvotes': upvotes, 'downvotes': downvotes}
+            for quote_id, (upvotes, downvotes) in sorted(deltas.items()) if upvotes or downvotes]
+    if not rows:
+        return
+    connection = db.session.connection()
+    statement = _bucket_upsert_statement(connection.dialect.name)
+    if statement is not None:
+        connection.execute(statement, rows)
+        return
+
+    same_bucket = sa.and_(_buckets.c.quote_id == sa.bindparam('b_quote_id'), _buckets.c.hour == sa.bindparam('b_hour'))
+    for row in rows:
+        params = {'b_quote_id': row['quote_id'], 'b_hour': row['hour'], 'b_up': row['upvotes'], 'b_down': row['downvotes']}
+        update = sa.update(_buckets).where(same_bucket).values(
+            upvotes=_buckets.c.upvotes + sa.bindparam('b_up'), downvotes=_buckets.c.downvotes + sa.bindparam('b_down'))
+        if connection.execute(update, params).rowcount:
+            continue
+        try:
+            with db.session.begin_nested():
+                connection.execute(sa.insert(_buckets).values(**row))
+        except IntegrityError:
+            # A concurrent vote created the bucket first
+            connection.execute(update, params)
+
+
+# Function to rebuild the buckets since `since` from the votes table; returns the number of buckets.
+# Votes count in the hour they were cast (or last switched sides).
+def rebuild_vote_buckets(connection, since):
+    counts = defaultdict(lambda: [0, 0])
+    query = sa.select(_votes.c.quote_id, _votes.c.vote_type, _votes.c.created_at).where(_votes.c.created_at >= since)
+    for quote_id, vote_type, created_at in connection.execute(query):
+        counts[(quote_id, hour_floor(created_at))][0 if vote_type == 'upvote' else 1] += 1
+
+    connection.execute(sa.delete(_buckets).where(_buckets.c.hour >= hour_floor(since)))
+    rows = [{'quote_id': quote_id, 'hour': hour, 'upvotes': up, 'downvotes': down}
+            for (quote_id, hour), (up, down) in counts.items()]
+    if rows:
+        connection.execute(sa.insert(_buckets), rows)
+    return len(rows)
+
+
+# Function to compute the trending scores from the buckets in the window, best first.
+# Each bucket's net votes halve in weight every half_life hours. Returns [(score, quote_id, up, down)].
+def trending_scores(connection, now, window_hours=24, half_life=6):
+    since = now - datetime.timedelta(hours=window_hours)
+    totals = defaultdict(lambda: [0.0, 0, 0])
+    query = sa.select(_buckets.c.quote_id, _buckets.c.hour, _buckets.c.upvotes, _buckets.c.downvotes) \
+        .where(_buckets.c.hour >= hour_floor(since))
+    for quote_id, hour, upvotes, downvotes in connection.execute(query):
+        age = max((now - hour).total_seconds() / 3600, 0)
+        entry = totals[quote_id]
+        entry[0] += (upvotes - downvotes) * 0.5 ** (age / half_life)
+        entry[1] += upvotes
+        entry[2] += downvotes
+    ranked = [(round(score, 6), quote_id, up, down) for quote_id, (score, up, down) in totals.items() if score > 0]
+    ranked.sort(key=lambda entry: (-entry[0], -entry[1]))
+    return ranked
+
+
+# Function to recompute the trending list and drop buckets past retention; returns the list size
+def refresh_trending(connection, now=None, window_hours=24, half_life=6, size=50, retention_hours=168):
+    now = now or datetime.datetime.utcnow()
+    ranked = trending_scores(connection, now, window_hours, half_life)[:size]
+    connection.execute(sa.delete(_trending))
+    if ranked:
+        connection.execute(sa.insert(_trending), [
+            {'rank': rank, 'quote_id': quote_id, 'score': score, 'upvotes': up, 'downvotes': down, 'refreshed_at': now}
+            for rank, (score, quote_id, up, down) in enumerate(ranked, start=1)
+        ])
+    connection.execute(sa.delete(_buckets).where(_buckets.c.hour < hour_floor(now - datetime.timedelta(hours=retention_hours))))
+    logger.info("Refreshed trending quotes: %d entries.", len(ranked))
+    return len(ranked)
+
+
+# Function to refresh the trending list with the app's settings
+def refresh_trending_from_config(config):
+    with db.engine.begin() as connection:
+        return refresh_trending(
+            connection,
+            window_hours=config.get('TRENDING_WINDOW_HOURS', 24),
+            half_life=config.get('TRENDING_HALF_LIFE_HOURS', 6),
+            size=config.get('TRENDING_SIZE', 50),
+            retention_hours=config.get('TRENDING_BUCKET_RETENTION_HOURS', 168),
+        )
+
+
+def _read_trending(limit, shape):
+    return TrendingQuote.query.options(joinedload(TrendingQuote.quote).options(*quote_options(shape))) \
+        .order_by(TrendingQuote.rank).limit(limit).all()
+
+
+# Function to get the top `limit` trending entries (TrendingQuote rows with .quote loaded).
+# If the scheduled refresh has not run lately, one request refreshes the list first.
+def get_trending(limit=50, shape='listing'):
+    config = current_app.config
+    entries = _read_trending(limit, shape)
+    max_age = config.get('TRENDING_MAX_AGE_MINUTES', 15) * 60
+    stale = not entries or entries[0].refreshed_at < datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age)
+    # The cache key throttles these refreshes to one per max_age across workers
+    if stale and snapshot_cache.add(TRENDING_REFRESH_KEY, True, ttl=max_age):
+        refresh_trending_from_config(config)
+        db.session.expire_all()
+        entries = _read_trending(limit, shape)
+    return entries
@@ -0,0 +1,57 @@
+import re
+import threading
+from collections import defaultdict
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# Function to split text into pg_trgm-style trigrams (each word padded with spaces)
+def trigrams(text):
+    grams = set()
+    for word in _WORD_RE.findall((text or '').lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """In-memory trigram index, used when the database has no pg_trgm support.
+
+    Scores mirror pg_trgm's word_similarity(): the share of the query's
+    trigrams found in the document, so partially typed input still matches.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, text):
+        grams = trigrams(text)
+        with self._lock:
+            self._documents[key] = grams
+            for gram in grams:
+                self._postings[gram].add(key)
+
+    def search(self, query, limit=10, threshold=0.3):
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared = defaultdict(int)
+        with self._lock:
+            for gram in query_grams:
+                for key in self._postings.get(gram, ()):
+                    shared[key] += 1
+
+        results = []
+        for key, count in shared.items():
+            score = count / len(query_grams)
+            if score >= threshold:
+                results.append((key, score))
+        results.sort(key=lambda item: (-item[1], str(item[0])))
+        return results[:limit]
+
+    def __len__(self):
+        return len(self._documents)
@@ -0,0 +1,215 @@
+import datetime
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from src.instrumentation import track_upstream
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying; other 4xx errors are the caller's fault and fail at once
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """A request to the quotes API failed after all retries."""
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker is open, so the request was not attempted."""
+
+
+# Function to get the seconds to wait from a Retry-After header (delta-seconds or HTTP date)
+def retry_after_seconds(response):
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(int((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds()), 1)
+
+
+class CircuitBreaker:
+    """Stops calling the upstream after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast for `reset_timeout` seconds; then one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def remaining(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(self.reset_timeout - (time.monotonic() - self._opened_at), 0)
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_progress:
+                    logger.warning("Upstream circuit opened after %d failure(s).", self._failures)
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
+
+
+class UpstreamClient:
+    """Pooled HTTP client for the quotes.rest API.
+
+    Every request has connect/read timeouts. Connection errors, timeouts, 429s
+    and 5xx responses are retried with jittered exponential backoff, waiting for
+    Retry-After when the API sends one (unless it is longer than backoff_max, in
+    which case the error is raised at once with retry_after set).
+    """
+
+    def __init__(self, app=None):
+        self.base_url = 'https://quotes.rest'
+        self.token = None
+        self.timeout = (3.05, 10)
+        self.max_retries = 2
+        self.backoff_base = 0.5
+        self.backoff_max = 30
+        self.pool_size = 10
+        self.breaker = CircuitBreaker()
+        self._session = None
+        self._session_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.base_url = app.config.get('QUOTES_API_URL', self.base_url).rstrip('/')
+        self.token = app.config.get('QUOTES_API_TOKEN')
+        self.timeout = (app.config.get('UPSTREAM_CONNECT_TIMEOUT', 3.05), app.config.get('UPSTREAM_READ_TIMEOUT', 10))
+        self.max_retries = app.config.get('UPSTREAM_MAX_RETRIES', 2)
+        self.backoff_base = app.config.get('UPSTREAM_BACKOFF_BASE', 0.5)
+        self.backoff_max = app.config.get('UPSTREAM_BACKOFF_MAX', 30)
+        self.pool_size = app.config.get('UPSTREAM_POOL_SIZE', 10)
+        self.breaker = CircuitBreaker(
+            failure_threshold=app.config.get('UPSTREAM_BREAKER_THRESHOLD', 5),
+            reset_timeout=app.config.get('UPSTREAM_BREAKER_RESET', 60),
+        )
+        self.close()
+        app.extensions['upstream'] = self
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update({'Accept': 'application/json'})
+                    self._session = session
+        return self._session
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    # Function to compute the wait before retry number `attempt` (full jitter)
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _headers(self):
+        return {'Authorization': f"Bearer {self.token}"} if self.token else {}
+
+    # Function to GET a path on the API and return the decoded JSON body.
+    # `retries` overrides max_retries, e.g. 0 inside a web request that should fail fast.
+    def get_json(self, path, params=None, retries=None):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        retries = self.max_retries if retries is None else retries
+        last_error = None
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Upstream circuit open; not calling {path}",
+                                       retry_after=int(self.breaker.remaining()) or 1)
+            retry_after = None
+            try:
+                with track_upstream():
+                    response = self.session.get(url, params=params, headers=self._headers(), timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                self.breaker.record_failure()
+                last_error = UpstreamError(f"Request to {path} failed: {e}")
+            else:
+                if response.status_code < 400:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        self.breaker.record_failure()
+                        raise UpstreamError(f"Invalid JSON from {path}: {e}", status_code=response.status_code)
+                    self.breaker.record_success()
+                    return data
+
+                retry_after = retry_after_seconds(response)
+                last_error = UpstreamError(f"{path} returned HTTP {response.status_code}",
+                                           status_code=response.status_code, retry_after=retry_after)
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    raise last_error
+                # Rate limiting means the upstream is healthy, so only 5xx counts against the breaker
+                if response.status_code == 429:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+
+            if attempt == retries:
+                break
+            if retry_after is not None and retry_after > self.backoff_max:
+                break
+            delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+            logger.info("Retrying %s in %.2fs (%s).", path, delay, last_error)
+            time.sleep(delay)
+        raise last_error
+
+
+upstream = UpstreamClient()
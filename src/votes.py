@@ -0,0 +1,309 @@
+import atexit
+import datetime
+import logging
+import threading
+from collections import defaultdict
+from sqlalchemy import and_, bindparam, delete, func, insert, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from src.models import db, Quote, Vote
+from src.leaderboard import refresh_leaderboards
+from src.trending import record_vote_deltas
+
+logger = logging.getLogger(__name__)
+
+VOTE_TYPES = ('upvote', 'downvote')
+VOTE_COUNT_COLUMNS = {'upvote': Quote.upvotes, 'downvote': Quote.downvotes}
+
+# Outcomes of apply_vote()
+VOTE_ADDED = 'added'
+VOTE_REMOVED = 'removed'
+VOTE_CHANGED = 'changed'
+VOTE_UNCHANGED = 'unchanged'
+
+_NO_SYNC = {'synchronize_session': False}
+
+
+def _opposite(vote_type):
+    return 'downvote' if vote_type == 'upvote' else 'upvote'
+
+
+# Function to build an INSERT for votes that skips rows already present for (user_id, quote_id)
+def _vote_insert_statement(dialect):
+    if dialect == 'postgresql':
+        return postgresql_insert(Vote.__table__).on_conflict_do_nothing(constraint='unique_user_quote_vote')
+    if dialect == 'sqlite':
+        return sqlite_insert(Vote.__table__).on_conflict_do_nothing(index_elements=['user_id', 'quote_id'])
+    return None
+
+
+# Function to insert a vote unless (user_id, quote_id) already has one; returns True if inserted
+def _insert_vote_if_absent(user_id, quote_id, vote_type):
+    values = {'user_id': user_id, 'quote_id': quote_id, 'vote_type': vote_type}
+    statement = _vote_insert_statement(db.session.get_bind().dialect.name)
+
+    if statement is None:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Vote.__table__).values(**values))
+            return True
+        except IntegrityError:
+            return False
+
+    return db.session.execute(statement.values(**values)).rowcount == 1
+
+
+# Function to apply net vote deltas to a quote's counters in SQL
+def apply_vote_deltas(quote_id, upvotes=0, downvotes=0):
+    values = {}
+    if upvotes:
+        values['upvotes'] = func.coalesce(Quote.upvotes, 0) + upvotes
+    if downvotes:
+        values['downvotes'] = func.coalesce(Quote.downvotes, 0) + downvotes
+    if not values:
+        return True
+    result = db.session.execute(
+        update(Quote).where(Quote.id == quote_id).values(**values).execution_options(**_NO_SYNC)
+    )
+    return result.rowcount == 1
+
+
+# Function to toggle a user's vote on a quote without read-modify-write races.
+# Returns one of the VOTE_* outcomes, or None if the quote does not exist.
+# The caller commits.
+def apply_vote(user_id, quote_id, vote_type):
+    vote_filter = (Vote.user_id == user_id, Vote.quote_id == quote_id)
+    deltas = {'upvote': 0, 'downvote': 0}
+
+    # Clicking the same vote again removes it
+    removed = db.session.execute(
+        delete(Vote).where(*vote_filter, Vote.vote_type == vote_type).execution_options(**_NO_SYNC)
+    ).rowcount
+    if removed:
+        deltas[vote_type] -= 1
+        outcome = VOTE_REMOVED
+    else:
+        # Switching sides flips the existing row in place
+        changed = db.session.execute(
+            update(Vote).where(*vote_filter, Vote.vote_type == _opposite(vote_type))
+            .values(vote_type=vote_type, created_at=datetime.datetime.utcnow()).execution_options(**_NO_SYNC)
+        ).rowcount
+        if changed:
+            deltas[vote_type] += 1
+            deltas[_opposite(vote_type)] -= 1
+            outcome = VOTE_CHANGED
+        elif _insert_vote_if_absent(user_id, quote_id, vote_type):
+            deltas[vote_type] += 1
+            outcome = VOTE_ADDED
+        else:
+            # A concurrent request from the same user recorded this vote first
+            outcome = VOTE_UNCHANGED
+
+    if not apply_vote_deltas(quote_id, upvotes=deltas['upvote'], downvotes=deltas['downvote']):
+        return None
+    if deltas['upvote'] or deltas['downvote']:
+        refresh_leaderboards([quote_id])
+        record_vote_deltas({quote_id: (deltas['upvote'], deltas['downvote'])})
+    logger.debug("Vote %s: user %s, quote %s, %s", outcome, user_id, quote_id, vote_type)
+    return outcome
+
+
+# Function to apply a batch of final vote states {(user_id, quote_id): vote_type or None}
+# in one transaction, adjusting quote counters by their net deltas. The caller commits.
+def apply_vote_batch(batch, chunk_size=500):
+    votes = Vote.__table__
+    keys = list(batch)
+    existing = {}
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        rows = db.session.execute(
+            votes.select().with_only_columns(votes.c.user_id, votes.c.quote_id, votes.c.vote_type)
+            .where(tuple_(votes.c.user_id, votes.c.quote_id).in_(chunk)).with_for_update()
+        )
+        for user_id, quote_id, vote_type in rows:
+            existing[(user_id, quote_id)] = vote_type
+
+    deltas = defaultdict(lambda: {'upvote': 0, 'downvote': 0})
+    to_insert, to_update, to_delete = [], [], []
+    for (user_id, quote_id), desired in batch.items():
+        current = existing.get((user_id, quote_id))
+        if current == desired:
+            continue
+        if current:
+            deltas[quote_id][current] -= 1
+        if desired:
+            deltas[quote_id][desired] += 1
+        params = {'b_user_id': user_id, 'b_quote_id': quote_id, 'b_vote_type': desired}
+        if current is None:
+            to_insert.append({'user_id': user_id, 'quote_id': quote_id, 'vote_type': desired})
+        elif desired is None:
+            to_delete.append(params)
+        else:
+            to_update.append(params)
+
+    same_vote = and_(votes.c.user_id == bindparam('b_user_id'), votes.c.quote_id == bindparam('b_quote_id'))
+    if to_delete:
+        db.session.execute(delete(votes).where(same_vote), to_delete)
+    if to_update:
+        db.session.execute(
+            update(votes).where(same_vote).values(vote_type=bindparam('b_vote_type'),
+                                                  created_at=datetime.datetime.utcnow()),
+            to_update
+        )
+    if to_insert:
+        statement = _vote_insert_statement(db.session.get_bind().dialect.name)
+        db.session.execute(statement if statement is not None else insert(votes), to_insert)
+
+    quote_deltas = [
+        {'b_quote_id': quote_id, 'b_up': delta['upvote'], 'b_down': delta['downvote']}
+        for quote_id, delta in deltas.items() if delta['upvote'] or delta['downvote']
+    ]
+    if quote_deltas:
+        quotes = Quote.__table__
+        db.session.execute(
+            update(quotes).where(quotes.c.id == bindparam('b_quote_id')).values(
+                upvotes=func.coalesce(quotes.c.upvotes, 0) + bindparam('b_up'),
+                downvotes=func.coalesce(quotes.c.downvotes, 0) + bindparam('b_down')
+            ),
+            quote_deltas
+        )
+        refresh_leaderboards(delta['b_quote_id'] for delta in quote_deltas)
+        record_vote_deltas({delta['b_quote_id']: (delta['b_up'], delta['b_down']) for delta in quote_deltas})
+    return len(quote_deltas)
+
+
+_MISSING = object()
+
+# Submits for one (user_id, quote_id) are serialized on one of this many locks
+KEY_LOCK_STRIPES = 64
+
+
+class VoteBuffer:
+    """Write-behind vote buffer.
+
+    Votes are kept in memory as the latest desired state per (user_id, quote_id)
+    and flushed in batches by a background thread, so repeated clicks collapse
+    into one write and each quote's counters get a single net update. Within one
+    process the final state is the same as applying every vote synchronously with
+    apply_vote(). The buffer is not shared between processes: a worker does not
+    see another's unflushed votes, and votes not yet flushed when a worker is
+    killed are lost.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.flush_interval = 2.0
+        self.max_pending = 500
+        self._pending = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(KEY_LOCK_STRIPES)]
+        self._wake = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('VOTE_WRITE_BEHIND', False)
+        self.flush_interval = app.config.get('VOTE_FLUSH_INTERVAL', 2.0)
+        self.max_pending = app.config.get('VOTE_FLUSH_MAX_PENDING', 500)
+        app.extensions['vote_buffer'] = self
+        if self.enabled:
+            atexit.register(self.flush)
+
+    # Function to get a user's effective vote, including votes not yet flushed.
+    # Returns _MISSING if the quote does not exist.
+    def _current_vote(self, user_id, quote_id):
+        key = (user_id, quote_id)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            if key in self._in_flight:
+                return self._in_flight[key]
+
+        row = db.session.query(Quote.id, Vote.vote_type).outerjoin(
+            Vote, and_(Vote.quote_id == Quote.id, Vote.user_id == user_id)
+        ).filter(Quote.id == quote_id).first()
+        return _MISSING if row is None else row.vote_type
+
+    # Function to record a vote toggle; returns a VOTE_* outcome or None if the quote does not exist.
+    # The read, the toggle and the write happen under the key's lock, so two quick clicks by
+    # the same user both count instead of deciding from the same current vote.
+    def submit(self, user_id, quote_id, vote_type):
+        key = (user_id, quote_id)
+        with self._key_locks[hash(key) % len(self._key_locks)]:
+            current = self._current_vote(user_id, quote_id)
+            if current is _MISSING:
+                return None
+
+            if current == vote_type:
+                desired, outcome = None, VOTE_REMOVED
+            elif current is None:
+                desired, outcome = vote_type, VOTE_ADDED
+            else:
+                desired, outcome = vote_type, VOTE_CHANGED
+
+            with self._lock:
+                self._pending[key] = desired
+                pending_count = len(self._pending)
+
+        self._ensure_flusher()
+        if pending_count >= self.max_pending:
+            self._wake.set()
+        return outcome
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='vote-buffer-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Vote buffer flush failed; will retry.")
+
+    # Function to write every pending vote to the database
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+            if not batch:
+                return 0
+
+            try:
+                with self.app.app_context():
+                    try:
+                        quotes_updated = apply_vote_batch(batch)
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        # Requeue without overwriting votes submitted since the batch was taken
+                        with self._lock:
+                            for key, desired in batch.items():
+                                self._pending.setdefault(key, desired)
+                        raise
+            finally:
+                with self._lock:
+                    self._in_flight = {}
+
+            logger.info("Flushed %d buffered vote(s) across %d quote(s).", len(batch), quotes_updated)
+            return len(batch)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+
+vote_buffer = VoteBuffer()
@@ -0,0 +1,168 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src import create_app
+from src.config import DevelopmentConfig
+from src.models import db
+from src.category_counts import install_category_counts
+
+
+class TestConfig(DevelopmentConfig):
+    """Configuration for the test suite: a scratch SQLite database and no outside services"""
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    CACHE_BACKEND = 'local'
+    SESSION_BACKEND = 'cookie'
+    PASSWORD_HASH_WORKERS = 0
+    VOTE_WRITE_BEHIND = False
+    # Nothing listens here, so quote-of-the-day fetches fail at once
+    QUOTES_API_URL = 'http://127.0.0.1:9'
+    UPSTREAM_MAX_RETRIES = 0
+    LOG_LEVEL = 'WARNING'
+
+
+@pytest.fixture
+def app(tmp_path):
+    config = type('Config', (TestConfig,), {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"})
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as connection:
+            install_category_counts(connection)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Function to log a test client in as the given user
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+
+# Canned quotes.rest payloads served by StubUpstream
+STUB_QUOTES = [
+    {'quote': "The only way to do great work is to love what you do.", 'author': "Steve Jobs", 'category': "inspire"},
+    {'quote': "Life is what happens when you're busy making other plans.", 'author': "John Lennon", 'category': "life"},
+    {'quote': "Simplicity is the ultimate sophistication.", 'author': "Leonardo da Vinci", 'category': "art"},
+]
+STUB_CATEGORIES = {'inspire': "Inspiring Quotes", 'life': "Quote of the day about life", 'art': "Art quote of the day"}
+
+
+class StubUpstream:
+    """Local stand-in for the quotes.rest API, serving /qod, /quote/random and /qod/categories.
+
+    Failures queued with fail_next() (an HTTP status, optionally with Retry-After,
+    and/or a delay in seconds) are served in order before normal responses resume.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self._failures = deque()
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # Function to queue a failure: an HTTP status (optionally with Retry-After) and/or a delay in seconds
+    def fail_next(self, status=503, retry_after=None, delay=0, times=1):
+        with self._lock:
+            for _ in range(times):
+                self._failures.append((status, retry_after, delay))
+
+    def _next_failure(self):
+        with self._lock:
+            return self._failures.popleft() if self._failures else None
+
+    def _next_quotes(self, limit):
+        with self._lock:
+            start = self._counter
+            self._counter += limit
+        # Cycle through the canned quotes, numbering repeats so every quote is distinct
+        quotes = []
+        for i in range(start, start + limit):
+            quote = dict(STUB_QUOTES[i % len(STUB_QUOTES)])
+            if i >= len(STUB_QUOTES):
+                quote['quote'] = f"{quote['quote']} #{i}"
+            quotes.append(quote)
+        return quotes
+
+    def payload(self, path, params):
+        if path == '/qod':
+            return {'contents': {'quotes': [STUB_QUOTES[0]]}}
+        if path == '/quote/random':
+            return {'contents': {'quotes': self._next_quotes(max(int(params.get('limit', ['1'])[0]), 1))}}
+        if path == '/qod/categories':
+            return {'contents': {'categories': STUB_CATEGORIES}}
+        return None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                stub.requests.append(parsed.path)
+                failure = stub._next_failure()
+                if failure:
+                    status, retry_after, delay = failure
+                    if delay:
+                        time.sleep(delay)
+                    if status:
+                        headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+                        return self._send(status, {'error': {'code': status}}, headers)
+
+                body = stub.payload(parsed.path, parse_qs(parsed.query))
+                if body is None:
+                    return self._send(404, {'error': {'code': 404}})
+                self._send(200, body)
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client timed out and hung up first
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def upstream_stub():
+    stub = StubUpstream()
+    thread = threading.Thread(target=stub.server.serve_forever, name='upstream-stub', daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
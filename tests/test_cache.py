@@ -0,0 +1,49 @@
+from src.cache import snapshot_cache, CONTENT, VOTES
+from src.models import db, User, Quote
+from src.search import _fallback_index
+from tests.conftest import login
+
+
+def _seed(app):
+    with app.app_context():
+        db.session.add(User(username='reader', email='reader@example.com', password_hash='x'))
+        db.session.add(Quote(text='Patience is bitter, but its fruit is sweet.', author='Aristotle'))
+        db.session.commit()
+
+
+def test_votes_only_bump_the_votes_version(app, client):
+    _seed(app)
+    content, votes = snapshot_cache.data_version(CONTENT), snapshot_cache.data_version(VOTES)
+    snapshot_cache.set('unrelated', 'kept')
+    builds = []
+    with app.app_context():
+        _fallback_index('test', lambda: builds.append(1) or 'index')
+
+    login(client, 1)
+    assert client.post('/vote/1', data={'vote_type': 'upvote'}).status_code == 302
+
+    assert snapshot_cache.data_version(VOTES) > votes
+    assert snapshot_cache.data_version(CONTENT) == content
+    assert snapshot_cache.get('unrelated') == 'kept'
+    with app.app_context():
+        _fallback_index('test', lambda: builds.append(1) or 'index')
+    assert builds == [1]
+
+
+def test_quote_edits_bump_the_content_version(app):
+    _seed(app)
+    content = snapshot_cache.data_version(CONTENT)
+    with app.app_context():
+        db.session.get(Quote, 1).text = 'Patience is bitter.'
+        db.session.commit()
+    assert snapshot_cache.data_version(CONTENT) > content
+
+
+def test_counter_only_edits_bump_the_votes_version(app):
+    _seed(app)
+    content, votes = snapshot_cache.data_version(CONTENT), snapshot_cache.data_version(VOTES)
+    with app.app_context():
+        db.session.get(Quote, 1).upvotes = 5
+        db.session.commit()
+    assert snapshot_cache.data_version(VOTES) > votes
+    assert snapshot_cache.data_version(CONTENT) == content
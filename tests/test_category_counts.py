@@ -0,0 +1,74 @@
+import sqlalchemy as sa
+from src.category_counts import UNCATEGORIZED_ID, rebuild_category_counts
+from src.consolidation import consolidate_categories
+from src.models import db, Quote, Category, CategoryCount, quote_categories
+from src.services import get_category_page, count_uncategorized_quotes, has_uncategorized_quotes
+
+
+def _counts():
+    return {row.category_id: row.quote_count for row in CategoryCount.query if row.quote_count}
+
+
+# Function to check the trigger-maintained counts against a full recount
+def _assert_counts_match():
+    db.session.commit()
+    maintained = _counts()
+    with db.engine.begin() as connection:
+        rebuild_category_counts(connection)
+    db.session.expire_all()
+    assert maintained == _counts()
+
+
+def test_counts_follow_quote_and_link_changes(app):
+    with app.app_context():
+        life, humor = Category('Life'), Category('funny')
+        db.session.add_all([life, humor])
+        quotes = [Quote(text=f'Quote {number}', author='Someone') for number in range(6)]
+        db.session.add_all(quotes)
+        quotes[0].categories.extend([life, humor])
+        quotes[1].categories.append(life)
+        _assert_counts_match()
+        assert _counts() == {life.id: 2, humor.id: 1, UNCATEGORIZED_ID: 4}
+
+        # Bulk links, as the importer writes them
+        db.session.execute(sa.insert(quote_categories), [
+            {'quote_id': quotes[2].id, 'category_id': humor.id},
+            {'quote_id': quotes[3].id, 'category_id': humor.id},
+            {'quote_id': quotes[3].id, 'category_id': life.id},
+        ])
+        _assert_counts_match()
+        assert _counts()[UNCATEGORIZED_ID] == 2
+
+        quotes[0].categories.remove(humor)
+        quotes[1].categories.clear()
+        _assert_counts_match()
+
+        db.session.execute(sa.delete(quote_categories).where(quote_categories.c.quote_id == quotes[3].id))
+        db.session.execute(sa.delete(Quote).where(Quote.id.in_([quotes[3].id, quotes[5].id])))
+        _assert_counts_match()
+
+        with db.engine.begin() as connection:
+            consolidate_categories(connection)
+        _assert_counts_match()
+
+
+def test_listing_reads_counts(app):
+    with app.app_context():
+        categories = [Category(f'Category {number:02d}') for number in range(5)]
+        db.session.add_all(categories)
+        for number in range(12):
+            quote = Quote(text=f'Quote {number}', author='Someone')
+            if number < 10:
+                quote.categories.append(categories[number % 5])
+            db.session.add(quote)
+        db.session.commit()
+
+        rows, total = get_category_page(1, 3)
+        assert total == 5
+        assert rows == [('category 00', 2), ('category 01', 2), ('category 02', 2)]
+        assert get_category_page(2, 3) == ([('category 03', 2), ('category 04', 2)], 5)
+        assert get_category_page(3, 3) == ([], 5)
+        assert count_uncategorized_quotes() == 2 and has_uncategorized_quotes()
+
+        rows, total = get_category_page(1, 10, search_query='Quote 1')
+        assert total == len(rows)
@@ -0,0 +1,31 @@
+import sqlalchemy as sa
+from src.current_user import current_user_loader
+from src.models import db, User, Category, user_preferences
+from tests.conftest import login
+
+
+def _saved_ids(user_id):
+    return set(db.session.execute(
+        sa.select(user_preferences.c.category_id).where(user_preferences.c.user_id == user_id)).scalars())
+
+
+def test_preferences_save_ignores_a_stale_cached_user(app, client):
+    with app.app_context():
+        db.session.add(User(username='reader', email='reader@example.com', password_hash='x'))
+        db.session.add_all([Category(f'Category {number}') for number in range(4)])
+        db.session.execute(sa.insert(user_preferences), [{'user_id': 1, 'category_id': 1}])
+        db.session.commit()
+        # This worker caches the user with category 1 only
+        assert current_user_loader.get(1).category_ids == {1}
+
+        # Another worker saves categories 1 and 2; this worker's copy is not invalidated
+        db.session.execute(sa.insert(user_preferences), [{'user_id': 1, 'category_id': 2}])
+        db.session.commit()
+
+    login(client, 1)
+    response = client.post('/preferences', data={'categories': ['2', '3']})
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert _saved_ids(1) == {2, 3}
+        assert current_user_loader.get(1).category_ids == {2, 3}
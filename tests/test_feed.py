@@ -0,0 +1,25 @@
+import datetime
+import sqlalchemy as sa
+from src.feed import get_feed
+from src.leaderboard import refresh_leaderboards
+from src.models import db, Category, Quote, quote_categories
+
+
+def test_well_voted_older_quotes_reach_the_feed(app):
+    with app.app_context():
+        category = Category('Wisdom')
+        db.session.add(category)
+        favourite = Quote(text='An old favourite', author='Someone', date_fetched=datetime.date(2020, 1, 1))
+        favourite.upvotes = 50
+        db.session.add(favourite)
+        db.session.add_all([Quote(text=f'Newer quote {number}', author='Someone') for number in range(5)])
+        db.session.flush()
+        db.session.execute(sa.insert(quote_categories),
+                           [{'quote_id': quote_id, 'category_id': category.id} for quote_id in range(1, 7)])
+        refresh_leaderboards([1])
+        db.session.commit()
+
+        # Only the 3 newest quotes are recent candidates; the favourite comes from the leaderboard
+        app.config['FEED_CANDIDATES_PER_CATEGORY'] = 3
+        ids = [quote.id for quote in get_feed(None, category_ids=[category.id], limit=10)]
+        assert sorted(ids) == [1, 4, 5, 6]
@@ -0,0 +1,43 @@
+import io
+import json
+import pytest
+from src.import_quotes import iter_json_array_items, READ_CHUNK_SIZE
+
+QUOTES = [{'text': f'Quote {number}', 'author': 'Someone', 'category': 'life'} for number in range(3)]
+
+
+def _items(document, chunk_size):
+    return [json.loads(raw) for raw in iter_json_array_items(io.BytesIO(document), chunk_size=chunk_size)]
+
+
+# A document whose opening bracket is the last byte of the first chunk
+def _opener_at_boundary(chunk_size):
+    start, end = b'{"note": "', b'", "quotes": ['
+    header = start + b'x' * (chunk_size - len(start) - len(end)) + end
+    return header + json.dumps(QUOTES)[1:].encode() + b'}'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64])
+def test_object_array_any_chunk_size(chunk_size):
+    document = json.dumps({'note': 'header', 'quotes': QUOTES}).encode()
+    assert _items(document, chunk_size) == QUOTES
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7])
+def test_top_level_array_any_chunk_size(chunk_size):
+    assert _items(json.dumps(QUOTES).encode(), chunk_size) == QUOTES
+
+
+@pytest.mark.parametrize('chunk_size', [64, 256, READ_CHUNK_SIZE])
+def test_array_opener_at_chunk_boundary(chunk_size):
+    document = _opener_at_boundary(chunk_size)
+    assert document[chunk_size - 1:chunk_size] == b'['
+    assert _items(document, chunk_size) == QUOTES
+
+
+def test_top_level_opener_fills_first_chunk():
+    assert _items(b'[' + json.dumps(QUOTES)[1:].encode(), 1) == QUOTES
+
+
+def test_empty_array_at_chunk_boundary():
+    assert _items(b'{"quotes": []}', len(b'{"quotes": [')) == []
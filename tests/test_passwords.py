@@ -0,0 +1,76 @@
+import time
+import pytest
+from flask import Flask
+from werkzeug.security import generate_password_hash
+from src.passwords import PasswordHasher, PasswordHasherBusy, LoginAttemptLimiter
+
+# Iterations that make one hash take far longer than SLOW_TIMEOUT
+SLOW_METHOD = 'pbkdf2:sha256:1000000'
+SLOW_TIMEOUT = 0.05
+
+
+# Function to build an app carrying only the given settings
+def _app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return app
+
+
+@pytest.fixture
+def make_hasher():
+    hashers = []
+
+    def make(**config):
+        hasher = PasswordHasher(_app(**config))
+        hashers.append(hasher)
+        return hasher
+
+    yield make
+    for hasher in hashers:
+        hasher.shutdown()
+
+
+def test_hash_and_verify_in_pool(make_hasher):
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_TIMEOUT=30)
+    pwhash = hasher.hash('secret')
+    assert hasher.verify(pwhash, 'secret')
+    assert not hasher.verify(pwhash, 'wrong')
+    assert not hasher.needs_rehash(pwhash)
+
+
+def test_slow_hash_raises_busy_and_keeps_its_slot(make_hasher):
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1,
+                         PASSWORD_HASH_TIMEOUT=SLOW_TIMEOUT, PASSWORD_HASH_METHOD=SLOW_METHOD)
+    fast_hash = generate_password_hash('secret', 'pbkdf2:sha256:1000')
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('secret')
+    # The timed-out hash still occupies the only slot
+    with pytest.raises(PasswordHasherBusy):
+        hasher.verify(fast_hash, 'secret')
+
+    # Once it finishes, the slot is free again
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            assert hasher.verify(fast_hash, 'secret')
+            break
+        except PasswordHasherBusy:
+            assert time.monotonic() < deadline
+
+
+def test_needs_rehash_when_cost_changes(make_hasher):
+    pwhash = make_hasher(PASSWORD_HASH_WORKERS=0).hash('secret')
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=0, PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    assert hasher.needs_rehash(pwhash)
+    assert not hasher.needs_rehash(hasher.hash('secret'))
+
+
+def test_limiter_blocks_after_repeated_failures():
+    limiter = LoginAttemptLimiter(_app(LOGIN_MAX_ATTEMPTS=2))
+    for _ in range(2):
+        assert not limiter.retry_after('1.2.3.4', 'alice')
+        limiter.record_failure('1.2.3.4', 'alice')
+    assert limiter.retry_after('1.2.3.4', ' Alice ') > 0
+    assert not limiter.retry_after('1.2.3.4', 'bob')
+    limiter.record_success('alice')
+    assert not limiter.retry_after('1.2.3.4', 'alice')
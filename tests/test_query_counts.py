@@ -0,0 +1,42 @@
+import pytest
+from src.loading import assert_max_queries
+from src.query_plans import seed_database
+from tests.conftest import login
+
+# Enough rows that a per-quote or per-category query would blow the limits below
+SEED_SIZES = {'users': 50, 'quotes': 400, 'votes': 800, 'reports': 10, 'categories': 8}
+
+
+@pytest.fixture
+def seeded_app(app):
+    with app.app_context():
+        seed_database(SEED_SIZES)
+    return app
+
+
+# (path, user id or None, statement limit); every request starts with cold caches.
+# Each expanded category costs two statements: its page of quotes and their categories.
+PAGES = [
+    ('/', None, 6),
+    ('/', 1, 10),
+    ('/feed', 1, 4),
+    ('/quotes', None, 2),
+    ('/quotes?expanded_categories=category1,category2,category3,category4,uncategorized', None, 10),
+    ('/quotes?page=2&expanded_categories=uncategorized', None, 6),
+    ('/quotes?search=patience&expanded_categories=category1,category2,category3', None, 9),
+    ('/quotes?search=zzzz', None, 4),
+    ('/categories/category1/top', None, 4),
+    ('/categories/category1/top?limit=50', None, 4),
+    ('/trending', None, 7),
+]
+
+
+@pytest.mark.parametrize('path, user_id, limit', PAGES)
+def test_page_query_count(seeded_app, path, user_id, limit):
+    client = seeded_app.test_client()
+    if user_id is not None:
+        login(client, user_id)
+    with seeded_app.app_context():
+        with assert_max_queries(limit):
+            response = client.get(path)
+    assert response.status_code == 200
@@ -0,0 +1,81 @@
+import os
+import pytest
+from sqlalchemy import create_engine, text
+from src.models import db
+from src.query_plans import create_plan_app, seed_database, check_query_plans, full_scans
+
+
+@pytest.fixture
+def sqlite_connection():
+    engine = create_engine('sqlite://')
+    with engine.connect() as connection:
+        connection.execute(text("CREATE TABLE quotes (id INTEGER PRIMARY KEY, author TEXT, date_fetched DATE)"))
+        connection.execute(text("CREATE INDEX ix_quotes_date_fetched ON quotes (date_fetched)"))
+        connection.execute(text("CREATE INDEX ix_quotes_author_date ON quotes (author, date_fetched)"))
+        yield connection
+
+
+def test_sqlite_table_scan_is_flagged(sqlite_connection):
+    assert full_scans(sqlite_connection, "SELECT * FROM quotes WHERE id % 2 = 0", ()) == ['quotes']
+
+
+def test_sqlite_index_walk_is_flagged(sqlite_connection):
+    statement = "SELECT author, count(*) FROM quotes GROUP BY author"
+    plan = sqlite_connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}").all()
+    assert 'USING COVERING INDEX' in plan[0][-1]
+    assert full_scans(sqlite_connection, statement, ()) == ['quotes']
+
+
+def test_sqlite_limited_index_walk_is_bounded(sqlite_connection):
+    statement = "SELECT id FROM quotes ORDER BY date_fetched DESC LIMIT 10"
+    assert full_scans(sqlite_connection, statement, ()) == []
+
+
+def test_sqlite_index_search_is_bounded(sqlite_connection):
+    statement = "SELECT id FROM quotes WHERE author = ? ORDER BY date_fetched"
+    assert full_scans(sqlite_connection, statement, ('Author',)) == []
+
+
+class _PlanConnection:
+    """Stands in for a PostgreSQL connection, answering EXPLAIN with a fixed plan."""
+
+    class dialect:
+        name = 'postgresql'
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    def exec_driver_sql(self, statement, parameters):
+        return self
+
+    def scalar(self):
+        return [{'Plan': self.plan}]
+
+
+def test_postgres_unbounded_index_scans_are_flagged():
+    index_only = {'Node Type': 'Index Only Scan', 'Relation Name': 'votes'}
+    seq = {'Node Type': 'Seq Scan', 'Relation Name': 'reports'}
+    plan = {'Node Type': 'Hash Join', 'Plans': [index_only, {'Node Type': 'Hash', 'Plans': [seq]}]}
+    assert sorted(full_scans(_PlanConnection(plan), 'SELECT 1', ())) == ['reports', 'votes']
+
+
+def test_postgres_bounded_index_scans_pass():
+    searched = {'Node Type': 'Index Scan', 'Relation Name': 'votes', 'Index Cond': '(quote_id = 1)'}
+    limited = {'Node Type': 'Limit', 'Plans': [{'Node Type': 'Index Scan', 'Relation Name': 'quotes'}]}
+    assert full_scans(_PlanConnection(searched), 'SELECT 1', ()) == []
+    assert full_scans(_PlanConnection(limited), 'SELECT 1', ()) == []
+    limited['Plans'][0]['Filter'] = '(report_count > 0)'
+    assert full_scans(_PlanConnection(limited), 'SELECT 1', ()) == ['quotes']
+
+
+# Seeds a scratch database (QUERY_PLAN_DATABASE_URL, e.g. a PostgreSQL one, or a temporary SQLite file)
+# and EXPLAINs every statement the app's pages issue
+def test_no_full_scans_on_large_tables():
+    app = create_plan_app(os.getenv('QUERY_PLAN_DATABASE_URL'))
+    with app.app_context():
+        seed_database()
+    violations, checked = check_query_plans(app)
+    with app.app_context():
+        db.engine.dispose()
+    assert checked > 0
+    assert violations == []
@@ -0,0 +1,62 @@
+import datetime
+import pytest
+from src.daily import FEATURED
+from src.models import db, Quote, DailyQuote
+from src.services import get_quote_of_the_day
+from src.upstream import upstream
+
+
+@pytest.fixture
+def api_quote(monkeypatch):
+    calls = []
+
+    def get_json(path, params=None, retries=None):
+        calls.append(path)
+        return {'contents': {'quotes': [{'quote': 'Stay hungry, stay foolish.', 'author': 'Steve Jobs',
+                                         'category': 'life'}]}}
+
+    monkeypatch.setattr(upstream, 'get_json', get_json)
+    return calls
+
+
+def test_new_quote_is_dated_today(app, api_quote):
+    with app.app_context():
+        quote = get_quote_of_the_day()
+        assert quote.date_fetched == datetime.date.today()
+        assert quote.is_featured_qod
+        assert [category.name for category in quote.categories] == ['life']
+
+
+def test_stored_quote_keeps_its_history(app, api_quote):
+    first_fetched = datetime.date(2020, 5, 17)
+    with app.app_context():
+        stored = Quote(text='Stay hungry,  Stay foolish.', author='Steve Jobs', date_fetched=first_fetched)
+        db.session.add(stored)
+        db.session.commit()
+
+        quote = get_quote_of_the_day()
+        assert quote.id == stored.id
+        db.session.expire_all()
+        assert (quote.date_fetched, quote.is_featured_qod) == (first_fetched, False)
+        daily = db.session.get(DailyQuote, (datetime.date.today(), FEATURED))
+        assert daily.quote_id == stored.id
+
+        # Later requests find it without calling the API again
+        db.session.remove()
+        assert get_quote_of_the_day().id == stored.id
+        assert api_quote == ['/qod']
+
+
+def test_home_page_only_reads_the_daily_quotes(app, client, api_quote):
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    with app.app_context():
+        db.session.add(Quote(text='Yesterday', author='Someone', date_fetched=yesterday, is_featured_qod=True))
+        db.session.commit()
+
+    # Before the scheduled job runs, the home page shows the previous quote of the day
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'Yesterday' in response.data
+    assert api_quote == []
+    with app.app_context():
+        assert DailyQuote.query.count() == 0
@@ -0,0 +1,75 @@
+import pytest
+from src.models import db, User, Quote
+from src.search import install_search_index, search_backend, search_quote_ids, search_quotes
+
+
+@pytest.fixture
+def search_app(app):
+    with app.app_context():
+        db.session.add(User(username='greenthumb', email='greenthumb@example.com', password_hash='x'))
+        db.session.add_all([
+            Quote(text='Patience is bitter, but its fruit is sweet.', author='Aristotle'),
+            Quote(text='Adopt the pace of nature: her secret is patience.', author='Ralph Waldo Emerson'),
+            Quote(text='To plant a garden is to believe in tomorrow.', author='Audrey Hepburn'),
+            Quote(text='Nature does not hurry, yet everything is accomplished.', author='Lao Tzu'),
+        ])
+        db.session.flush()
+        quote = Quote(text='Weeds are flowers too, once you get to know them.', author='A. A. Milne', submitted_by=1)
+        db.session.add(quote)
+        db.session.commit()
+        # Installing backfills the rows already there; triggers keep later writes in sync
+        with db.engine.begin() as connection:
+            install_search_index(connection)
+        yield app
+
+
+def test_sqlite_search_uses_fts5(search_app):
+    with search_app.app_context():
+        assert search_backend() == 'sqlite'
+
+
+def test_matches_text_author_and_submitter(search_app):
+    with search_app.app_context():
+        # Terms match as prefixes and through the porter stemmer
+        assert sorted(search_quote_ids('patien')[0]) == [1, 2]
+        assert search_quote_ids('hurrying')[0] == [4]
+        assert search_quote_ids('hepburn')[0] == [3]
+        assert search_quote_ids('greenthumb')[0] == [5]
+        # Every term must match
+        assert search_quote_ids('nature patience')[0] == [2]
+        assert search_quote_ids('nature zebra') == ([], False)
+
+
+def test_text_matches_rank_above_author_matches(search_app):
+    with search_app.app_context():
+        db.session.add(Quote(text='Be yourself; everyone else is already taken.', author='Patience Strong'))
+        db.session.commit()
+        ids, _ = search_quote_ids('patience')
+        assert ids[-1] == 6
+        assert sorted(ids) == [1, 2, 6]
+
+
+def test_pages_follow_the_ranking(search_app):
+    with search_app.app_context():
+        first, has_more = search_quote_ids('is', per_page=2)
+        assert has_more
+        second, has_more = search_quote_ids('is', page=2, per_page=2)
+        assert not set(first) & set(second)
+        quotes, _ = search_quotes('is', per_page=2)
+        assert [quote.id for quote in quotes] == first
+
+
+def test_index_follows_quote_edits(search_app):
+    with search_app.app_context():
+        quote = db.session.get(Quote, 3)
+        quote.text = 'A garden requires patient labor and attention.'
+        quote.author = 'Liberty Hyde Bailey'
+        db.session.commit()
+        assert search_quote_ids('tomorrow') == ([], False)
+        assert search_quote_ids('hepburn') == ([], False)
+        assert search_quote_ids('bailey')[0] == [3]
+        assert sorted(search_quote_ids('patien')[0]) == [1, 2, 3]
+
+        db.session.delete(db.session.get(Quote, 1))
+        db.session.commit()
+        assert sorted(search_quote_ids('patien')[0]) == [2, 3]
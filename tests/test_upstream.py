@@ -0,0 +1,95 @@
+import time
+import pytest
+from flask import Flask
+from src.upstream import UpstreamClient, UpstreamError, CircuitOpenError
+
+
+# Function to build a client for the stub with fast backoff; `config` overrides the UPSTREAM_* settings
+def _client(stub, **config):
+    app = Flask(__name__)
+    app.config.update({'QUOTES_API_URL': stub.url, 'UPSTREAM_BACKOFF_BASE': 0.01, 'UPSTREAM_READ_TIMEOUT': 2,
+                       **config})
+    return UpstreamClient(app)
+
+
+def test_rate_limit_waits_for_retry_after(upstream_stub):
+    client = _client(upstream_stub, UPSTREAM_MAX_RETRIES=1)
+    upstream_stub.fail_next(429, retry_after=1)
+    started = time.monotonic()
+    data = client.get_json('/qod')
+    assert time.monotonic() - started >= 1
+    assert data['contents']['quotes'][0]['author'] == 'Steve Jobs'
+    assert upstream_stub.requests == ['/qod', '/qod']
+    # Rate limiting does not count against the breaker
+    assert client.breaker.state == 'closed'
+
+
+def test_long_retry_after_fails_at_once(upstream_stub):
+    client = _client(upstream_stub, UPSTREAM_MAX_RETRIES=3, UPSTREAM_BACKOFF_MAX=5)
+    upstream_stub.fail_next(429, retry_after=120)
+    with pytest.raises(UpstreamError) as error:
+        client.get_json('/qod')
+    assert (error.value.status_code, error.value.retry_after) == (429, 120)
+    assert upstream_stub.requests == ['/qod']
+
+
+def test_server_errors_are_retried(upstream_stub):
+    client = _client(upstream_stub, UPSTREAM_MAX_RETRIES=2)
+    upstream_stub.fail_next(503, times=2)
+    assert client.get_json('/quote/random', params={'limit': 2})['contents']['quotes']
+    assert len(upstream_stub.requests) == 3
+
+    upstream_stub.fail_next(500, times=3)
+    with pytest.raises(UpstreamError) as error:
+        client.get_json('/qod')
+    assert error.value.status_code == 500
+    assert len(upstream_stub.requests) == 6
+
+
+def test_client_errors_are_not_retried(upstream_stub):
+    client = _client(upstream_stub, UPSTREAM_MAX_RETRIES=2)
+    with pytest.raises(UpstreamError) as error:
+        client.get_json('/missing')
+    assert error.value.status_code == 404
+    assert upstream_stub.requests == ['/missing']
+
+
+def test_timeouts_are_retried(upstream_stub):
+    client = _client(upstream_stub, UPSTREAM_MAX_RETRIES=1, UPSTREAM_READ_TIMEOUT=0.2)
+    upstream_stub.fail_next(status=None, delay=0.5)
+    assert client.get_json('/qod')['contents']['quotes']
+    assert upstream_stub.requests == ['/qod', '/qod']
+
+    upstream_stub.fail_next(status=None, delay=0.5, times=2)
+    with pytest.raises(UpstreamError) as error:
+        client.get_json('/qod')
+    assert error.value.status_code is None
+
+
+def test_breaker_opens_and_resets(upstream_stub):
+    client = _client(upstream_stub, UPSTREAM_MAX_RETRIES=0, UPSTREAM_BREAKER_THRESHOLD=2,
+                     UPSTREAM_BREAKER_RESET=0.3)
+    upstream_stub.fail_next(503, times=2)
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            client.get_json('/qod')
+    assert client.breaker.state == 'open'
+
+    # Open: calls fail fast without reaching the API
+    with pytest.raises(CircuitOpenError):
+        client.get_json('/qod')
+    assert len(upstream_stub.requests) == 2
+
+    # After the reset timeout one trial call goes through; its failure re-opens the circuit
+    time.sleep(0.35)
+    assert client.breaker.state == 'half-open'
+    upstream_stub.fail_next(503)
+    with pytest.raises(UpstreamError):
+        client.get_json('/qod')
+    assert client.breaker.state == 'open'
+
+    # A successful trial closes it again
+    time.sleep(0.35)
+    assert client.get_json('/qod')['contents']['quotes']
+    assert client.breaker.state == 'closed'
+    assert len(upstream_stub.requests) == 4
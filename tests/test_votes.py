@@ -0,0 +1,104 @@
+import random
+import threading
+import time
+import pytest
+from src import create_app
+from src.models import db, User, Quote, Vote
+from src.votes import vote_buffer, VoteBuffer, VOTE_ADDED, VOTE_REMOVED
+from tests.conftest import TestConfig, login
+
+USERS = 8
+QUOTES = 3
+CLICKS = 25
+
+
+@pytest.fixture(params=[False, True], ids=['synchronous', 'write-behind'])
+def vote_app(request, tmp_path):
+    config = type('Config', (TestConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'votes.db'}",
+        # Writers wait for each other instead of failing with "database is locked"
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}},
+        'VOTE_WRITE_BEHIND': request.param,
+        'VOTE_FLUSH_INTERVAL': 0.05,
+    })
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username=f'user{number}', email=f'user{number}@example.com', password_hash='x')
+                            for number in range(USERS)])
+        db.session.add_all([Quote(text=f'Quote {number}', author='Someone') for number in range(QUOTES)])
+        db.session.commit()
+    yield app
+    vote_buffer.enabled = False
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _click(app, user_id, seed, errors):
+    # Two clients per user, so the same user's clicks race each other too
+    try:
+        client = app.test_client()
+        login(client, user_id)
+        rng = random.Random(seed)
+        for _ in range(CLICKS):
+            response = client.post(f'/vote/{rng.randint(1, QUOTES)}',
+                                   data={'vote_type': rng.choice(['upvote', 'downvote'])})
+            assert response.status_code == 302
+    except Exception as error:
+        errors.append(error)
+
+
+def test_concurrent_votes_keep_counters_in_step(vote_app, caplog):
+    errors = []
+    threads = [threading.Thread(target=_click, args=(vote_app, user_id, user_id * 10 + copy, errors))
+               for user_id in range(1, USERS + 1) for copy in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    vote_buffer.flush()
+    # The route turns database errors into a flash and a redirect; none may have happened
+    assert not [record for record in caplog.records if record.levelname == 'ERROR']
+
+    with vote_app.app_context():
+        assert Vote.query.count() > 0
+        for quote in Quote.query:
+            votes = Vote.query.filter_by(quote_id=quote.id)
+            assert quote.upvotes == votes.filter_by(vote_type='upvote').count()
+            assert quote.downvotes == votes.filter_by(vote_type='downvote').count()
+
+
+def test_same_user_clicks_toggle_in_turn(app, monkeypatch):
+    with app.app_context():
+        db.session.add(User(username='reader', email='reader@example.com', password_hash='x'))
+        db.session.add(Quote(text='Quote', author='Someone'))
+        db.session.commit()
+    buffer = VoteBuffer(app)
+    read_vote = buffer._current_vote
+
+    # Widen the gap between reading the current vote and recording the new one
+    def slow_current_vote(user_id, quote_id):
+        vote = read_vote(user_id, quote_id)
+        time.sleep(0.1)
+        return vote
+
+    monkeypatch.setattr(buffer, '_current_vote', slow_current_vote)
+    outcomes = []
+
+    def click():
+        with app.app_context():
+            outcomes.append(buffer.submit(1, 1, 'upvote'))
+
+    threads = [threading.Thread(target=click) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(outcomes) == [VOTE_ADDED, VOTE_REMOVED]
+
+    buffer.flush()
+    with app.app_context():
+        assert Vote.query.count() == 0
+        assert db.session.get(Quote, 1).upvotes == 0